@@ -0,0 +1,398 @@
+import os
+import json
+import time
+import random
+import shutil
+import tempfile
+import platform
+import argparse
+import threading
+import multiprocessing
+import torch
+from transformers import AutoConfig, GPTNeoConfig, GPTNeoForCausalLM, GPT2Tokenizer, GPT2TokenizerFast
+from transformers.models.gpt2.tokenization_gpt2 import bytes_to_unicode
+
+from neo_NiceGUI import (
+	ChatHistoryDB, CachedTokenizer, GenerationProfiler, GenerationRequest, InferenceScheduler, PRECISION_DTYPES,
+	TOKENIZER_PARITY_SAMPLES, check_tokenizer_parity, format_turn, load_model_mmap, peak_rss_mb
+)
+
+# ----------------------------
+# KÜÇÜK RASTGELE MODEL (ÇEVRİMDIŞI)
+# ----------------------------
+def build_tiny_model(model_dir, layers=2, hidden_size=64, heads=4, max_positions=512, seed=0):
+	"""
+	Rastgele ağırlıklı küçük bir GPT-Neo ve bayt düzeyinde bir tokenizer yazar.
+	İnternet veya indirilmiş ağırlık gerektirmez; ölçümler CI'da da tekrarlanabilir.
+	"""
+	torch.manual_seed(seed)
+	byte_encoder = bytes_to_unicode()
+	vocab = {byte_encoder[byte]: byte for byte in range(256)}
+	vocab["<|endoftext|>"] = 256
+	with open(os.path.join(model_dir, "vocab.json"), "w", encoding="utf-8") as file:
+		json.dump(vocab, file)
+	with open(os.path.join(model_dir, "merges.txt"), "w", encoding="utf-8") as file:
+		file.write("#version: 0.2\n")
+
+	config = GPTNeoConfig(
+		vocab_size=len(vocab),
+		max_position_embeddings=max_positions,
+		hidden_size=hidden_size,
+		num_layers=layers,
+		num_heads=heads,
+		attention_types=[[["global", "local"], max(1, layers // 2)]],
+		window_size=256,
+		intermediate_size=hidden_size * 4,
+		bos_token_id=256,
+		eos_token_id=256
+	)
+	GPTNeoForCausalLM(config).save_pretrained(model_dir, safe_serialization=True)
+	return model_dir
+
+# ----------------------------
+# MODEL YÜKLEME VE ÜRETİM ÖLÇÜMLERİ
+# ----------------------------
+def _cold_load(model_dir, precision):
+	# Ayrı (spawn) süreçte çalışır: sayfa önbelleği dışında hiçbir şey ısınmamıştır
+	started = time.time()
+	config = AutoConfig.from_pretrained(model_dir)
+	load_model_mmap(model_dir, config, PRECISION_DTYPES[precision])
+	return time.time() - started, peak_rss_mb()
+
+def measure_cold_start(model_dir, precision, runs=3):
+	"""Yeni süreçte model yükleme süresi ve tepe RSS (en iyi / ortanca)."""
+	context = multiprocessing.get_context("spawn")
+	results = []
+	for _ in range(runs):
+		with context.Pool(1) as pool:
+			results.append(pool.apply(_cold_load, (model_dir, precision)))
+	seconds = sorted(result[0] for result in results)
+	return {
+		'load.cold_seconds_min': seconds[0],
+		'load.cold_seconds_median': seconds[len(seconds) // 2],
+		'load.peak_rss_mb': max(result[1] for result in results)
+	}
+
+def _run_batch(model, tokenizer, profiler, batch_size, prompt_length, new_tokens, rng):
+	# Batch zamanlayıcı başlamadan kuyruğa alınır: çalışan bir zamanlayıcı ilk isteği
+	# gelir gelmez tek başına prefill ederdi. Sabit uzunluk için EOS'ta durulmaz.
+	scheduler = InferenceScheduler(model, tokenizer, max_batch_size=batch_size, max_queue_size=batch_size,
+								   profiler=profiler)
+	scheduler.eos_token_id = None
+	requests = [
+		GenerationRequest([rng.randrange(model.config.vocab_size - 1) for _ in range(prompt_length)], new_tokens,
+						  0.0, 0, do_sample=False)
+		for _ in range(batch_size)
+	]
+	for request in requests:
+		scheduler.submit_request(request)
+	scheduler.start()
+	try:
+		for request in requests:
+			request.result()
+	finally:
+		scheduler.stop()
+	# Aynı prefill geçişindeki istekler aynı süreyi taşır
+	if len({request.prefill_seconds for request in requests}) != 1:
+		raise RuntimeError(f"batch={batch_size} tek prefill geçişinde alınmadı")
+	return requests
+
+def measure_generation(model, tokenizer, batch_sizes, prompt_lengths, new_tokens, repeats=3, seed=0):
+	"""
+	Zamanlayıcının gerçek yolunu (prefill + sürekli batch çözümleme) ölçer. Her
+	batch boş bir zamanlayıcıya önceden kuyruklanır ve tek prefill geçişinde alınır;
+	sabit uzunluk için EOS'ta durulmaz. Her ölçüm için en iyi tekrar raporlanır.
+	"""
+	# Uygulamadaki gibi kurulu olmayan bir profiler ile: kapalı profillemenin maliyeti de ölçüme girer
+	profiler = GenerationProfiler()
+	max_positions = getattr(model.config, 'max_position_embeddings', 2048)
+	rng = random.Random(seed)
+	results = {}
+	_run_batch(model, tokenizer, profiler, 1, min(prompt_lengths), 4, rng)  # Isınma
+	for batch_size in batch_sizes:
+		for prompt_length in prompt_lengths:
+			if prompt_length + new_tokens > max_positions:
+				continue
+			best_prefill, best_decode, best_ttft = 0.0, 0.0, None
+			for _ in range(repeats):
+				requests = _run_batch(model, tokenizer, profiler, batch_size, prompt_length, new_tokens, rng)
+				prefill_seconds = requests[0].prefill_seconds
+				first_token = min(request.first_token_at for request in requests)
+				finished = max(request.finished_at for request in requests)
+				ttft = max(request.first_token_at - request.admitted_at for request in requests)
+				decoded = sum(len(request.output_ids) - 1 for request in requests)
+				best_prefill = max(best_prefill, batch_size * prompt_length / prefill_seconds)
+				if finished > first_token:
+					best_decode = max(best_decode, decoded / (finished - first_token))
+				best_ttft = ttft if best_ttft is None else min(best_ttft, ttft)
+			key = f"generation.b{batch_size}_p{prompt_length}"
+			results[f"{key}.prefill_tokens_per_sec"] = best_prefill
+			results[f"{key}.decode_tokens_per_sec"] = best_decode
+			results[f"{key}.ttft_seconds"] = best_ttft
+			print(f"batch={batch_size} prompt={prompt_length}: prefill {best_prefill:.0f} token/sn, "
+				  f"decode {best_decode:.1f} token/sn, ilk token {best_ttft * 1000:.1f} ms")
+	results['generation.peak_rss_mb'] = peak_rss_mb()
+	return results
+
+# ----------------------------
+# TOKENIZER ÖLÇÜMLERİ
+# ----------------------------
+def build_chat_prompts(turns, words_per_turn=120, seed=0):
+	"""Her turda önceki turların tamamını yeniden gönderen çok turlu bir sohbetin prompt'ları."""
+	rng = random.Random(seed)
+	words = ["merhaba", "dünya", "model", "çekirdek", "token", "belge", "soru", "yanıt", "hız", "önbellek",
+			 "the", "quick", "brown", "fox", "3.14", "2024", "it's", "ığdır", "öğüş", "!", "?", "(x)"]
+	history, prompts = "", []
+	for _ in range(turns):
+		prompt = " ".join(rng.choice(words) for _ in range(words_per_turn // 4))
+		prompts.append(history + prompt)
+		history += format_turn(prompt, " ".join(rng.choice(words) for _ in range(words_per_turn)))
+	return prompts
+
+def measure_tokenizer(model_dir, turns=32, repeats=3):
+	"""
+	Yavaş GPT2Tokenizer, hızlı tokenizer ve önbellekli hızlı tokenizer ile çok turlu
+	sohbet prompt'larını kodlar (en iyi tekrar). Sonuçların yavaş tokenizer ile
+	birebir aynı olduğu örnekler ve bu prompt'lar üzerinde doğrulanır.
+	"""
+	slow = GPT2Tokenizer.from_pretrained(model_dir)
+	fast = GPT2TokenizerFast.from_pretrained(model_dir)
+	prompts = build_chat_prompts(turns)
+	tokens = sum(len(ids) for ids in slow(prompts)['input_ids'])
+	mismatches = check_tokenizer_parity(slow, CachedTokenizer(fast, min_chars=0), TOKENIZER_PARITY_SAMPLES + prompts)
+
+	def _best(encode):
+		best = None
+		for _ in range(repeats):
+			started = time.time()
+			encode()
+			elapsed = time.time() - started
+			best = elapsed if best is None else min(best, elapsed)
+		return tokens / best
+
+	def _encode_cached():
+		# Sohbet sırasıyla, her tur ayrı çağrı; önbellek her tekrarda boş başlar
+		cached = CachedTokenizer(fast)
+		for prompt in prompts:
+			cached(prompt)
+
+	results = {
+		'tokenizer.slow_tokens_per_sec': _best(lambda: [slow(prompt) for prompt in prompts]),
+		'tokenizer.fast_tokens_per_sec': _best(lambda: [fast(prompt) for prompt in prompts]),
+		'tokenizer.fast_batch_tokens_per_sec': _best(lambda: fast(prompts)),
+		'tokenizer.cached_tokens_per_sec': _best(_encode_cached),
+		'tokenizer.parity_mismatches': len(mismatches)
+	}
+	print(f"Tokenizer: yavaş {results['tokenizer.slow_tokens_per_sec']:.0f}, hızlı {results['tokenizer.fast_tokens_per_sec']:.0f}, "
+		  f"batch {results['tokenizer.fast_batch_tokens_per_sec']:.0f}, önbellekli {results['tokenizer.cached_tokens_per_sec']:.0f} token/sn, "
+		  f"eşlik hatası: {len(mismatches)}")
+	return results
+
+# ----------------------------
+# VERİTABANI ÖLÇÜMLERİ
+# ----------------------------
+def _query_throughput(calls, timeout=600.0):
+	"""Her biri fn(callback) olan sorguları okuyucu havuzuna birlikte gönderir; saniyedeki sorgu sayısı."""
+	remaining = [len(calls)]
+	lock = threading.Lock()
+	done = threading.Event()
+
+	def _callback(_):
+		with lock:
+			remaining[0] -= 1
+			if not remaining[0]:
+				done.set()
+
+	started = time.time()
+	for fn in calls:
+		fn(_callback)
+	done.wait(timeout)
+	return (len(calls) - remaining[0]) / (time.time() - started)
+
+def _query_latencies(calls, timeout=10.0):
+	"""Sorguları tek tek (kuyruk beklemesi olmadan) çalıştırıp gecikmelerini döndürür."""
+	latencies = []
+	for fn in calls:
+		done = threading.Event()
+		started = time.time()
+		fn(lambda _: done.set())
+		if done.wait(timeout):
+			latencies.append(time.time() - started)
+	return latencies
+
+def _percentile(values, q):
+	values = sorted(values)
+	return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+def measure_database(db_path, row_counts, prompts_per_chat=100, queries=2000, seed=0):
+	"""
+	Sohbet veritabanına grup commit yolundan (save_prompt) satır ekler ve her
+	boyutta sayfalı geçmiş, sohbet listesi ve tam metin arama sorgularını ölçer. Satırlar aynı
+	dosyaya artımlı eklenir (ör. 10k, 100k, 1M).
+	"""
+	db = ChatHistoryDB(path=db_path)
+	rng = random.Random(seed)
+	results = {}
+	chats = []  # (chat_id, user_ip)
+	inserted = 0
+	response = "yanıt " * 40
+	try:
+		for row_count in sorted(row_counts):
+			# Sohbetler ölçüm dışında açılır (create_chat her seferinde commit'i bekler)
+			while len(chats) * prompts_per_chat < row_count:
+				user_ip = f"10.0.{len(chats) // 250}.{len(chats) % 250}"
+				chats.append((db.create_chat(user_ip), user_ip))
+			started, previous = time.time(), inserted
+			while inserted < row_count:
+				db.save_prompt(chats[inserted // prompts_per_chat][0], f"prompt {inserted}", response, turn_tokens=48)
+				inserted += 1
+			db.queue.join()
+			key = f"db.rows_{row_count}"
+			results[f"{key}.insert_rows_per_sec"] = (row_count - previous) / (time.time() - started)
+
+			sample = [rng.choice(chats) for _ in range(queries)]
+			history = [
+				lambda callback, chat_id=chat_id: db.get_prompts(chat_id, limit=50, callback=callback)
+				for chat_id, _ in sample
+			]
+			chat_list = [
+				lambda callback, user_ip=user_ip: db.get_chat_summaries(user_ip, limit=100, callback=callback)
+				for _, user_ip in sample
+			]
+			# Kullanıcının kendi sohbetlerinden birindeki bir prompt'u arar (son kelime önek olarak eşlenir)
+			search = []
+			for _ in range(queries):
+				index = rng.randrange(len(chats))
+				row = index * prompts_per_chat + rng.randrange(prompts_per_chat)
+				search.append(lambda callback, user_ip=chats[index][1], query=f"prompt {row}":
+							  db.search_prompts(user_ip, query, limit=20, callback=callback))
+			# Verim: tüm sorgular birlikte; gecikme: ayrı bir geçişte tek tek
+			results[f"{key}.history_queries_per_sec"] = _query_throughput(history)
+			results[f"{key}.history_p95_seconds"] = _percentile(_query_latencies(history[:200]), 0.95)
+			results[f"{key}.chat_list_queries_per_sec"] = _query_throughput(chat_list)
+			results[f"{key}.chat_list_p95_seconds"] = _percentile(_query_latencies(chat_list[:200]), 0.95)
+			results[f"{key}.search_queries_per_sec"] = _query_throughput(search)
+			results[f"{key}.search_p95_seconds"] = _percentile(_query_latencies(search[:200]), 0.95)
+			print(f"{row_count} satır: ekleme {results[f'{key}.insert_rows_per_sec']:.0f} satır/sn, "
+				  f"geçmiş {results[f'{key}.history_queries_per_sec']:.0f} sorgu/sn "
+				  f"(p95 {results[f'{key}.history_p95_seconds'] * 1000:.2f} ms), "
+				  f"sohbet listesi {results[f'{key}.chat_list_queries_per_sec']:.0f} sorgu/sn, "
+				  f"arama {results[f'{key}.search_queries_per_sec']:.0f} sorgu/sn "
+				  f"(p95 {results[f'{key}.search_p95_seconds'] * 1000:.2f} ms)")
+	finally:
+		db.close()
+	return results
+
+# ----------------------------
+# TEMEL ÇİZGİ KARŞILAŞTIRMASI
+# ----------------------------
+def higher_is_better(metric):
+	return metric.endswith("_per_sec")
+
+def compare_to_baseline(metrics, baseline, tolerance):
+	"""
+	Her iki sonuçta da bulunan metrikleri karşılaştırır. Hız metriklerinde düşüş,
+	süre ve bellek metriklerinde artış tolerance oranını aşarsa gerileme sayılır.
+	"""
+	comparison, regressions = {}, []
+	for metric, value in sorted(metrics.items()):
+		previous = baseline.get(metric)
+		if not previous or value is None:
+			continue
+		change = (value - previous) / previous
+		regressed = change < -tolerance if higher_is_better(metric) else change > tolerance
+		comparison[metric] = {'baseline': previous, 'current': value, 'change': change, 'regression': regressed}
+		if regressed:
+			regressions.append(metric)
+	return comparison, regressions
+
+# ----------------------------
+# KOMUT SATIRI
+# ----------------------------
+def parse_int_list(text):
+	return [int(value) for value in text.split(",") if value]
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmarks for model loading, generation and chat DB hot paths (no UI)")
+	parser.add_argument("--model-dir", type=str, default=None, help="Real model directory (default: tiny random GPT-Neo built offline)")
+	parser.add_argument("--precision", choices=sorted(PRECISION_DTYPES), default="fp32", help="Weight precision for loading and generation")
+	parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads (default: torch default)")
+	parser.add_argument("--batch-sizes", type=parse_int_list, default=[1, 4], help="Comma-separated batch sizes")
+	parser.add_argument("--prompt-lengths", type=parse_int_list, default=[32, 256], help="Comma-separated prompt lengths in tokens")
+	parser.add_argument("--new-tokens", type=int, default=32, help="Tokens generated per request")
+	parser.add_argument("--repeats", type=int, default=3, help="Repeats per generation measurement (best is reported)")
+	parser.add_argument("--db-rows", type=parse_int_list, default=[10000, 100000], help="Comma-separated prompt row counts, e.g. 10000,100000,1000000")
+	parser.add_argument("--skip", type=str, default="", help="Comma-separated suites to skip: load,generation,tokenizer,db")
+	parser.add_argument("--output", "-o", type=str, default=None, help="Write results JSON to this file")
+	parser.add_argument("--baseline", type=str, default=None, help="Results JSON to compare against; exit code 1 on regression")
+	parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative change before a metric counts as a regression")
+	args = parser.parse_args()
+
+	skip = set(args.skip.split(","))
+	if args.threads:
+		torch.set_num_threads(args.threads)
+	work_dir = tempfile.mkdtemp(prefix="neo_benchmark_")
+	model_dir = args.model_dir
+	if model_dir is None:
+		model_dir = os.path.join(work_dir, "model")
+		os.makedirs(model_dir)
+		build_tiny_model(model_dir)
+	metrics = {}
+	try:
+		if "load" not in skip:
+			metrics.update(measure_cold_start(model_dir, args.precision))
+			print(f"Soğuk yükleme: {metrics['load.cold_seconds_median']:.2f} sn, tepe RSS {metrics['load.peak_rss_mb']:.0f} MB")
+		if "generation" not in skip:
+			config = AutoConfig.from_pretrained(model_dir)
+			model, _ = load_model_mmap(model_dir, config, PRECISION_DTYPES[args.precision])
+			tokenizer = GPT2Tokenizer.from_pretrained(model_dir)
+			metrics.update(measure_generation(
+				model, tokenizer, args.batch_sizes, args.prompt_lengths, args.new_tokens, args.repeats
+			))
+		if "tokenizer" not in skip:
+			metrics.update(measure_tokenizer(model_dir))
+		if "db" not in skip:
+			metrics.update(measure_database(os.path.join(work_dir, "chat_history.db"), args.db_rows))
+	finally:
+		shutil.rmtree(work_dir, ignore_errors=True)
+
+	results = {
+		'meta': {
+			'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"),
+			'model': args.model_dir or "tiny-random-gpt-neo",
+			'precision': args.precision,
+			'threads': torch.get_num_threads(),
+			'cpu_count': os.cpu_count(),
+			'platform': platform.platform(),
+			'python': platform.python_version(),
+			'torch': torch.__version__,
+			'args': {name: value for name, value in vars(args).items() if name not in ("output", "baseline")}
+		},
+		'metrics': metrics
+	}
+
+	regressions = []
+	if args.baseline:
+		with open(args.baseline, encoding="utf-8") as file:
+			baseline = json.load(file)
+		results['comparison'], regressions = compare_to_baseline(metrics, baseline['metrics'], args.tolerance)
+		for metric, row in results['comparison'].items():
+			flag = "GERİLEME" if row['regression'] else ""
+			print(f"{metric}: {row['baseline']:.4g} -> {row['current']:.4g} ({row['change'] * 100:+.1f}%) {flag}")
+		results['regressions'] = regressions
+
+	text = json.dumps(results, indent=2)
+	if args.output:
+		with open(args.output, "w", encoding="utf-8") as file:
+			file.write(text)
+	else:
+		print(text)
+	if metrics.get('tokenizer.parity_mismatches'):
+		print("Hızlı tokenizer yavaş tokenizer ile aynı token'ları üretmiyor")
+		raise SystemExit(1)
+	if regressions:
+		print(f"{len(regressions)} metrikte gerileme (tolerans %{args.tolerance * 100:.0f})")
+		raise SystemExit(1)
+
+if __name__ == "__main__":
+	main()
@@ -1,57 +1,365 @@
 import os
+import sys
 import re
+import gc
+import glob
+import json
+import io
+import tempfile
+import concurrent.futures
+import asyncio
+import hashlib
+import unicodedata
 import time
+import struct
+import resource
 import queue
 import threading
+import itertools
+import math
+import bisect
+import multiprocessing
 import sqlite3
 import psutil
 import torch
 import http
 from datetime import datetime
-from nicegui import ui, app
-from transformers import AutoConfig, GPTNeoForCausalLM, GPT2Tokenizer
-from safetensors.torch import load_file
+from nicegui import ui, app, Client
+from transformers import AutoConfig, AutoModel, AutoTokenizer, GPTNeoForCausalLM, GPT2Tokenizer, GPT2TokenizerFast
+from safetensors.torch import load_file, save_file
 from PyPDF2 import PdfReader
 from docx import Document
 from bs4 import BeautifulSoup
+import html
 import html2text
 import argparse
-from fastapi import Request, FastAPI
-from contextlib import asynccontextmanager
+from fastapi import Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from contextlib import nullcontext
 import traceback
+import hmac
+from collections import Counter, OrderedDict
 
 # ----------------------------
-# LIFESPAN YÖNETİMİ (YENİ YÖNTEM)
+# ARAYÜZ GÜNCELLEME DAĞITICISI
 # ----------------------------
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-	# UI güncelleme kuyruğunu başlat
-	db = ChatHistoryDB()
-	db._process_ui_updates()
-	yield
+class UIDispatcher:
+	"""
+	Arka plan thread'lerinden gelen sonuçları (DB callback'leri vb.) NiceGUI olay
+	döngüsüne aktarır ve ilgili istemcinin bağlamında çalıştırır. Yoklama yoktur:
+	her sonuç call_soon_threadsafe ile hemen döngüye verilir.
+	"""
+	def __init__(self):
+		self.loop = None
+		self.lock = threading.Lock()
+		self.pending = 0
+		self.delivered = 0
+		self.dropped = 0
+		self.total_latency = 0.0
+		self.max_latency = 0.0
+
+	def bind(self):
+		"""Uygulama açılışında (olay döngüsü içinde) çağrılır."""
+		self.loop = asyncio.get_running_loop()
+
+	def post(self, callback, result=None, client=None):
+		"""callback(result)'ı olay döngüsünde, verilmişse client bağlamında çalıştırır."""
+		submitted = time.time()
+		with self.lock:
+			self.pending += 1
+		if self.loop is None or self.loop.is_closed():
+			# Arayüz henüz başlamadı (ör. betik kullanımı): doğrudan çalıştır
+			self._deliver(callback, result, client, submitted)
+			return
+		self.loop.call_soon_threadsafe(self._deliver, callback, result, client, submitted)
+
+	def _deliver(self, callback, result, client, submitted):
+		latency = time.time() - submitted
+		with self.lock:
+			self.pending -= 1
+			self.delivered += 1
+			self.total_latency += latency
+			self.max_latency = max(self.max_latency, latency)
+
+		if client is not None and client.id not in Client.instances:
+			with self.lock:
+				self.dropped += 1
+			return  # Sekme kapanmış; güncellenecek eleman kalmadı
+		try:
+			if client is not None:
+				with client:
+					callback(result)
+			else:
+				callback(result)
+		except Exception as e:
+			print(f"UI callback hatası: {e}")
+			traceback.print_exc()
+
+	def stats(self):
+		with self.lock:
+			return {
+				'queue_depth': self.pending,
+				'delivered': self.delivered,
+				'dropped': self.dropped,
+				'avg_latency_ms': 1000 * self.total_latency / self.delivered if self.delivered else 0.0,
+				'max_latency_ms': 1000 * self.max_latency
+			}
+
+# Tüm oturumların paylaştığı tek dağıtıcı
+ui_dispatcher = UIDispatcher()
+
+class LoopSignal:
+	"""
+	Arka plan thread'lerinin olay döngüsündeki bir bekleyiciyi uyandırması (yoklama yerine).
+	Yazan taraf önce durumu değiştirip sonra set() çağırır; bekleyen taraf clear() ile
+	durumu okur ve değişiklik yoksa wait() ile uyur, böylece hiçbir uyandırma kaçmaz.
+	"""
+	def __init__(self, loop=None):
+		self.loop = loop or asyncio.get_running_loop()
+		self.event = asyncio.Event()
+
+	def set(self, *_):
+		# Kurulu olay zaten bekleyeni uyandıracak; her token için döngüye iş eklenmez
+		if not self.event.is_set():
+			self.loop.call_soon_threadsafe(self.event.set)
+
+	def clear(self):
+		self.event.clear()
+
+	async def wait(self, timeout=None):
+		try:
+			await asyncio.wait_for(self.event.wait(), timeout)
+		except asyncio.TimeoutError:
+			pass
+
+# ----------------------------
+# METRİKLER (PROMETHEUS)
+# ----------------------------
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+class Histogram:
+	"""Prometheus histogramı: kova sayaçları, toplam ve adet (kovalar render'da kümülatif yazılır)."""
+	def __init__(self, name, help_text, buckets):
+		self.name = name
+		self.help_text = help_text
+		self.buckets = sorted(buckets)
+		self.counts = [0] * (len(self.buckets) + 1)  # Son eleman: +Inf
+		self.total = 0.0
+		self.count = 0
+		self.min = None
+		self.max = None
+		self.lock = threading.Lock()
+
+	def observe(self, value):
+		with self.lock:
+			self.counts[bisect.bisect_left(self.buckets, value)] += 1
+			self.total += value
+			self.count += 1
+			self.min = value if self.min is None else min(self.min, value)
+			self.max = value if self.max is None else max(self.max, value)
+
+	def quantile(self, q):
+		"""
+		Kova sınırları arasında doğrusal yaklaşımla q. yüzdelik (gözlem yoksa None).
+		Sınırlar gözlenen en küçük/en büyük değere daraltılır.
+		"""
+		with self.lock:
+			counts, count, smallest, largest = list(self.counts), self.count, self.min, self.max
+		if not count:
+			return None
+		rank = q * count
+		cumulative = 0
+		for i, bucket_count in enumerate(counts):
+			if cumulative + bucket_count >= rank and bucket_count:
+				lower = max(self.buckets[i - 1] if i > 0 else smallest, smallest)
+				upper = min(self.buckets[i] if i < len(self.buckets) else largest, largest)
+				return lower + (upper - lower) * (rank - cumulative) / bucket_count
+			cumulative += bucket_count
+		return largest
+
+	def render(self):
+		with self.lock:
+			counts, total, count = list(self.counts), self.total, self.count
+		lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+		cumulative = 0
+		for bound, bucket_count in zip(self.buckets + [None], counts):
+			cumulative += bucket_count
+			le = "+Inf" if bound is None else repr(float(bound))
+			lines.append(f'{self.name}_bucket{{le="{le}"}} {cumulative}')
+		lines.append(f"{self.name}_sum {total}")
+		lines.append(f"{self.name}_count {count}")
+		return lines
+
+def _format_labels(labels):
+	if not labels:
+		return ""
+	escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for value in labels.values())
+	return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+def read_cpu_temperatures():
+	"""Sensör etiketi -> °C (ör. 'coretemp/Core 3'); sensör yoksa boş sözlük."""
+	try:
+		temps = psutil.sensors_temperatures() or {}
+	except (AttributeError, OSError):
+		return {}
+	return {
+		f"{name}/{entry.label or index}": entry.current
+		for name, entries in temps.items() for index, entry in enumerate(entries)
+	}
+
+def read_throttle_counts():
+	"""CPU -> termal kısma (throttle) olay sayısı (Linux sysfs; yoksa boş sözlük)."""
+	counts = {}
+	for path in glob.glob("/sys/devices/system/cpu/cpu[0-9]*/thermal_throttle/core_throttle_count"):
+		cpu = int(re.search(r"cpu(\d+)", path).group(1))
+		counts[cpu] = _read_sysfs_int(path, 0)
+	return counts
+
+class InferenceMetrics:
+	"""
+	İstek başına gecikme/hız histogramları ve istek anında toplanan göstergeler
+	(kuyruk derinlikleri, önbellek isabetleri, RSS, sıcaklık). render() Prometheus
+	metin biçimini üretir.
+	"""
+	def __init__(self):
+		self.queue_wait = Histogram("neo_queue_wait_seconds", "Time a request waited in the scheduler queue", LATENCY_BUCKETS)
+		self.prefill = Histogram("neo_prefill_seconds", "Prefill forward pass duration per request", LATENCY_BUCKETS)
+		self.time_to_first_token = Histogram(
+			"neo_time_to_first_token_seconds", "Submit to first generated token", LATENCY_BUCKETS
+		)
+		self.decode_rate = Histogram(
+			"neo_decode_tokens_per_second", "Decode speed per request after the first token",
+			(0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+		)
+		self.request_duration = Histogram("neo_request_seconds", "Submit to finish per request", LATENCY_BUCKETS)
+		self.batch_size = Histogram("neo_batch_size", "Active rows per decoding step", (1, 2, 4, 8, 16, 32, 64))
+		self.db_commit = Histogram(
+			"neo_db_commit_seconds", "Chat DB group commit duration",
+			(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+		)
+		self.histograms = [
+			self.queue_wait, self.prefill, self.time_to_first_token, self.decode_rate,
+			self.request_duration, self.batch_size, self.db_commit
+		]
+		self.lock = threading.Lock()
+		self.finished = {}  # finish_reason -> istek sayısı
+		self.generated_tokens = 0
+		self.collectors = []
+
+	def observe_request(self, request):
+		"""Biten bir üretim isteğinin zamanlarını histogramlara işler."""
+		with self.lock:
+			self.finished[request.finish_reason] = self.finished.get(request.finish_reason, 0) + 1
+			self.generated_tokens += len(request.output_ids)
+		if request.admitted_at is not None:
+			self.queue_wait.observe(request.admitted_at - request.submitted_at)
+		if request.prefill_seconds is not None:
+			self.prefill.observe(request.prefill_seconds)
+		if request.first_token_at is not None:
+			self.time_to_first_token.observe(request.first_token_at - request.submitted_at)
+			decode_seconds = request.finished_at - request.first_token_at
+			if len(request.output_ids) > 1 and decode_seconds > 0:
+				self.decode_rate.observe((len(request.output_ids) - 1) / decode_seconds)
+		self.request_duration.observe(request.finished_at - request.submitted_at)
+
+	def register(self, collector):
+		"""collector() -> [(ad, tür, açıklama, [(etiketler, değer), ...]), ...]; her okumada çağrılır."""
+		self.collectors.append(collector)
+
+	def render(self):
+		lines = []
+		for histogram in self.histograms:
+			lines.extend(histogram.render())
+		with self.lock:
+			finished = dict(self.finished)
+			generated = self.generated_tokens
+		families = [
+			("neo_requests_total", "counter", "Finished generation requests by finish reason",
+			 [({'finish_reason': reason}, count) for reason, count in sorted(finished.items(), key=lambda item: str(item[0]))]),
+			("neo_generated_tokens_total", "counter", "Tokens generated by finished requests", [({}, generated)])
+		]
+		for collector in self.collectors:
+			try:
+				families.extend(collector())
+			except Exception as e:
+				print(f"Metrik toplama hatası: {e}")
+				traceback.print_exc()
+		for name, kind, help_text, samples in families:
+			lines.append(f"# HELP {name} {help_text}")
+			lines.append(f"# TYPE {name} {kind}")
+			for labels, value in samples:
+				lines.append(f"{name}{_format_labels(labels)} {float(value)}")
+		return "\n".join(lines) + "\n"
+
+# Tüm süreç için tek metrik kaydı (worker süreçlerinde ayrı bir kopya oluşur, dışa verilmez)
+metrics = InferenceMetrics()
 
 # ----------------------------
 # VERİTABANI YÖNETİMİ (GÜNCELLENDİ)
 # ----------------------------
+def fts_match_query(query, user_ip):
+	"""
+	Kullanıcı girdisinden güvenli bir FTS5 sorgusu kurar: her kelime tırnaklı bir
+	terimdir (FTS sözdizimi çalışmaz), son kelime önek olarak aranır. Sorgu
+	user_ip sütununun başında o kullanıcının IP'si geçen satırlarla sınırlanır.
+	"""
+	terms = re.findall(r"\w+", query)
+	if not terms:
+		return None
+	phrases = " ".join(f'"{term}"' for term in terms) + "*"
+	user = '"' + user_ip.replace('"', '""') + '"'
+	return f"user_ip : ^{user} AND {{prompt response}} : ({phrases})"
+
+def highlight_snippet(snippet):
+	"""FTS5 kesitini HTML olarak kaçışlar; char(2)/char(3) işaretlerini <mark> etiketine çevirir."""
+	return html.escape(snippet).replace("\x02", "<mark>").replace("\x03", "</mark>")
+
 class ChatHistoryDB:
-	def __init__(self):
+	"""
+	WAL modunda çalışan sohbet veritabanı. Yazmalar tek bir yazıcı thread'inde kısa bir
+	zaman penceresinde toplanıp tek commit ile yazılır (group commit); okumalar yazıcıyı
+	beklemeden salt okunur bağlantı havuzunda çalışır.
+	"""
+	def __init__(self, path="chat_history.db", readers=2, commit_window=0.005, max_batch=256, dispatcher=None):
+		self.path = path
+		self.dispatcher = dispatcher or ui_dispatcher
+		self.commit_window = commit_window
+		self.max_batch = max_batch
 		self.queue = queue.Queue()
-		self.ui_update_queue = queue.Queue()
+		self.read_queue = queue.Queue()
 		self.conn = None
+		# Hata bildirimi: on_error(exc, işlem adı) dağıtıcı üzerinden, isteği yapan istemcide çağrılır
+		self.on_error = None
+		self.errors = 0
+		self.commits = 0
+		self.committed_tasks = 0
+		self.search_enabled = False
 		self._init_db()
 
 		# Worker thread'leri başlat
 		self.worker_thread = threading.Thread(target=self._db_worker, daemon=True)
-		self.ui_update_thread = threading.Thread(target=self._process_ui_updates, daemon=True)
+		self.reader_threads = [
+			threading.Thread(target=self._read_worker, daemon=True) for _ in range(max(1, readers))
+		]
 
 		self.worker_thread.start()
-		self.ui_update_thread.start()  # Bu kritik öneme sahip!
-		print("DB ve UI Update thread'leri başlatıldı")  # Debug
+		for reader in self.reader_threads:
+			reader.start()
+		print("DB thread'leri başlatıldı")  # Debug
 
 	def _init_db(self):
-		self.conn = sqlite3.connect("chat_history.db", check_same_thread=False)
+		# Transaction'lar yazıcı tarafından açıkça yönetilir (BEGIN/SAVEPOINT/COMMIT)
+		self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+		self.conn.execute("PRAGMA journal_mode=WAL")
+		# WAL ile NORMAL: her commit'te fsync yok, yine de çökme sonrası tutarlı
+		self.conn.execute("PRAGMA synchronous=NORMAL")
 		self._create_table()
 
+	def _connect_reader(self):
+		conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+		conn.execute("PRAGMA query_only=ON")
+		return conn
+
 	def _create_table(self):
 		c = self.conn.cursor()
 		c.execute('''CREATE TABLE IF NOT EXISTS chats
@@ -59,8 +367,67 @@ class ChatHistoryDB:
 		c.execute('''CREATE TABLE IF NOT EXISTS prompts
 					 (id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id INTEGER, timestamp TEXT,
 					 prompt TEXT, response TEXT, FOREIGN KEY (chat_id) REFERENCES chats(id))''')
+		# Kenar çubuğu ve sohbet geçmişi sorguları tablo taraması yapmasın
+		c.execute("CREATE INDEX IF NOT EXISTS idx_chats_user_ip ON chats(user_ip, timestamp, id)")
+		c.execute("CREATE INDEX IF NOT EXISTS idx_prompts_chat_id ON prompts(chat_id, id)")
+		# Tur başına token sayısı (bağlam oluştururken her seferinde yeniden tokenize edilmesin)
+		columns = [row[1] for row in c.execute("PRAGMA table_info(prompts)")]
+		if 'turn_tokens' not in columns:
+			c.execute("ALTER TABLE prompts ADD COLUMN turn_tokens INTEGER")
+		self._create_search_index(c)
 		self.conn.commit()
 
+	def _create_search_index(self, c):
+		"""
+		prompts tablosunu yansıtan FTS5 indeksi. İçerik ayrıca saklanmaz: indeks
+		prompt/yanıtları ve sohbetin user_ip'sini birleştiren görünümden okur, tetikleyiciler
+		her ekleme, silme ve güncellemede indeksi eşitler. Tablo eski bir veritabanında
+		sonradan oluşturulduysa o ana kadarki turlar search_backfill'de kaydedilen aralıkta
+		kalır ve backfill_search_index ile eklenir; bu aralıktaki satırlar tetikleyicilerce atlanır.
+		"""
+		exists = c.execute("SELECT 1 FROM sqlite_master WHERE name='prompts_fts'").fetchone()
+		try:
+			c.execute('''CREATE VIEW IF NOT EXISTS prompts_search_content AS
+						 SELECT prompts.id AS id, prompts.prompt AS prompt, prompts.response AS response,
+						 chats.user_ip AS user_ip FROM prompts JOIN chats ON chats.id = prompts.chat_id''')
+			# remove_diacritics: "söyle" araması "soyle" ile de bulunur; prefix: yazarken arama için
+			c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS prompts_fts USING fts5(
+						 prompt, response, user_ip, content='prompts_search_content', content_rowid='id',
+						 tokenize='unicode61 remove_diacritics 2', prefix='2 3')''')
+		except sqlite3.OperationalError as e:
+			print(f"Sohbet araması kapalı (SQLite FTS5 desteği yok): {e}")
+			return
+		c.execute("CREATE TABLE IF NOT EXISTS search_backfill (done INTEGER, upto INTEGER)")
+		if not exists:
+			upto = c.execute("SELECT COALESCE(MAX(id), 0) FROM prompts").fetchone()[0]
+			if upto:
+				c.execute("INSERT INTO search_backfill (done, upto) VALUES (0, ?)", (upto,))
+
+		# Henüz indekslenmemiş (backfill bekleyen) satır için 'delete' indeksi bozacağından atlanır.
+		# Silmede sohbetin user_ip'si gerekir: delete_chat önce prompts'u, sonra chats'i siler
+		indexed = "NOT EXISTS (SELECT 1 FROM search_backfill WHERE old.id > done AND old.id <= upto)"
+		user_ip = "(SELECT user_ip FROM chats WHERE id = {}.chat_id)"
+		c.execute(f'''CREATE TRIGGER IF NOT EXISTS prompts_fts_insert AFTER INSERT ON prompts BEGIN
+					  INSERT INTO prompts_fts (rowid, prompt, response, user_ip)
+					  VALUES (new.id, new.prompt, new.response, {user_ip.format('new')});
+					  END''')
+		c.execute(f'''CREATE TRIGGER IF NOT EXISTS prompts_fts_delete AFTER DELETE ON prompts WHEN {indexed} BEGIN
+					  INSERT INTO prompts_fts (prompts_fts, rowid, prompt, response, user_ip)
+					  VALUES ('delete', old.id, old.prompt, old.response, {user_ip.format('old')});
+					  END''')
+		c.execute(f'''CREATE TRIGGER IF NOT EXISTS prompts_fts_update AFTER UPDATE OF prompt, response ON prompts
+					  WHEN {indexed} BEGIN
+					  INSERT INTO prompts_fts (prompts_fts, rowid, prompt, response, user_ip)
+					  VALUES ('delete', old.id, old.prompt, old.response, {user_ip.format('old')});
+					  INSERT INTO prompts_fts (rowid, prompt, response, user_ip)
+					  VALUES (new.id, new.prompt, new.response, {user_ip.format('new')});
+					  END''')
+		self.search_enabled = True
+		pending = c.execute("SELECT upto - done FROM search_backfill").fetchone()
+		if pending:
+			print(f"Arama indeksinde olmayan en fazla {pending[0]} eski tur var; "
+				  "eklemek için: python neo_NiceGUI.py --backfill-search")
+
 	# ----------------------------
 	# CALLBACK DESTEKLİ FONKSİYONLAR
 	# ----------------------------
@@ -78,72 +445,528 @@ class ChatHistoryDB:
 		self.queue.put((_db_task, (user_ip,), {}))
 		return response_queue.get(timeout=10.0)
 
-	def get_chats(self, user_ip, callback=None):
-		def _db_task(c, user_ip):
-			c.execute("SELECT * FROM chats WHERE user_ip=? ORDER BY timestamp DESC", (user_ip,))
-			chats = c.fetchall()
-			chat_list = []
-			for chat in chats:
-				c.execute("SELECT * FROM prompts WHERE chat_id=? ORDER BY timestamp", (chat[0],))
-				chat_list.append({"chat": chat, "prompts": c.fetchall()})
-			return chat_list
-		self.queue.put((_db_task, (user_ip,), {'callback': callback}))
-
-	def save_prompt(self, chat_id, prompt, response, callback=None):
-		def _db_task(c, chat_id, prompt, response):
+	def get_chat_summaries(self, user_ip, before=None, limit=100, callback=None, client=None):
+		"""
+		Kenar çubuğu için hafif sohbet listesi (id, zaman, prompt sayısı), yeniden eskiye.
+		before: önceki sayfanın döndürdüğü 'next' değeri; keyset sayfalama ile daha eski
+		sohbetler getirilir.
+		"""
+		def _db_task(c, user_ip, before, limit):
+			query = ("SELECT id, timestamp, (SELECT COUNT(*) FROM prompts WHERE prompts.chat_id = chats.id) "
+					 "FROM chats WHERE user_ip=?")
+			args = [user_ip]
+			if before is not None:
+				query += " AND (timestamp < ? OR (timestamp = ? AND id < ?))"
+				args += [before[0], before[0], before[1]]
+			query += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+			args.append(limit + 1)
+			rows = c.execute(query, args).fetchall()
+			has_more = len(rows) > limit
+			rows = rows[:limit]
+			return {
+				"chats": [{"id": row[0], "timestamp": row[1], "prompt_count": row[2]} for row in rows],
+				"before": before,
+				"next": (rows[-1][1], rows[-1][0]) if has_more else None
+			}
+		self.read_queue.put((_db_task, (user_ip, before, limit), {'callback': callback, 'client': client}))
+
+	def get_prompts(self, chat_id, before_id=None, limit=50, callback=None, client=None):
+		"""
+		Tek bir sohbetin prompt/yanıtlarını eskiden yeniye döndürür. İlk sayfa en son
+		'limit' kaydı içerir; daha eskileri 'next_before_id' ile keyset sayfalanır.
+		"""
+		def _db_task(c, chat_id, before_id, limit):
+			query = "SELECT id, timestamp, prompt, response FROM prompts WHERE chat_id=?"
+			args = [chat_id]
+			if before_id is not None:
+				query += " AND id < ?"
+				args.append(before_id)
+			query += " ORDER BY id DESC LIMIT ?"
+			args.append(limit + 1)
+			rows = c.execute(query, args).fetchall()
+			has_more = len(rows) > limit
+			rows = rows[:limit]
+			rows.reverse()
+			return {
+				"chat_id": chat_id,
+				"prompts": [{"id": row[0], "timestamp": row[1], "prompt": row[2], "response": row[3]} for row in rows],
+				"before_id": before_id,
+				"next_before_id": rows[0][0] if has_more else None
+			}
+		self.read_queue.put((_db_task, (chat_id, before_id, limit), {'callback': callback, 'client': client}))
+
+	def save_prompt(self, chat_id, prompt, response, turn_tokens=None, callback=None, client=None):
+		"""Callback'e eklenen satır verilir (arayüz yalnızca bu turu ekler)."""
+		def _db_task(c, chat_id, prompt, response, turn_tokens):
 			timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-			c.execute("INSERT INTO prompts (chat_id, timestamp, prompt, response) VALUES (?, ?, ?, ?)",
-					 (chat_id, timestamp, prompt, response))
-			return True
-		self.queue.put((_db_task, (chat_id, prompt, response), {'callback': callback}))
+			c.execute("INSERT INTO prompts (chat_id, timestamp, prompt, response, turn_tokens) VALUES (?, ?, ?, ?, ?)",
+					 (chat_id, timestamp, prompt, response, turn_tokens))
+			return {"id": c.lastrowid, "chat_id": chat_id, "timestamp": timestamp, "prompt": prompt, "response": response}
+		self.queue.put((_db_task, (chat_id, prompt, response, turn_tokens), {'callback': callback, 'client': client}))
+
+	def get_recent_turns(self, chat_id, limit=256, timeout=10.0):
+		"""
+		Bağlam oluşturmak için sohbetin son turlarını yeniden eskiye döndürür (senkron).
+		turn_tokens henüz hesaplanmamış eski kayıtlarda None'dır.
+		"""
+		response_queue = queue.Queue()
+
+		def _db_task(c, chat_id, limit):
+			try:
+				rows = c.execute("SELECT id, prompt, response, turn_tokens FROM prompts WHERE chat_id=? "
+								 "ORDER BY id DESC LIMIT ?", (chat_id, limit)).fetchall()
+			except Exception:
+				response_queue.put([])
+				raise
+			response_queue.put([
+				{"id": row[0], "prompt": row[1], "response": row[2], "turn_tokens": row[3]} for row in rows
+			])
+
+		self.read_queue.put((_db_task, (chat_id, limit), {}))
+		return response_queue.get(timeout=timeout)
+
+	def get_chat_owner(self, chat_id, timeout=10.0):
+		"""Sohbetin user_ip'sini döndürür (senkron); sohbet yoksa None."""
+		response_queue = queue.Queue()
 
-	def delete_chat(self, chat_id, callback=None):
 		def _db_task(c, chat_id):
+			try:
+				row = c.execute("SELECT user_ip FROM chats WHERE id=?", (chat_id,)).fetchone()
+			except Exception:
+				response_queue.put(None)
+				raise
+			response_queue.put(row[0] if row else None)
+
+		self.read_queue.put((_db_task, (chat_id,), {}))
+		return response_queue.get(timeout=timeout)
+
+	def set_turn_tokens(self, counts):
+		"""[(prompt_id, turn_tokens), ...] değerlerini kaydeder."""
+		def _db_task(c, counts):
+			c.executemany("UPDATE prompts SET turn_tokens=? WHERE id=?", [(tokens, prompt_id) for prompt_id, tokens in counts])
+			return True
+		self.queue.put((_db_task, (counts,), {}))
+
+	def search_prompts(self, user_ip, query, limit=20, callback=None, client=None):
+		"""
+		Kullanıcının kayıtlı prompt ve yanıtlarında tam metin araması. Sonuçlar bm25'e
+		göre (prompt eşleşmeleri iki kat ağırlıklı) sıralanır; her sonuçta eşleşen
+		kelimeleri <mark> ile işaretlenmiş, HTML olarak güvenli bir kesit bulunur.
+		"""
+		def _db_task(c, user_ip, query, limit):
+			match = fts_match_query(query, user_ip)
+			if match is None or not self.search_enabled:
+				return {"query": query, "results": []}
+			# user_ip indekste de eşlendiği için yalnızca bu kullanıcının eşleşmeleri sıralanır;
+			# chats.user_ip karşılaştırması tam eşitliği garanti eder
+			rows = c.execute(
+				"SELECT prompts.id, prompts.chat_id, prompts.timestamp, "
+				"snippet(prompts_fts, 0, char(2), char(3), '…', 16), "
+				"snippet(prompts_fts, 1, char(2), char(3), '…', 16) "
+				"FROM prompts_fts JOIN prompts ON prompts.id = prompts_fts.rowid "
+				"JOIN chats ON chats.id = prompts.chat_id "
+				"WHERE prompts_fts MATCH ? AND chats.user_ip = ? "
+				"ORDER BY bm25(prompts_fts, 2.0, 1.0, 0.0) LIMIT ?",
+				(match, user_ip, limit)
+			).fetchall()
+			return {"query": query, "results": [
+				{"id": row[0], "chat_id": row[1], "timestamp": row[2],
+				 "snippet": highlight_snippet(row[3] if "\x02" in row[3] or "\x02" not in row[4] else row[4])}
+				for row in rows
+			]}
+		self.read_queue.put((_db_task, (user_ip, query, limit), {'callback': callback, 'client': client}))
+
+	def backfill_search_index(self, batch_size=20000, progress=None, timeout=600.0):
+		"""
+		Arama indeksi oluşturulmadan önce kaydedilmiş turları indekse ekler. Her parti
+		yazıcı kuyruğundan ayrı bir transaction'da yazılır; çalışan sunucunun yazmaları
+		partiler arasında sürer ve yarıda kesilen işlem kaldığı yerden devam eder.
+		progress(eklenen, son id, hedef id) her partiden sonra çağrılır. Eklenen satır sayısını döndürür.
+		"""
+		if not self.search_enabled:
+			return 0
+		added = 0
+		while True:
+			results = queue.Queue()
+
+			def _db_task(c, batch_size):
+				try:
+					row = c.execute("SELECT done, upto FROM search_backfill").fetchone()
+					if row is None or row[0] >= row[1]:
+						c.execute("DELETE FROM search_backfill")
+						return None
+					done, upto = row
+					end = min(done + batch_size, upto)
+					c.execute("INSERT INTO prompts_fts (rowid, prompt, response, user_ip) "
+							  "SELECT id, prompt, response, user_ip FROM prompts_search_content WHERE id > ? AND id <= ?",
+							  (done, end))
+					count = c.rowcount
+					c.execute("UPDATE search_backfill SET done=?", (end,))
+					return count, end, upto
+				except Exception:
+					results.put(False)
+					raise
+
+			self.queue.put((_db_task, (batch_size,), {'callback': results.put}))
+			result = results.get(timeout=timeout)
+			if not result:
+				return added
+			count, end, upto = result
+			added += count
+			if progress is not None:
+				progress(added, end, upto)
+
+	def delete_chat(self, chat_id, callback=None, client=None, user_ip=None):
+		"""user_ip verilmişse sohbet yalnızca o kullanıcınınsa silinir; aksi halde callback'e None verilir."""
+		def _db_task(c, chat_id, user_ip):
+			if user_ip is not None and c.execute(
+					"SELECT 1 FROM chats WHERE id=? AND user_ip=?", (chat_id, user_ip)).fetchone() is None:
+				return None
 			c.execute("DELETE FROM prompts WHERE chat_id=?", (chat_id,))
 			c.execute("DELETE FROM chats WHERE id=?", (chat_id,))
-			return True
-		self.queue.put((_db_task, (chat_id,), {'callback': callback}))
+			return chat_id
+		self.queue.put((_db_task, (chat_id, user_ip), {'callback': callback, 'client': client}))
 
 	# ----------------------------
 	# THREAD-SAFE ÇALIŞAN WORKER
 	# ----------------------------
 	def _db_worker(self):
+		"""
+		Yazıcı: ilk görevi bekler, commit_window süresince gelen diğer görevleri de alır
+		ve hepsini tek transaction'da yazar. Her görev kendi SAVEPOINT'inde çalıştığından
+		hata veren görev yalnızca kendi değişikliklerini geri alır. Callback'ler commit
+		tamamlandıktan sonra tetiklenir.
+		"""
 		while True:
 			task = self.queue.get()
 			if task is None:
+				self.queue.task_done()
 				break
 
-			func, args, kwargs = task
-			try:
-				c = self.conn.cursor()
-				result = func(c, *args)
-				self.conn.commit()
+			batch = [task]
+			deadline = time.time() + self.commit_window
+			stop = False
+			while len(batch) < self.max_batch:
+				remaining = deadline - time.time()
+				try:
+					task = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+				except queue.Empty:
+					break
+				if task is None:
+					self.queue.task_done()
+					stop = True
+					break
+				batch.append(task)
 
-				if 'callback' in kwargs and callable(kwargs['callback']):
-					self.ui_update_queue.put((kwargs['callback'], result))
+			self._commit_batch(batch)
+			if stop:
+				break
 
-			except Exception as e:
+	def _commit_batch(self, batch):
+		completed = []
+		try:
+			started = time.time()
+			c = self.conn.cursor()
+			c.execute("BEGIN")
+			for func, args, kwargs in batch:
+				c.execute("SAVEPOINT task")
+				try:
+					result = func(c, *args)
+				except Exception as e:
+					c.execute("ROLLBACK TO task")
+					c.execute("RELEASE task")
+					self._report_error(e, func, kwargs.get('client'))
+					continue
+				c.execute("RELEASE task")
+				completed.append((kwargs, result))
+			c.execute("COMMIT")
+			metrics.db_commit.observe(time.time() - started)
+			self.commits += 1
+			self.committed_tasks += len(completed)
+
+			for kwargs, result in completed:
+				if 'callback' in kwargs and callable(kwargs['callback']):
+					self.dispatcher.post(kwargs['callback'], result, kwargs.get('client'))
+		except Exception as e:
+			# Commit başarısızsa batch'teki hiçbir değişiklik yazılmamıştır
+			if self.conn.in_transaction:
 				self.conn.rollback()
-			finally:
+			self._report_error(e, "commit")
+		finally:
+			for _ in batch:
 				self.queue.task_done()
 
-	def _process_ui_updates(self):
+	def _read_worker(self):
+		"""Salt okunur bağlantıyla okuma görevlerini yazıcıdan bağımsız çalıştırır."""
+		conn = self._connect_reader()
 		while True:
+			task = self.read_queue.get()
+			if task is None:
+				self.read_queue.task_done()
+				break
+
+			func, args, kwargs = task
 			try:
-				callback, result = self.ui_update_queue.get(timeout=1.0)  # 1 saniye timeout
-				if callback:
-					callback(result)  # Callback'i çalıştır
+				result = func(conn.cursor(), *args)
+				if 'callback' in kwargs and callable(kwargs['callback']):
+					self.dispatcher.post(kwargs['callback'], result, kwargs.get('client'))
+			except Exception as e:
+				self._report_error(e, func, kwargs.get('client'))
+			finally:
+				self.read_queue.task_done()
+		conn.close()
 
-				self.ui_update_queue.task_done()
-			except queue.Empty:
-				time.sleep(0.1)  # CPU'yü tüketmemek için kısa bekleme
-				continue
+	def _report_error(self, error, func, client=None):
+		self.errors += 1
+		name = getattr(func, '__qualname__', str(func))
+		print(f"Veritabanı hatası ({name}): {error}")
+		traceback.print_exception(type(error), error, error.__traceback__)
+		if callable(self.on_error):
+			self.dispatcher.post(lambda _: self.on_error(error, name), None, client)
+
+	def stats(self):
+		return {
+			'pending_writes': self.queue.qsize(),
+			'pending_reads': self.read_queue.qsize(),
+			'commits': self.commits,
+			'committed_tasks': self.committed_tasks,
+			'tasks_per_commit': self.committed_tasks / self.commits if self.commits else 0.0,
+			'errors': self.errors
+		}
+
+	def close(self):
+		"""Bekleyen yazmaları bitirir ve thread'leri durdurur."""
+		self.queue.put(None)
+		for _ in self.reader_threads:
+			self.read_queue.put(None)
+		self.worker_thread.join()
+		for reader in self.reader_threads:
+			reader.join()
+		self.conn.close()
+
+# ----------------------------
+# YANIT ÖNBELLEĞİ
+# ----------------------------
+class ResponseCache:
+	"""
+	Tekrarlanan prompt'lar için kalıcı yanıt önbelleği (ayrı bir SQLite dosyası).
+	Yalnızca deterministik üretimler (greedy veya seed'li örnekleme) önbelleklenir;
+	kayıtlar TTL sonunda geçersiz olur, toplam boyut aşılınca en eski kullanılan silinir.
+	"""
+	def __init__(self, path="response_cache.db", max_bytes=64 * 1024 * 1024, ttl_seconds=7 * 24 * 3600):
+		self.max_bytes = max_bytes
+		self.ttl_seconds = ttl_seconds
+		self.lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+		self.conn = sqlite3.connect(path, check_same_thread=False)
+		self.conn.execute('''CREATE TABLE IF NOT EXISTS responses
+					 (key TEXT PRIMARY KEY, text TEXT, response TEXT, size INTEGER,
+					 created_at REAL, last_used REAL)''')
+		self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)")
+		self.conn.commit()
+		self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+	@staticmethod
+	def is_deterministic(params):
+		"""Aynı girdinin her zaman aynı çıktıyı vereceği üretimler: greedy veya seed'li."""
+		greedy = not (params.get('do_sample', True) and params.get('temperature', 0) > 0)
+		return greedy or params.get('seed') is not None
+
+	@staticmethod
+	def make_key(prompt, reference_text, params):
+		"""
+		Normalize edilmiş prompt, referans belgenin özeti ve üretim parametrelerinden
+		anahtar üretir. Greedy modda sıcaklık/top_k/seed çıktıyı etkilemediği için
+		anahtara katılmaz.
+		"""
+		normalized = " ".join(unicodedata.normalize("NFC", prompt).split())
+		key_params = dict(params)
+		if not (key_params.get('do_sample', True) and key_params.get('temperature', 0) > 0):
+			for name in ('temperature', 'top_k', 'seed', 'do_sample'):
+				key_params.pop(name, None)
+		payload = json.dumps({
+			'prompt': normalized,
+			'reference': hashlib.sha256((reference_text or "").encode('utf-8')).hexdigest(),
+			'params': key_params
+		}, sort_keys=True)
+		return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+	def get(self, key):
+		"""(text, response) döndürür; kayıt yoksa veya süresi dolmuşsa None."""
+		now = time.time()
+		with self.lock:
+			row = self.conn.execute("SELECT text, response, size, created_at FROM responses WHERE key=?", (key,)).fetchone()
+			if row is None:
+				self.misses += 1
+				return None
+			text, response, size, created_at = row
+			if now - created_at > self.ttl_seconds:
+				self.conn.execute("DELETE FROM responses WHERE key=?", (key,))
+				self.conn.commit()
+				self.total_bytes -= size
+				self.misses += 1
+				return None
+			self.conn.execute("UPDATE responses SET last_used=? WHERE key=?", (now, key))
+			self.conn.commit()
+			self.hits += 1
+			return text, response
+
+	def put(self, key, text, response):
+		size = len(text.encode('utf-8')) + len(response.encode('utf-8'))
+		if size > self.max_bytes:
+			return
+		now = time.time()
+		with self.lock:
+			old = self.conn.execute("SELECT size FROM responses WHERE key=?", (key,)).fetchone()
+			if old is not None:
+				self.total_bytes -= old[0]
+			self.conn.execute("INSERT OR REPLACE INTO responses (key, text, response, size, created_at, last_used) "
+							  "VALUES (?, ?, ?, ?, ?, ?)", (key, text, response, size, now, now))
+			self.total_bytes += size
+			self._evict(now)
+			self.conn.commit()
+
+	def _evict(self, now):
+		# Önce süresi dolanlar, sonra bütçe aşıldıkça en eski kullanılanlar silinir
+		expired = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses WHERE created_at < ?",
+									(now - self.ttl_seconds,)).fetchone()[0]
+		if expired:
+			self.conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+			self.total_bytes -= expired
+		while self.total_bytes > self.max_bytes:
+			rows = self.conn.execute("SELECT key, size FROM responses ORDER BY last_used LIMIT 64").fetchall()
+			if not rows:
+				self.total_bytes = 0
+				break
+			for key, size in rows:
+				if self.total_bytes <= self.max_bytes:
+					break
+				self.conn.execute("DELETE FROM responses WHERE key=?", (key,))
+				self.total_bytes -= size
+
+	def stats(self):
+		with self.lock:
+			entries = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+		return {'entries': entries, 'bytes': self.total_bytes, 'hits': self.hits, 'misses': self.misses}
+
+# ----------------------------
+# CPU YERLEŞİMİ (ÇEKİRDEK SABİTLEME / NUMA)
+# ----------------------------
+def parse_cpulist(cpulist):
+	"""'0-3,8,10-11' biçimindeki CPU listesini sayı listesine çevirir."""
+	cpus = []
+	for part in cpulist.strip().split(','):
+		if not part:
+			continue
+		if '-' in part:
+			start, end = part.split('-')
+			cpus.extend(range(int(start), int(end) + 1))
+		else:
+			cpus.append(int(part))
+	return cpus
+
+def _read_sysfs_int(path, default):
+	try:
+		with open(path, 'r') as file:
+			return int(file.read().strip())
+	except (OSError, ValueError):
+		return default
+
+def detect_cpu_topology():
+	"""
+	Bu sürecin kullanabildiği mantıksal CPU'ları cpu, fiziksel çekirdek, soket ve
+	NUMA düğümü bilgisiyle döndürür. /sys okunamazsa her CPU ayrı çekirdek sayılır.
+	"""
+	try:
+		allowed = sorted(os.sched_getaffinity(0))
+	except AttributeError:
+		allowed = list(range(psutil.cpu_count(logical=True) or 1))
+
+	node_of = {}
+	for node_dir in glob.glob('/sys/devices/system/node/node[0-9]*'):
+		node = int(node_dir.rsplit('node', 1)[1])
+		try:
+			with open(os.path.join(node_dir, 'cpulist'), 'r') as file:
+				for cpu in parse_cpulist(file.read()):
+					node_of[cpu] = node
+		except OSError:
+			continue
+
+	topology = []
+	for cpu in allowed:
+		base = f'/sys/devices/system/cpu/cpu{cpu}/topology'
+		package = _read_sysfs_int(os.path.join(base, 'physical_package_id'), 0)
+		core = _read_sysfs_int(os.path.join(base, 'core_id'), cpu)
+		topology.append({'cpu': cpu, 'package': package, 'core': (package, core), 'node': node_of.get(cpu, 0)})
+	return topology
+
+def plan_cpu_placement(selected_cores=None, numa_node=None, service_cores=1):
+	"""
+	Çıkarım ve servis (DB, NiceGUI olay döngüsü) thread'leri için CPU kümelerini
+	belirler. Çıkarım, seçilen NUMA düğümünde (varsayılan: en çok fiziksel
+	çekirdeği olan) her fiziksel çekirdekten bir mantıksal CPU alır; düğümün ilk
+	`service_cores` çekirdeği ve kalan tüm CPU'lar servis thread'lerine bırakılır.
+	"""
+	topology = detect_cpu_topology()
+	allowed = [entry['cpu'] for entry in topology]
+
+	# düğüm -> fiziksel çekirdek -> kardeş (SMT) mantıksal CPU'lar
+	nodes = {}
+	for entry in topology:
+		nodes.setdefault(entry['node'], {}).setdefault(entry['core'], []).append(entry['cpu'])
+	numa_layout = {node: [cpus[0] for cpus in cores.values()] for node, cores in nodes.items()}
+
+	if selected_cores:
+		node = None
+		inference = [cpu for cpu in selected_cores if cpu in allowed] or allowed
+	else:
+		node = numa_node if numa_node in nodes else max(nodes, key=lambda n: len(nodes[n]))
+		physical = numa_layout[node]
+		reserved = min(service_cores, len(physical) - 1)
+		inference = physical[reserved:]
+
+	service = [cpu for cpu in allowed if cpu not in inference] or list(inference)
+	return {
+		'inference': inference,
+		'service': service,
+		'numa_node': node,
+		'numa_layout': numa_layout
+	}
+
+def pin_current_thread(cpus):
+	"""Çağıran thread'i verilen CPU'lara sabitler; sonradan açtığı thread'ler bunu devralır."""
+	try:
+		os.sched_setaffinity(0, cpus)
+	except (AttributeError, OSError) as e:
+		print(f"CPU sabitleme yapılamadı: {e}")
+
+def sweep_thread_counts(model, cpus):
+	"""
+	Farklı intra-op thread sayıları için tokens/sn ölçer; {thread sayısı: tokens/sn} döndürür.
+	Yalnızca çağıran thread ve sonradan açılan OpenMP thread'leri cpus[:count]'a sabitlenir;
+	havuzda önceden açılmış OpenMP thread'leri eski (tüm çıkarım çekirdekleri) sabitlemesini
+	korur. Bu yüzden ölçülen, thread sayısının etkisidir; çekirdek alt kümesi yalnızca ipucudur.
+	"""
+	counts = sorted({n for n in (1, 2, 4, 8, 16, 32, 64, 128) if n < len(cpus)} | {len(cpus)})
+	results = {}
+	for count in counts:
+		pin_current_thread(cpus[:count])
+		torch.set_num_threads(count)
+		results[count] = measure_tokens_per_sec(model)
+		print(f"{count} thread (CPU {cpus[:count]}): {results[count]:.2f} token/sn")
+	return results
 
 # ----------------------------
 # OPTİMİZASYON AYARLARI
 # ----------------------------
 class OptimizationSettings:
-	def __init__(self):
+	# Inter-op havuzu süreç başına yalnızca bir kez ayarlanabilir; ikinci çağrı (veya paralel iş
+	# başladıktan sonraki çağrı) RuntimeError fırlatır
+	_interop_lock = threading.Lock()
+	_interop_configured = False
+
+	def __init__(self, placement=None):
 		self.cpu_cores = self.detect_cores()
 		ui.notify(str(self.detect_cores()) + " işlemci çekirdeği kullanılabilir")
 		self.model_params = {
@@ -151,232 +974,3569 @@ class OptimizationSettings:
 			'temperature': 0.75,
 			'top_k': 25,
 			'low_memory_mode': True,
-			'torch_dtype': torch.float16
+			# "fp32", "bf16", "int8" veya "auto" (açılışta ölçüp en hızlısını seçer)
+			'precision': 'auto',
+			# "auto" seçiminde izin verilen en fazla model belleği (None: toplam RAM'in %80'i)
+			'memory_ceiling_mb': None,
+			# "mmap": ağırlıklar dosyadan kopyalanmadan eşlenir, "legacy": from_pretrained
+			'load_mode': 'mmap',
+			# Hedef dtype'a dönüştürülmüş ağırlıkları bir sonraki açılış için diske yaz
+			'save_converted_checkpoint': False
+		}
+		# Aynı anda batch'e alınacak istek sayısı fiziksel çekirdek sayısından türetilir
+		max_batch_size = max(1, self.cpu_cores or 1)
+		self.scheduler_params = {
+			'max_batch_size': max_batch_size,
+			'max_queue_size': max_batch_size * 4
+		}
+		# Sohbet başına önbelleklenen past_key_values için toplam RAM bütçesi (yüklü tüm modellerde
+		# ortak; model bellek bütçesinden düşülür). Worker süreçlerinin her biri kendi önbelleğini tutar
+		self.prefix_cache_params = {
+			'max_bytes': 1024 * 1024 * 1024
+		}
+		# Taslak model yolu (göreli ise ana model klasörünün yanında aranır); None: kapalı
+		self.speculative_params = {
+			'draft_model_path': None,
+			'num_draft_tokens': 4
+		}
+		# Birden çok checkpoint: yüklü modellerin ve önek önbelleğinin toplam bellek bütçesi
+		# (None: toplam RAM'in %80'i)
+		# ve açılışta yüklenen, istek model belirtmediğinde kullanılan model (None: en küçüğü)
+		self.model_registry_params = {
+			'memory_budget_mb': None,
+			'default_model': None
+		}
+		# 0: model bu süreçte çalışır, N: ağırlıkları paylaşan N ayrı çıkarım süreci
+		self.worker_params = {
+			'workers': 0
+		}
+		# Çıkarım thread'lerinin çekirdek yerleşimi
+		self.cpu_params = {
+			'pin_threads': True,
+			# Torch inter-op havuzu; tek istek akışında 1 yeterli
+			'interop_threads': 1,
+			# Açılışta thread sayılarını tarayıp en hızlısını uygula
+			'sweep_threads': False
+		}
+		self.placement = placement or plan_cpu_placement()
+		# Akış sırasında websocket'e saniyede gönderilecek en fazla güncelleme sayısı
+		self.stream_params = {
+			'max_updates_per_sec': 10
+		}
+		# Kenar çubuğu ve sohbet geçmişi sayfa boyutları
+		self.history_params = {
+			'chat_page_size': 100,
+			'prompt_page_size': 50,
+			'search_results': 20
+		}
+		# Oturum başına eşzamanlı üretim sınırı ve boşta oturumların kapatılması (saniye)
+		self.session_params = {
+			'max_active_generations': 1,
+			'idle_timeout': 30 * 60,
+			'eviction_interval': 60
+		}
+		# Belge yükleme: PDF sayfaları servis çekirdekleri kadar süreçte paralel çıkarılır
+		self.ingest_params = {
+			'upload_dir': 'uploads',
+			'cache_dir': 'document_cache',
+			'workers': max(2, len(self.placement['service']))
+		}
+		# Belge parçalarından prompt'a eklenecek bağlam; embedding_model: isteğe bağlı yerel model klasörü
+		self.retrieval_params = {
+			'path': 'retrieval_index.db',
+			'chunk_words': 180,
+			'overlap_words': 30,
+			'top_k': 4,
+			'max_context_tokens': 768,
+			'embedding_model': None
+		}
+		# Sohbet geçmişinden bağlama alınacak en fazla tur ve sığmayan turların özet bütçesi
+		self.context_params = {
+			'max_turns': 256,
+			'summary_tokens': 64
+		}
+		# Sunucu tarafı üretim sınırları: istek başına token ve süre (saniye); bağlantısı kopan
+		# istemci disconnect_grace saniye içinde dönmezse oturumu kapatılır ve üretimi iptal edilir
+		self.generation_params = {
+			'max_tokens': 1024,
+			'max_seconds': 120,
+			'disconnect_grace': 5
+		}
+		# HTTP API: tek istekteki en fazla prompt ve istemci bağlantısının kontrol aralığı (saniye)
+		self.api_params = {
+			'max_batch_prompts': 32,
+			'disconnect_check_interval': 0.5
+		}
+		# Sık yeniden gönderilen metin parçalarının (geçmiş turlar, belge parçaları) token önbelleği
+		self.tokenizer_params = {
+			'cache_entries': 4096,
+			'min_cache_chars': 64
+		}
+		# İstek üzerine profil kaydı: yığın örnekleme aralığı (saniye), özet tablosu satırı ve
+		# saklanacak en fazla kayıt; with_stack trace'e Python yığınlarını ekler (ek yükü yüksek)
+		self.profiler_params = {
+			'output_dir': 'profiles',
+			'sample_interval': 0.005,
+			'record_shapes': True,
+			'with_stack': False,
+			'row_limit': 40,
+			'max_captures': 20
+		}
+		# Greedy veya seed'li (deterministik) yanıtlar için kalıcı önbellek
+		self.response_cache_params = {
+			'enabled': True,
+			'path': 'response_cache.db',
+			'max_bytes': 64 * 1024 * 1024,
+			'ttl_seconds': 7 * 24 * 3600
 		}
 
 	@staticmethod
 	def detect_cores():
 		return psutil.cpu_count(logical=False)
 
-	def update_cores(self, selected_cores):
-		p = psutil.Process(os.getpid())
-		p.cpu_affinity(selected_cores)
+	def update_cores(self, selected_cores):
+		"""Çıkarım için kullanılacak çekirdekleri değiştirir; kalanlar DB/UI'a bırakılır."""
+		self.placement = plan_cpu_placement(selected_cores=selected_cores)
+
+	def pin_inference_thread(self):
+		"""Çağıran thread'i çıkarım çekirdeklerine sabitler ve torch thread sayılarını eşler."""
+		if not self.cpu_params['pin_threads']:
+			return
+		cpus = self.placement['inference']
+		pin_current_thread(cpus)
+		torch.set_num_threads(len(cpus))
+		with OptimizationSettings._interop_lock:
+			if not OptimizationSettings._interop_configured:
+				# Bayrak yalnızca ayar uygulandıysa kurulur; başarısızlık gizlenmez
+				try:
+					torch.set_num_interop_threads(self.cpu_params['interop_threads'])
+				except RuntimeError as e:
+					print(f"Inter-op thread sayısı değiştirilemedi, {torch.get_num_interop_threads()} kalıyor: {e}")
+				else:
+					OptimizationSettings._interop_configured = True
+
+# ----------------------------
+# MODEL YÜKLEME (BELLEK EŞLEMELİ)
+# ----------------------------
+SAFETENSORS_DTYPES = {
+	"F64": torch.float64,
+	"F32": torch.float32,
+	"F16": torch.float16,
+	"BF16": torch.bfloat16,
+	"I64": torch.int64,
+	"I32": torch.int32,
+	"I16": torch.int16,
+	"I8": torch.int8,
+	"U8": torch.uint8,
+	"BOOL": torch.bool
+}
+
+def read_safetensors_header(file_path):
+	"""(başlık boyutu, başlık) döndürür; başlık tensör adı -> dtype/shape/offset ve __metadata__ içerir."""
+	with open(file_path, 'rb') as file:
+		header_size = struct.unpack('<Q', file.read(8))[0]
+		return header_size, json.loads(file.read(header_size))
+
+def checkpoint_signature(model_dir):
+	"""
+	Kaynak model.safetensors'ın boyutu ve değişiklik zamanı. Türetilmiş dosyalar
+	(dönüştürülmüş checkpoint, int8 önbelleği, hassasiyet ölçümü) bununla etiketlenir;
+	kaynak değişince eskiyen dosyalar kullanılmaz, yeniden oluşturulur.
+	"""
+	stat = os.stat(os.path.join(model_dir, "model.safetensors"))
+	return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+def _replace_atomically(target_path, write):
+	"""write(geçici yol) ile yazar ve hedefin yerine koyar; eşzamanlı yazanlar birbirini bozmaz."""
+	fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(target_path) or ".")
+	os.close(fd)
+	try:
+		write(tmp_path)
+		os.replace(tmp_path, target_path)
+	except BaseException:
+		if os.path.exists(tmp_path):
+			os.unlink(tmp_path)
+		raise
+	return target_path
+
+def mmap_safetensors(file_path):
+	"""
+	Bir safetensors dosyasını kopyalamadan belleğe eşler. Dönen tensörler dosyanın
+	sayfalarını doğrudan kullanır (MAP_PRIVATE; tensöre yazmak dosyayı değiştirmez).
+	"""
+	header_size, header = read_safetensors_header(file_path)
+	header.pop("__metadata__", None)
+
+	data_start = 8 + header_size
+	storage = torch.UntypedStorage.from_file(file_path, False, os.path.getsize(file_path))
+	state_dict = {}
+	for name, info in header.items():
+		dtype = SAFETENSORS_DTYPES[info["dtype"]]
+		start, end = info["data_offsets"]
+		offset = data_start + start
+		item_size = torch.empty(0, dtype=dtype).element_size()
+		if offset % item_size == 0:
+			tensor = torch.empty(0, dtype=dtype).set_(storage, offset // item_size, info["shape"])
+		else:
+			# Hizasız tensörler (nadir) kopyalanarak okunur
+			raw = torch.empty(0, dtype=torch.uint8).set_(storage, offset, (end - start,))
+			tensor = raw.clone().view(dtype).reshape(info["shape"])
+		state_dict[name] = tensor
+	return state_dict
+
+def gpt_neo_attention_buffers(config, attention_type):
+	"""
+	GPT-Neo dikkat katmanının kaydedilmeyen (persistent=False) buffer'ları; transformers'ın
+	GPTNeoSelfAttention'ında kurulanlarla aynıdır. Meta cihazda kurulan iskelet için
+	CPU'da yeniden oluşturulur.
+	"""
+	max_positions = config.max_position_embeddings
+	bias = torch.tril(torch.ones((max_positions, max_positions), dtype=torch.bool)).view(
+		1, 1, max_positions, max_positions
+	)
+	if attention_type == "local":
+		bias = torch.bitwise_xor(bias, torch.tril(bias, -config.window_size))
+	return {'bias': bias, 'masked_bias': torch.tensor(-1e9)}
+
+def converted_checkpoint_path(model_dir, torch_dtype):
+	dtype_name = str(torch_dtype).replace("torch.", "")
+	return os.path.join(model_dir, f"model.{dtype_name}.safetensors")
+
+def current_converted_checkpoint(model_dir, torch_dtype):
+	"""Kaynak checkpoint'ten dönüştürülmüş ve hâlâ güncel olan kopyanın yolu; yoksa None."""
+	path = converted_checkpoint_path(model_dir, torch_dtype)
+	if not os.path.exists(path):
+		return None
+	metadata = read_safetensors_header(path)[1].get("__metadata__") or {}
+	return path if metadata.get("source") == checkpoint_signature(model_dir) else None
+
+def load_model_mmap(model_dir, config, torch_dtype):
+	"""
+	GPT-Neo'yu tek geçişte yükler: iskelet meta cihazda kurulur ve parametreler
+	bellek eşlemeli tensörlere bağlanır. Hedef dtype'a önceden dönüştürülmüş bir
+	kopya varsa o kullanılır; yoksa yalnızca dtype'ı farklı olan tensörler kopyalanır.
+	(model, kaynak dosya yolu) döndürür.
+	"""
+	source_path = current_converted_checkpoint(model_dir, torch_dtype)
+	if source_path is None:
+		source_path = os.path.join(model_dir, "model.safetensors")
+	state_dict = mmap_safetensors(source_path)
+
+	# İskelet bellek ayırmadan ve rastgele ilklendirme yapmadan kurulur. torch.device bağlamı
+	# yalnızca bu thread'i etkiler: arka planda aynı anda kurulan diğer modeller etkilenmez
+	with torch.device("meta"):
+		model = GPTNeoForCausalLM(config)
+	for block in model.transformer.h:
+		for name, value in gpt_neo_attention_buffers(config, block.attn.attention_type).items():
+			block.attn.attention.register_buffer(name, value, persistent=False)
+
+	# Bağlı (tied) ağırlıklar named_parameters'ta tek kez görünür; lm_head sonradan bağlanır
+	parameters = dict(model.named_parameters())
+	for name, tensor in state_dict.items():
+		if name not in parameters and f"transformer.{name}" in parameters:
+			name = f"transformer.{name}"
+		if name not in parameters:
+			continue
+		if tensor.is_floating_point() and tensor.dtype != torch_dtype:
+			tensor = tensor.to(torch_dtype)
+		module_name, _, attr = name.rpartition(".")
+		setattr(model.get_submodule(module_name), attr, torch.nn.Parameter(tensor, requires_grad=False))
+	model.tie_weights()
+
+	missing = [name for name, param in model.named_parameters() if param.is_meta]
+	if missing:
+		raise RuntimeError(f"Checkpoint'te eksik parametreler: {', '.join(missing)}")
+	missing = [name for name, buffer in model.named_buffers() if buffer.is_meta]
+	if missing:
+		raise RuntimeError(f"Oluşturulamayan buffer'lar: {', '.join(missing)}")
+	return model.eval(), source_path
+
+def save_converted_checkpoint(model, model_dir, torch_dtype):
+	"""Modelin ağırlıklarını hedef dtype'ta yanına kaydeder; sonraki açılışlar dönüşümü atlar."""
+	state_dict = {name: param.detach().contiguous() for name, param in model.named_parameters()}
+	metadata = {"format": "pt", "source": checkpoint_signature(model_dir)}
+	return _replace_atomically(
+		converted_checkpoint_path(model_dir, torch_dtype), lambda path: save_file(state_dict, path, metadata=metadata)
+	)
+
+# ----------------------------
+# HASSASİYET MODLARI (FP32 / BF16 / INT8)
+# ----------------------------
+# int8 modunda model fp32 yüklenip Linear katmanları dinamik olarak nicemlenir
+PRECISION_DTYPES = {
+	'fp32': torch.float32,
+	'bf16': torch.bfloat16,
+	'int8': torch.float32
+}
+
+def cpu_supports_bf16():
+	"""CPU yerel bf16 komutlarını (AVX512-BF16 / AMX) destekliyor mu?"""
+	try:
+		with open('/proc/cpuinfo', 'r') as file:
+			flags = file.read()
+	except OSError:
+		return False
+	return 'avx512_bf16' in flags or 'amx_bf16' in flags
+
+def available_precisions():
+	precisions = ['fp32']
+	if cpu_supports_bf16():
+		precisions.append('bf16')
+	if torch.backends.quantized.engine != 'none':
+		precisions.append('int8')
+	return precisions
+
+def _quantizable_linears(model):
+	"""Dikkat ve MLP bloklarındaki nn.Linear katmanlarını (ebeveyn, ad, katman) olarak verir."""
+	for module in model.transformer.h.modules():
+		for name, child in module.named_children():
+			if type(child) is torch.nn.Linear:
+				yield module, name, child
+
+def quantize_model_int8(model, model_dir):
+	"""
+	GPT-Neo bloklarındaki Linear katmanlarını dinamik int8'e çevirir. Nicemlenmiş
+	ağırlıklar model.int8.pt olarak önbelleklenir; önbellek varsa fp32 ağırlıklar
+	hiç okunmadan boş int8 katmanlar kurulup önbellekten doldurulur. Önbellek kaynak
+	checkpoint'in imzasını taşır; model.safetensors değiştiyse yeniden nicemlenir.
+	"""
+	cache_path = os.path.join(model_dir, "model.int8.pt")
+	signature = checkpoint_signature(model_dir)
+	cached = torch.load(cache_path) if os.path.exists(cache_path) else None
+	if isinstance(cached, dict) and cached.get('source') == signature:
+		for module, name, child in list(_quantizable_linears(model)):
+			setattr(module, name, torch.ao.nn.quantized.dynamic.Linear(
+				child.in_features,
+				child.out_features,
+				bias_=child.bias is not None,
+				dtype=torch.qint8
+			))
+		model.transformer.h.load_state_dict(cached['state_dict'])
+		return model, cache_path
+
+	del cached
+	torch.ao.quantization.quantize_dynamic(model.transformer.h, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+	payload = {'source': signature, 'state_dict': model.transformer.h.state_dict()}
+	_replace_atomically(cache_path, lambda path: torch.save(payload, path))
+	return model, cache_path
+
+def estimate_memory_mb(model_dir, config, precision):
+	"""
+	Modeli yüklemeden, checkpoint başlığındaki tensör boyutlarından bellek tahmini:
+	hedef dtype'ta parametreler (int8'de blok Linear ağırlıkları 1 bayt) ve katman
+	başına dikkat maskesi buffer'ı.
+	"""
+	_, header = read_safetensors_header(os.path.join(model_dir, "model.safetensors"))
+	header.pop("__metadata__", None)
+	item_size = torch.empty(0, dtype=PRECISION_DTYPES[precision]).element_size()
+	total = 0
+	for name, info in header.items():
+		numel = 1
+		for size in info["shape"]:
+			numel *= size
+		if precision == 'int8' and ".h." in f".{name}" and name.endswith(".weight") and len(info["shape"]) == 2:
+			total += numel
+		else:
+			total += numel * item_size
+	total += config.num_layers * config.max_position_embeddings ** 2  # bool dikkat maskeleri
+	return total / (1024 * 1024)
+
+def model_memory_mb(model):
+	"""Parametre, buffer ve paketlenmiş int8 ağırlıkların toplam boyutu."""
+	total = sum(t.numel() * t.element_size() for t in model.parameters())
+	total += sum(t.numel() * t.element_size() for t in model.buffers())
+	for module in model.modules():
+		if isinstance(module, torch.ao.nn.quantized.dynamic.Linear):
+			weight, bias = module._weight_bias()
+			total += weight.numel() * weight.element_size()
+			if bias is not None:
+				total += bias.numel() * bias.element_size()
+	return total / (1024 * 1024)
+
+@torch.no_grad()
+def measure_tokens_per_sec(model, prompt_length=32, new_tokens=16):
+	"""Sabit uzunlukta açgözlü (greedy) üretimle saniyedeki token sayısını ölçer."""
+	config = model.config
+	input_ids = torch.randint(0, config.vocab_size, (1, prompt_length))
+	params = {'do_sample': False, 'pad_token_id': config.eos_token_id}
+	model.generate(input_ids[:, :8], max_new_tokens=2, **params)  # Isınma
+	started = time.time()
+	model.generate(input_ids, max_new_tokens=new_tokens, min_new_tokens=new_tokens, **params)
+	return new_tokens / (time.time() - started)
+
+def prepare_shared_checkpoint(model_dir, config, torch_dtype):
+	"""
+	Worker süreçlerinin ağırlıkları kopyasız paylaşabilmesi için hedef dtype'ta bir
+	safetensors dosyası olmasını sağlar; gerekirse dönüştürüp kaydeder.
+	"""
+	converted_path = current_converted_checkpoint(model_dir, torch_dtype)
+	if converted_path is not None:
+		return converted_path
+	source_path = os.path.join(model_dir, "model.safetensors")
+	state_dict = mmap_safetensors(source_path)
+	if all(t.dtype == torch_dtype for t in state_dict.values() if t.is_floating_point()):
+		return source_path
+	del state_dict
+	model, _ = load_model_mmap(model_dir, config, torch_dtype)
+	return save_converted_checkpoint(model, model_dir, torch_dtype)
+
+def load_draft_model(draft_dir, precision, target_config):
+	"""Spekülatif çözümleme için küçük taslak modeli yükler; sözlükler uyuşmazsa None döndürür."""
+	config = AutoConfig.from_pretrained(draft_dir)
+	if config.vocab_size != target_config.vocab_size:
+		print(f"Taslak model sözlüğü uyuşmuyor ({config.vocab_size} != {target_config.vocab_size}), spekülatif çözümleme kapalı")
+		return None
+	model, _ = load_model_mmap(draft_dir, config, PRECISION_DTYPES[precision])
+	if precision == 'int8':
+		model, _ = quantize_model_int8(model, draft_dir)
+	return model
+
+def peak_rss_mb():
+	# Linux'ta ru_maxrss KB cinsindendir
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# ----------------------------
+# TOKENIZER (HIZLI + ÖNBELLEK)
+# ----------------------------
+# Açılıştaki eşlik kontrolünde kullanılan örnekler: Türkçe karakterler, boşluk ve satır
+# sonu dizileri, sayılar, kısaltmalar, emoji, kod, özel token ve sohbet/belge biçimi
+TOKENIZER_PARITY_SAMPLES = [
+	"Merhaba dünya! Nasılsın?",
+	"Çok güzel bir gün; IĞDIR ığdır ÖĞÜŞ öğüş.",
+	"  baştaki ve sondaki boşluklar  ",
+	"satır\n\n\nsonu\r\n\tsekme \n \n",
+	"sayılar 3.14159, 1,000,000 ve 2024-10-17",
+	"it's we're they've I'm you'll he'd",
+	"emoji 🤖🚀 ve birleşik 👩‍💻",
+	"kod: def f(x):\n    return x ** 2  # kare\n\n\tprint(f(3))",
+	"<|endoftext|>özel token<|endoftext|>",
+	"Soru?\nCevap.\n\nSoru 2?\nCevap 2.\n\n\nBelge parçası...\n\n  Yeni prompt\n\n",
+]
+
+def split_cacheable(text):
+	"""
+	Metni, token'ları ayrı ayrı kodlanıp art arda eklendiğinde metnin tamamının
+	token'larını veren parçalara böler. Bölme yalnızca boşluk olmayan bir karakterden
+	sonra gelen "\\n\\n" önünde yapılır: GPT-2 ön-tokenizer'ı burada her zaman yeni
+	bir parça başlatır ve eşleşme yalnızca sonraki metne bakar. Sohbet turları ve
+	belge parçaları bu ayraçla birleştirildiğinden her biri ayrı bir parça olur.
+	"""
+	segments, start = [], 0
+	index = text.find("\n\n", 1)
+	while index != -1:
+		if not text[index - 1].isspace():
+			segments.append(text[start:index])
+			start = index
+		index = text.find("\n\n", index + 2)
+	segments.append(text[start:])
+	return segments
+
+class CachedTokenizer:
+	"""
+	Tokenizer'ı parça düzeyinde bir LRU önbellekle sarar. Her turda yeniden gönderilen
+	sohbet geçmişi, belge parçaları ve sistem önekleri yeniden tokenize edilmez;
+	önbellekte olmayan parçalar tek batch çağrısında kodlanır (hızlı tokenizer'da
+	Rust tarafında paralel). tokenizer(text) ve tokenizer([texts]) çağrıları ile
+	diğer tüm nitelikler (decode, eos_token_id...) sarılan tokenizer gibi davranır.
+	"""
+	def __init__(self, tokenizer, max_entries=4096, min_chars=64, split=True):
+		self.tokenizer = tokenizer
+		self.max_entries = max_entries
+		self.min_chars = min_chars
+		self.split = split
+		self.entries = OrderedDict()  # parça metni -> token id'leri
+		self.hits = 0
+		self.misses = 0
+		self._lock = threading.Lock()
+
+	def __getattr__(self, name):
+		if name == 'tokenizer':
+			raise AttributeError(name)
+		return getattr(self.tokenizer, name)
+
+	def __call__(self, text, **kwargs):
+		# padding/return_tensors gibi seçenekler önbelleği atlar
+		if kwargs:
+			return self.tokenizer(text, **kwargs)
+		if isinstance(text, str):
+			return {'input_ids': self.encode_batch([text])[0]}
+		return {'input_ids': self.encode_batch(text)}
+
+	def encode_batch(self, texts):
+		"""Metinlerin token id listeleri; sonuç önbelleksiz tokenizer(texts) ile birebir aynıdır."""
+		split = [split_cacheable(text) if self.split else [text] for text in texts]
+		unique = list(dict.fromkeys(segment for segments in split for segment in segments))
+		ids = {}
+		with self._lock:
+			for segment in unique:
+				cached = self.entries.get(segment)
+				if cached is not None:
+					self.entries.move_to_end(segment)
+					ids[segment] = cached
+			self.hits += len(ids)
+
+		missing = [segment for segment in unique if segment not in ids]
+		if missing:
+			encoded = self.tokenizer(missing)['input_ids']
+			with self._lock:
+				for segment, segment_ids in zip(missing, encoded):
+					ids[segment] = segment_ids
+					if len(segment) >= self.min_chars and self.max_entries > 0:
+						self.misses += 1
+						self.entries[segment] = segment_ids
+				while len(self.entries) > self.max_entries:
+					self.entries.popitem(last=False)
+		return [[token for segment in segments for token in ids[segment]] for segments in split]
+
+	def stats(self):
+		with self._lock:
+			lookups = self.hits + self.misses
+			return {
+				'entries': len(self.entries),
+				'hits': self.hits,
+				'misses': self.misses,
+				'hit_rate': self.hits / lookups if lookups else 0.0,
+				'fast': self.tokenizer.is_fast
+			}
+
+def check_tokenizer_parity(reference, tokenizer, samples=TOKENIZER_PARITY_SAMPLES):
+	"""
+	Örnekleri iki tokenizer'la tek tek ve batch halinde kodlayıp çözer; farklı sonuç
+	veren örneklerin listesini döndürür (boş liste: birebir aynı).
+	"""
+	mismatches = []
+	expected = [reference(sample)['input_ids'] for sample in samples]
+	batched = tokenizer(list(samples))['input_ids']
+	for sample, ids, batch_ids in zip(samples, expected, batched):
+		if (tokenizer(sample)['input_ids'] != ids or batch_ids != ids
+				or tokenizer.decode(ids) != reference.decode(ids)
+				or tokenizer.decode(ids, skip_special_tokens=True) != reference.decode(ids, skip_special_tokens=True)):
+			mismatches.append(sample)
+	return mismatches
+
+def load_tokenizer(model_dir, cache_entries=4096, min_cache_chars=64):
+	"""
+	Hızlı (Rust) tokenizer'ı model klasöründeki vocab.json/merges.txt'ten yükler ve
+	önbellekle sarar. İlk açılışta dönüştürülen tokenizer.json klasöre yazılır ve
+	yavaş GPT2Tokenizer ile eşliği örneklerde doğrulanır (tokenizer_selfcheck.json).
+	Eşlik bozuksa yavaş tokenizer parçalara bölünmeden kullanılır.
+	"""
+	fast = GPT2TokenizerFast.from_pretrained(model_dir)
+	result_path = os.path.join(model_dir, "tokenizer_selfcheck.json")
+	if os.path.exists(result_path):
+		with open(result_path, 'r', encoding='utf-8') as file:
+			mismatches = json.load(file)['mismatches']
+	else:
+		reference = GPT2Tokenizer.from_pretrained(model_dir)
+		mismatches = check_tokenizer_parity(reference, CachedTokenizer(fast, min_chars=0))
+		try:
+			if not os.path.exists(os.path.join(model_dir, "tokenizer.json")):
+				fast.backend_tokenizer.save(os.path.join(model_dir, "tokenizer.json"))
+			with open(result_path, 'w', encoding='utf-8') as file:
+				json.dump({'samples': len(TOKENIZER_PARITY_SAMPLES), 'mismatches': mismatches}, file, indent=2)
+		except OSError:
+			pass  # Salt okunur klasör: kontrol sonraki açılışta yinelenir
+
+	if mismatches:
+		print(f"Hızlı tokenizer {len(mismatches)} örnekte farklı sonuç verdi, yavaş tokenizer kullanılıyor")
+		return CachedTokenizer(GPT2Tokenizer.from_pretrained(model_dir), cache_entries, min_cache_chars, split=False)
+	return CachedTokenizer(fast, cache_entries, min_cache_chars)
+
+# ----------------------------
+# İSTEK ÜZERİNE PROFİLLEME
+# ----------------------------
+class StackSampler:
+	"""
+	Tüm thread'lerin Python yığınlarını belirli aralıklarla örnekler (duvar saati).
+	Model thread'i dışındaki tokenizasyon, DB yazıcısı ve arayüz işleri de burada
+	görünür. Sonuç flamegraph.pl ve speedscope'un okuduğu katlanmış biçimdedir.
+	"""
+	def __init__(self, interval=0.005, max_depth=64):
+		self.interval = interval
+		self.max_depth = max_depth
+		self.counts = Counter()  # "thread;dış;...;iç" -> örnek sayısı
+		self.samples = 0
+		self._stop = threading.Event()
+		self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+	def start(self):
+		self._thread.start()
+		return self
+
+	def stop(self):
+		self._stop.set()
+		self._thread.join()
+
+	def _run(self):
+		own = threading.get_ident()
+		while not self._stop.wait(self.interval):
+			names = {thread.ident: thread.name for thread in threading.enumerate()}
+			for ident, frame in sys._current_frames().items():
+				if ident == own:
+					continue
+				stack = []
+				while frame is not None and len(stack) < self.max_depth:
+					code = frame.f_code
+					# Satır yerine fonksiyonun ilk satırı: aynı fonksiyonun örnekleri tek kutuda toplanır
+					stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+					frame = frame.f_back
+				stack.append(names.get(ident, str(ident)))
+				self.counts[";".join(reversed(stack))] += 1
+			self.samples += 1
+
+class ProfileCapture:
+	"""
+	Bir zamanlayıcı thread'inde süren profil kaydı: torch.profiler, katman başına
+	dikkat/MLP aralıkları ve yığın örnekleyici birlikte çalışır. torch.profiler'ı
+	başlatan thread durdurmalıdır; dosyalar ardından arka planda yazılır.
+	"""
+	def __init__(self, profiler, model, label):
+		self.profiler = profiler
+		self.label = label
+		self.requests = []
+		self.started_at = time.time()
+		self.finished_at = None
+		self._hooks = []
+		self._ranges = []
+		for index, block in enumerate(getattr(getattr(model, 'transformer', None), 'h', [])):
+			self._wrap(block.attn, f"layer{index}.attn")
+			self._wrap(block.mlp, f"layer{index}.mlp")
+		self.torch_profiler = torch.profiler.profile(
+			activities=[torch.profiler.ProfilerActivity.CPU],
+			record_shapes=profiler.record_shapes,
+			with_stack=profiler.with_stack
+		)
+		self.torch_profiler.start()
+		self.sampler = StackSampler(profiler.sample_interval).start()
+
+	def _wrap(self, module, name):
+		"""Modülün her ileri geçişini trace'te adlandırılmış bir aralık yapar (kayıt bitince kaldırılır)."""
+		def enter(module, args):
+			function = torch.autograd.profiler.record_function(name)
+			function.__enter__()
+			self._ranges.append(function)
+
+		def exit(module, args, output):
+			self._ranges.pop().__exit__(None, None, None)
+
+		self._hooks.append(module.register_forward_pre_hook(enter))
+		self._hooks.append(module.register_forward_hook(exit))
+
+	def track(self, request):
+		self.requests.append(request)
+
+	@property
+	def finished(self):
+		return all(request.done for request in self.requests)
+
+	def stop(self):
+		for hook in self._hooks:
+			hook.remove()
+		while self._ranges:  # Hata veren ileri geçişten kalan aralıklar
+			self._ranges.pop().__exit__(None, None, None)
+		self.torch_profiler.stop()
+		self.sampler.stop()
+		self.finished_at = time.time()
+		threading.Thread(target=self.profiler.save, args=(self,), daemon=True).start()
+
+# Bir profil kaydının yazdığı dosyalar
+PROFILE_SUFFIXES = (".trace.json", ".ops.txt", ".folded")
+
+class GenerationProfiler:
+	"""
+	Yöneticinin sonraki N üretimi profillemek için kurduğu kayıt yöneticisi. Hak
+	isteğin gönderildiği anda düşülür; zamanlayıcı işaretli isteği batch'e alırken
+	kaydı başlatır ve kayıttaki tüm istekler bitince durdurur. Aynı anda batch'te
+	olan profilli istekler tek kayıtta toplanır. Kurulu değilken maliyet istek
+	başına tek bir sayı kontrolüdür.
+
+	Her kayıt output_dir'e üç dosya yazar: Chrome trace (.trace.json; chrome://tracing
+	veya Perfetto), operatör ve istek özeti (.ops.txt) ve katlanmış yığınlar (.folded;
+	flamegraph.pl veya speedscope).
+	"""
+	def __init__(self, output_dir="profiles", sample_interval=0.005, record_shapes=True, with_stack=False,
+			row_limit=40, max_captures=20):
+		self.output_dir = output_dir
+		self.sample_interval = sample_interval
+		self.record_shapes = record_shapes
+		self.with_stack = with_stack
+		self.row_limit = row_limit
+		self.max_captures = max_captures
+		self.remaining = 0
+		self.captures = 0
+		self._lock = threading.Lock()
+
+	def arm(self, generations):
+		"""Sonraki generations üretimi profiller; 0 bekleyen hakları iptal eder."""
+		with self._lock:
+			self.remaining = max(0, int(generations))
+
+	def claim(self):
+		"""Kuruluysa bir hak düşer; isteğin profillenip profillenmeyeceğini döndürür."""
+		if not self.remaining:
+			return False
+		with self._lock:
+			if self.remaining <= 0:
+				return False
+			self.remaining -= 1
+			return True
+
+	def save(self, capture):
+		stamp = datetime.fromtimestamp(capture.started_at).strftime("%Y%m%d-%H%M%S")
+		prefix = os.path.join(self.output_dir, f"profile-{stamp}-{capture.label}-{os.getpid()}")
+		try:
+			os.makedirs(self.output_dir, exist_ok=True)
+			capture.torch_profiler.export_chrome_trace(prefix + ".trace.json")
+			with open(prefix + ".folded", 'w', encoding='utf-8') as file:
+				for stack, count in capture.sampler.counts.most_common():
+					file.write(f"{stack} {count}\n")
+			with open(prefix + ".ops.txt", 'w', encoding='utf-8') as file:
+				file.write(self._summary(capture))
+		except Exception:
+			print("Exception occurred while saving profile:")
+			traceback.print_exc()
+			return
+		self.captures += 1
+		print(f"Profil kaydedildi: {prefix}.*")
+		self._prune()
+
+	def _summary(self, capture):
+		lines = [
+			f"Model: {capture.label}, süre: {capture.finished_at - capture.started_at:.2f} sn, "
+			f"profillenen üretim: {len(capture.requests)}",
+			"",
+			"İstekler (sn: kuyruk, prefill, ilk token, toplam; token, token/sn, bitiş):"
+		]
+		for request in capture.requests:
+			queue_wait = request.admitted_at - request.submitted_at if request.admitted_at is not None else 0.0
+			first_token = request.first_token_at - request.submitted_at if request.first_token_at is not None else 0.0
+			lines.append(
+				f"  {queue_wait:.3f} {request.prefill_seconds or 0.0:.3f} {first_token:.3f} "
+				f"{request.finished_at - request.submitted_at:.3f}; {len(request.input_ids)}+{len(request.output_ids)} "
+				f"{request.tokens_per_sec:.2f} {request.finish_reason}"
+			)
+
+		lines += ["", "Operatörler ve aralıklar (neo::*, layerN.*), self CPU süresine göre:"]
+		lines.append(capture.torch_profiler.key_averages().table(sort_by="self_cpu_time_total", row_limit=self.row_limit))
+
+		# Yığın örnekleri: thread başına örnek sayısı ve en çok örneklenen (yaprak) fonksiyonlar
+		threads, leaves = Counter(), Counter()
+		for stack, count in capture.sampler.counts.items():
+			frames = stack.split(";")
+			threads[frames[0]] += count
+			leaves[(frames[0], frames[-1])] += count
+		lines += ["", f"Python yığın örnekleri ({capture.sampler.samples} tur, {capture.sampler.interval * 1000:.0f} ms aralık):"]
+		for thread, count in threads.most_common():
+			lines.append(f"  {thread}: {count}")
+			for (leaf_thread, leaf), leaf_count in leaves.most_common():
+				if leaf_thread == thread and leaf_count * 20 >= count:  # Thread'in örneklerinin %5'i ve üstü
+					lines.append(f"      {leaf_count / count:6.1%}  {leaf}")
+		return "\n".join(lines) + "\n"
+
+	def list_files(self):
+		"""Kaydedilmiş profil dosyaları, en yenisi önce: [{'name', 'path', 'size', 'mtime'}, ...]."""
+		files = []
+		for path in glob.glob(os.path.join(self.output_dir, "profile-*")):
+			try:
+				stat = os.stat(path)
+			except OSError:
+				continue  # Bu arada silindi
+			files.append({'name': os.path.basename(path), 'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime})
+		return sorted(files, key=lambda file: (-file['mtime'], file['name']))
+
+	def _prune(self):
+		"""En yeni max_captures kayıt dışındaki dosyaları siler."""
+		captures = OrderedDict()
+		for file in self.list_files():
+			# Model adı nokta içerebilir (gpt-neo-1.3B); kayıt adı uzantı atılarak bulunur
+			name = file['name']
+			for suffix in PROFILE_SUFFIXES:
+				if name.endswith(suffix):
+					name = name[:-len(suffix)]
+			captures.setdefault(name, []).append(file['path'])
+		for paths in list(captures.values())[self.max_captures:]:
+			for path in paths:
+				try:
+					os.remove(path)
+				except OSError:
+					pass
+
+	def stats(self):
+		return {'armed': self.remaining, 'captures': self.captures}
+
+# Profil kaydı yokken zamanlayıcının aralık işaretleri için boş bağlam
+_NO_PROFILE_RANGE = nullcontext()
+
+# ----------------------------
+# ÇIKARIM ZAMANLAYICISI (SÜREKLİ BATCH)
+# ----------------------------
+def encode_prompt(tokenizer, prompt, max_new_tokens, max_positions, input_ids=None):
+	"""
+	Prompt'u tokenize eder; bağlam penceresine sığmayan baş kısmını kırpar.
+	input_ids verilirse (ör. batch halinde önceden kodlanmış) yeniden tokenize edilmez.
+	"""
+	max_new_tokens = max(1, min(int(max_new_tokens), max_positions - 1))
+	if input_ids is None:
+		input_ids = tokenizer(prompt)["input_ids"]
+	input_ids = input_ids[-(max_positions - max_new_tokens):] or [tokenizer.eos_token_id]
+	return input_ids, max_new_tokens
+
+def truncate_at_stop(text, stop):
+	"""Metni ilk durdurma dizisinin başladığı yerde keser."""
+	positions = [text.find(sequence) for sequence in stop or []]
+	positions = [position for position in positions if position >= 0]
+	return text[:min(positions)] if positions else text
+
+def request_deadline(timeout):
+	"""Saniye cinsinden süre sınırını zamanlayıcının kullandığı mutlak zamana çevirir."""
+	return time.time() + float(timeout) if timeout else None
+
+class GenerationRequest:
+	"""Zamanlayıcıya gönderilen tek bir üretim isteği."""
+	def __init__(self, input_ids, max_new_tokens, temperature, top_k, do_sample=True, streamer=None, cache_key=None,
+			seed=None, deadline=None, stop=None, profile=False):
+		self.input_ids = list(input_ids)
+		self.max_new_tokens = max(1, int(max_new_tokens))
+		self.temperature = float(temperature)
+		self.top_k = int(top_k)
+		self.do_sample = do_sample
+		self.streamer = streamer
+		self.cache_key = cache_key
+		self.seed = seed
+		# Seed verilmişse örnekleme batch'teki diğer isteklerden bağımsız, kendi üretecinden yapılır
+		self.generator = torch.Generator().manual_seed(int(seed)) if seed is not None else None
+		# Süre sınırı (mutlak zaman) ve durdurma dizileri her çözümleme adımında kontrol edilir
+		self.deadline = deadline
+		self.stop = [sequence for sequence in (stop or []) if sequence]
+		# Durdurma dizisini yakalamak için decode edilen son token sayısı. Bayt düzeyinde BPE'de
+		# bir token bir karakterden kısa olabilir (çok baytlı UTF-8, emoji) ama en az bir bayttır
+		self.stop_window = max((len(sequence.encode('utf-8')) for sequence in self.stop), default=0) + 2
+		# Akışta durdurma dizisinin başı olabileceği için istek bitene kadar gönderilmeyen karakter sayısı
+		self.stop_holdback = max((len(sequence) for sequence in self.stop), default=0) + 1
+		self.output_ids = []
+		self.finish_reason = None
+		self.error = None
+		self.submitted_at = time.time()
+		self.admitted_at = None
+		self.prefill_seconds = None
+		self.first_token_at = None
+		self.finished_at = None
+		self.draft_proposed = 0
+		self.draft_accepted = 0
+		# Yöneticinin kurduğu profil kaydına dahil edilecek mi (GenerationProfiler.claim)
+		self.profile = profile
+		self._cancelled = threading.Event()
+		self._done = threading.Event()
+		self._callbacks = []
+		self._callback_lock = threading.Lock()
+
+	def cancel(self):
+		"""İsteği iptal eder; zamanlayıcı bir sonraki adımda satırı batch'ten çıkarır."""
+		self._cancelled.set()
+
+	@property
+	def cancelled(self):
+		return self._cancelled.is_set()
+
+	@property
+	def done(self):
+		return self._done.is_set()
+
+	@property
+	def expired(self):
+		return self.deadline is not None and time.time() >= self.deadline
+
+	def output_text(self, tokenizer):
+		"""Üretilen metin; durdurma dizisiyle bittiyse dizi ve sonrası atılır."""
+		return truncate_at_stop(tokenizer.decode(self.output_ids, skip_special_tokens=True), self.stop)
+
+	def wait(self, timeout=None):
+		return self._done.wait(timeout)
+
+	def add_done_callback(self, callback):
+		"""callback(istek) istek bitince bitiren thread'de, bitmişse hemen çağrılır."""
+		with self._callback_lock:
+			if not self.done:
+				self._callbacks.append(callback)
+				return
+		callback(self)
+
+	def result(self, timeout=None):
+		"""İstek bitene kadar bekler ve üretilen token id'lerini döndürür."""
+		if not self._done.wait(timeout):
+			raise TimeoutError("Üretim isteği zaman aşımına uğradı!")
+		if self.error is not None:
+			raise self.error
+		return self.output_ids
+
+	def _append(self, token_id):
+		if self.first_token_at is None:
+			self.first_token_at = time.time()
+		self.output_ids.append(token_id)
+		if self.streamer is not None:
+			self.streamer.put(token_id)
+
+	@property
+	def tokens_per_sec(self):
+		"""İlk token'dan bitişe kadar ölçülen etkin üretim hızı."""
+		if not self.output_ids or self.finished_at is None:
+			return 0.0
+		elapsed = self.finished_at - (self.first_token_at or self.submitted_at)
+		return len(self.output_ids) / elapsed if elapsed > 0 else 0.0
+
+	def _finish(self, reason, error=None):
+		self.finish_reason = reason
+		self.error = error
+		self.finished_at = time.time()
+		metrics.observe_request(self)
+		if self.streamer is not None:
+			self.streamer.end()
+		self._done.set()
+		with self._callback_lock:
+			callbacks, self._callbacks = self._callbacks, []
+		for callback in callbacks:
+			callback(self)
+
+class TokenStreamer:
+	"""
+	Üretilen token'ları artımlı olarak metne çevirir. Her adımda yalnızca son
+	birkaç token yeniden decode edilir; yarım kalan UTF-8 karakterleri bir
+	sonraki token gelene kadar bekletilir.
+	"""
+	def __init__(self, tokenizer, skip_special_tokens=True):
+		self.tokenizer = tokenizer
+		self.skip_special_tokens = skip_special_tokens
+		self.token_ids = []
+		self.text = ""
+		self.prefix_offset = 0
+		self.read_offset = 0
+		self.finished = False
+		self.on_update = None  # Yeni metin veya bitişte (zamanlayıcı thread'inde) çağrılır
+		self._pending = []
+		self._condition = threading.Condition()
+
+	def _decode(self, token_ids):
+		return self.tokenizer.decode(token_ids, skip_special_tokens=self.skip_special_tokens)
+
+	def put(self, token_id):
+		"""Zamanlayıcı thread'inden her yeni token için çağrılır."""
+		self.token_ids.append(token_id)
+		prefix_text = self._decode(self.token_ids[self.prefix_offset:self.read_offset])
+		new_text = self._decode(self.token_ids[self.prefix_offset:])
+		if len(new_text) > len(prefix_text) and not new_text.endswith("\ufffd"):
+			self._emit(new_text[len(prefix_text):])
+			self.prefix_offset = self.read_offset
+			self.read_offset = len(self.token_ids)
+
+	def end(self):
+		"""Bekleyen son parçayı yayınlar ve akışı kapatır."""
+		prefix_text = self._decode(self.token_ids[self.prefix_offset:self.read_offset])
+		new_text = self._decode(self.token_ids[self.prefix_offset:])
+		if len(new_text) > len(prefix_text):
+			self._emit(new_text[len(prefix_text):])
+		with self._condition:
+			self.finished = True
+			self._condition.notify_all()
+		if self.on_update is not None:
+			self.on_update()
+
+	def _emit(self, delta):
+		with self._condition:
+			self.text += delta
+			self._pending.append(delta)
+			self._condition.notify_all()
+		if self.on_update is not None:
+			self.on_update()
+
+	def drain(self):
+		"""Son çağrıdan bu yana biriken metni tek parça olarak döndürür."""
+		with self._condition:
+			delta = "".join(self._pending)
+			self._pending = []
+			return delta
+
+	def __iter__(self):
+		"""Akış bitene kadar yeni metin parçalarını sırayla verir."""
+		while True:
+			with self._condition:
+				while not self._pending and not self.finished:
+					self._condition.wait()
+				if not self._pending and self.finished:
+					return
+			yield self.drain()
+
+class PrefixCache:
+	"""
+	Sohbet başına son dizinin past_key_values'unu tutar; aynı sohbetin bir sonraki
+	turunda ortak token öneki yeniden hesaplanmaz. Toplam boyut RAM bütçesini
+	aşınca en uzun süredir kullanılmayan girdiler atılır (LRU).
+	"""
+	def __init__(self, max_bytes):
+		self.max_bytes = max_bytes
+		self.entries = OrderedDict()  # key -> (token_ids, past_key_values, nbytes)
+		self.total_bytes = 0
+		self.hits = 0
+		self.misses = 0
+		self.saved_tokens = 0
+		self._lock = threading.Lock()
+
+	def lookup(self, key, input_ids):
+		"""
+		input_ids ile önbellekteki dizinin ortak önekini bulur.
+		(önek uzunluğu, past_key_values) döndürür; eşleşme yoksa (0, None).
+		"""
+		with self._lock:
+			entry = self.entries.get(key)
+			length = 0
+			if entry is not None:
+				token_ids, past_key_values, _ = entry
+				# Son token her zaman yeniden hesaplanmalı ki logit'ler elde edilsin
+				limit = min(len(token_ids), len(input_ids) - 1)
+				while length < limit and token_ids[length] == input_ids[length]:
+					length += 1
+			if length == 0:
+				self.misses += 1
+				return 0, None
+			self.entries.move_to_end(key)
+			self.hits += 1
+			self.saved_tokens += length
+
+		return length, tuple((k[:, :, :length], v[:, :, :length]) for k, v in past_key_values)
+
+	def store(self, key, token_ids, past_key_values):
+		nbytes = sum(k.numel() * k.element_size() + v.numel() * v.element_size() for k, v in past_key_values)
+		with self._lock:
+			self._evict(key)
+			if nbytes > self.max_bytes:
+				return
+			self.entries[key] = (list(token_ids), past_key_values, nbytes)
+			self.total_bytes += nbytes
+			while self.total_bytes > self.max_bytes:
+				_, (_, _, old_bytes) = self.entries.popitem(last=False)
+				self.total_bytes -= old_bytes
+
+	def evict(self, key):
+		with self._lock:
+			self._evict(key)
+
+	def _evict(self, key):
+		entry = self.entries.pop(key, None)
+		if entry is not None:
+			self.total_bytes -= entry[2]
+
+	def partition(self, name):
+		"""Bu önbelleğin bütçesini paylaşan, anahtarları name ile ayrılmış görünüm."""
+		return PrefixCachePartition(self, name)
+
+	def evict_partition(self, name):
+		with self._lock:
+			for key in [key for key in self.entries if isinstance(key, tuple) and key[0] == name]:
+				self._evict(key)
+
+	def usage(self, name):
+		"""Bir bölümün (girdi sayısı, bayt) kullanımı."""
+		with self._lock:
+			sizes = [entry[2] for key, entry in self.entries.items() if isinstance(key, tuple) and key[0] == name]
+		return len(sizes), sum(sizes)
+
+	def stats(self):
+		with self._lock:
+			lookups = self.hits + self.misses
+			return {
+				'entries': len(self.entries),
+				'bytes': self.total_bytes,
+				'hits': self.hits,
+				'misses': self.misses,
+				'hit_rate': self.hits / lookups if lookups else 0.0,
+				'saved_tokens': self.saved_tokens
+			}
+
+class PrefixCachePartition:
+	"""
+	Registry'deki bir modelin paylaşılan PrefixCache'teki bölümü. Anahtarlar model adıyla
+	ayrılır (farklı modellerin KV'leri karışmaz); bayt bütçesi ve LRU tüm modellerde
+	ortaktır, böylece yüklü model sayısı arttıkça önbellek belleği büyümez.
+	"""
+	def __init__(self, cache, name):
+		self.cache = cache
+		self.name = name
+		self.hits = 0
+		self.misses = 0
+		self.saved_tokens = 0
+
+	def lookup(self, key, input_ids):
+		length, past_key_values = self.cache.lookup((self.name, key), input_ids)
+		if past_key_values is None:
+			self.misses += 1
+		else:
+			self.hits += 1
+			self.saved_tokens += length
+		return length, past_key_values
+
+	def store(self, key, token_ids, past_key_values):
+		self.cache.store((self.name, key), token_ids, past_key_values)
+
+	def evict(self, key):
+		self.cache.evict((self.name, key))
+
+	def clear(self):
+		"""Model bellekten atılınca KV'leri de bırakılır."""
+		self.cache.evict_partition(self.name)
+
+	def stats(self):
+		entries, nbytes = self.cache.usage(self.name)
+		lookups = self.hits + self.misses
+		return {
+			'entries': entries,
+			'bytes': nbytes,
+			'hits': self.hits,
+			'misses': self.misses,
+			'hit_rate': self.hits / lookups if lookups else 0.0,
+			'saved_tokens': self.saved_tokens
+		}
+
+class InferenceScheduler:
+	"""
+	Modelin tek sahibi. Tüm oturumlardan gelen istekleri kuyruklar, sol-dolgulu
+	(left padding) batch'ler halinde çalıştırır ve biten dizileri adım aralarında
+	batch'ten çıkarıp yerlerine bekleyen istekleri alır.
+	"""
+	def __init__(self, model, tokenizer, max_batch_size=1, max_queue_size=None, prefix_cache=None, thread_init=None,
+			draft_model=None, num_draft_tokens=4, profiler=None):
+		self.model = model
+		self.tokenizer = tokenizer
+		self.prefix_cache = prefix_cache
+		self.thread_init = thread_init
+		self.profiler = profiler
+		self.capture = None  # Süren ProfileCapture (yalnızca zamanlayıcı thread'i kullanır)
+		self.draft_model = draft_model
+		self.num_draft_tokens = max(1, int(num_draft_tokens))
+		self.max_batch_size = max(1, int(max_batch_size))
+		self.pending = queue.Queue(maxsize=max_queue_size or self.max_batch_size * 4)
+		self.pad_token_id = tokenizer.eos_token_id
+		self.eos_token_id = tokenizer.eos_token_id
+		self.max_positions = getattr(model.config, 'max_position_embeddings', 2048)
+		self.prefill_tokens = 0
+		self.prefill_seconds = 0.0
+		self.draft_proposed = 0
+		self.draft_accepted = 0
+		self.speculative_tokens = 0
+		self.speculative_seconds = 0.0
+		self._running = False
+		self._reset_batch()
+		self.worker_thread = threading.Thread(target=self._run, daemon=True)
+
+	def _reset_batch(self):
+		self.active = []              # Batch'teki GenerationRequest'ler (satır sırasıyla)
+		self.admitting = []           # Prefill edilmekte olan istekler
+		self.past_key_values = None   # Katman başına (key, value); [B, H, L, D]
+		self.attention_mask = None    # [B, L]; sol dolgu 0
+		self.positions = None         # [B]; bir sonraki token'ın position id'si
+		self.next_tokens = None       # [B, 1]; bir sonraki adımda beslenecek token
+		self.draft_request = None     # Taslak modelin KV'sinin ait olduğu istek
+		self.draft_past = None        # Taslak KV; dizinin ilk draft_length token'ını kapsar
+		self.draft_length = 0
+
+	def start(self):
+		self._running = True
+		self.worker_thread.start()
+		return self
+
+	def stop(self):
+		self._running = False
+
+	def submit(self, prompt, max_new_tokens, temperature, top_k, do_sample=True, streamer=None, cache_key=None,
+			seed=None, timeout=None, stop=None, input_ids=None):
+		"""
+		Prompt'u tokenize edip kuyruğa ekler. Kuyruk doluysa queue.Full fırlatır.
+		timeout (saniye) kuyrukta geçen süreyi de kapsar.
+		"""
+		input_ids, max_new_tokens = encode_prompt(self.tokenizer, prompt, max_new_tokens, self.max_positions, input_ids)
+		profile = self.profiler is not None and self.profiler.claim()
+		request = GenerationRequest(input_ids, max_new_tokens, temperature, top_k, do_sample, streamer, cache_key, seed,
+									request_deadline(timeout), stop, profile)
+		self.submit_request(request)
+		return request
+
+	def submit_request(self, request, block=False):
+		self.pending.put(request, block=block)
+
+	def evict_cache(self, cache_key):
+		if self.prefix_cache is not None:
+			self.prefix_cache.evict(cache_key)
+
+	@property
+	def queue_depth(self):
+		return self.pending.qsize()
+
+	def stats(self):
+		"""Önek önbelleği isabetleri ve bunların kazandırdığı tahmini prefill süresi."""
+		stats = self.prefix_cache.stats() if self.prefix_cache else {}
+		seconds_per_token = self.prefill_seconds / self.prefill_tokens if self.prefill_tokens else 0.0
+		stats['saved_prefill_seconds'] = stats.get('saved_tokens', 0) * seconds_per_token
+		if self.draft_model is not None:
+			stats['draft_acceptance_rate'] = self.draft_accepted / self.draft_proposed if self.draft_proposed else 0.0
+			stats['speculative_tokens_per_sec'] = (
+				self.speculative_tokens / self.speculative_seconds if self.speculative_seconds else 0.0
+			)
+		return stats
+
+	# ----------------------------
+	# ZAMANLAYICI DÖNGÜSÜ
+	# ----------------------------
+	def _run(self):
+		if self.thread_init is not None:
+			self.thread_init()
+		while self._running:
+			try:
+				if self.capture is not None and self.capture.finished:
+					self._stop_capture()
+				with self._profile_range("neo::admit"):
+					self._admit()
+				if not self.active:
+					continue
+				# Tek istek varken (gecikmenin en belirgin olduğu durum) taslak modelle spekülatif adım at
+				if self.draft_model is not None and len(self.active) == 1 and self.pending.empty():
+					with self._profile_range("neo::speculative_step"):
+						self._speculative_step()
+				else:
+					with self._profile_range("neo::decode_step"):
+						self._decode_step()
+			except Exception as e:
+				print("Exception occurred in InferenceScheduler:")
+				traceback.print_exc()
+				# Batch'teki ve prefill sırasında hata alan isteklerin hepsini bitir
+				for request in self.active + self.admitting:
+					if not request.done:
+						request._finish("error", e)
+				self._reset_batch()
+		if self.capture is not None:
+			self._stop_capture()
+
+	def _profile_range(self, name):
+		"""Profil kaydı sürerken trace'te adlandırılmış bir aralık; aksi halde hiçbir şey yapmaz."""
+		return torch.autograd.profiler.record_function(name) if self.capture is not None else _NO_PROFILE_RANGE
+
+	def _start_capture(self, request):
+		if self.capture is None:
+			name = getattr(self.model.config, '_name_or_path', '') or 'model'
+			label = re.sub(r"[^\w.-]", "_", os.path.basename(os.path.normpath(name)))
+			self.capture = ProfileCapture(self.profiler, self.model, label)
+		self.capture.track(request)
+
+	def _stop_capture(self):
+		self.capture.stop()
+		self.capture = None
+
+	def _admit(self):
+		"""Boş slotları kuyruktaki isteklerle doldurur ve onları prefill eder."""
+		free_slots = self.max_batch_size - len(self.active)
+		new_requests = []
+		while len(new_requests) < free_slots:
+			try:
+				# Batch boşsa yeni istek gelene kadar bekle, doluysa beklemeden devam et
+				block = not self.active and not new_requests
+				request = self.pending.get(timeout=0.5) if block else self.pending.get_nowait()
+			except queue.Empty:
+				break
+			if request.cancelled:
+				request._finish("cancelled")
+				continue
+			if request.expired:
+				request._finish("timeout")
+				continue
+			request.admitted_at = time.time()
+			if request.profile and self.profiler is not None:
+				self._start_capture(request)
+			new_requests.append(request)
+		self.admitting = new_requests
+
+		# Önbellekte öneki olan istekler yalnızca yeni token'ları prefill eder.
+		# Farklı önek uzunlukları ortada dolgu gerektireceğinden (yerel dikkat
+		# penceresini bozar) bunlar tek tek, diğerleri birlikte prefill edilir.
+		misses = []
+		for request in new_requests:
+			prefix_length, past_key_values = 0, None
+			if self.prefix_cache is not None and request.cache_key is not None:
+				prefix_length, past_key_values = self.prefix_cache.lookup(request.cache_key, request.input_ids)
+			if past_key_values is None:
+				misses.append(request)
+			else:
+				self._prefill([request], past_key_values, prefix_length)
+		if misses:
+			self._prefill(misses)
+		self.admitting = []
+
+	@torch.no_grad()
+	def _prefill(self, requests, past_key_values=None, prefix_length=0):
+		suffixes = [r.input_ids[prefix_length:] for r in requests]
+		max_len = max(len(suffix) for suffix in suffixes)
+		input_ids = torch.full((len(requests), max_len), self.pad_token_id, dtype=torch.long)
+		attention_mask = torch.zeros((len(requests), prefix_length + max_len), dtype=torch.long)
+		attention_mask[:, :prefix_length] = 1
+		for i, suffix in enumerate(suffixes):
+			input_ids[i, max_len - len(suffix):] = torch.tensor(suffix, dtype=torch.long)
+			attention_mask[i, prefix_length + max_len - len(suffix):] = 1
+		position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)[:, prefix_length:]
+
+		started = time.time()
+		with self._profile_range("neo::prefill"):
+			outputs = self.model(
+				input_ids=input_ids,
+				past_key_values=past_key_values,
+				attention_mask=attention_mask,
+				position_ids=position_ids,
+				use_cache=True
+			)
+		elapsed = time.time() - started
+		self.prefill_seconds += elapsed
+		self.prefill_tokens += sum(len(suffix) for suffix in suffixes)
+		for request in requests:
+			request.prefill_seconds = elapsed
+
+		with self._profile_range("neo::sample"):
+			next_tokens = self._sample(outputs.logits[:, -1, :], requests)
+		positions = attention_mask.sum(-1)
+
+		# İlk token'da biten istekler batch'e hiç katılmaz
+		with self._profile_range("neo::record"):
+			keep = self._record(requests, next_tokens, outputs.past_key_values, attention_mask)
+		if not keep:
+			return
+		index = torch.tensor(keep, dtype=torch.long)
+		past_key_values, attention_mask = self._select(outputs.past_key_values, attention_mask, index)
+		self._merge(
+			[requests[i] for i in keep],
+			past_key_values,
+			attention_mask,
+			positions.index_select(0, index),
+			next_tokens.index_select(0, index)
+		)
+
+	@torch.no_grad()
+	def _decode_step(self):
+		metrics.batch_size.observe(len(self.active))
+		attention_mask = torch.cat(
+			[self.attention_mask, self.attention_mask.new_ones((len(self.active), 1))], dim=-1
+		)
+		outputs = self.model(
+			input_ids=self.next_tokens,
+			past_key_values=self.past_key_values,
+			attention_mask=attention_mask,
+			position_ids=self.positions.unsqueeze(-1),
+			use_cache=True
+		)
+		self.past_key_values = outputs.past_key_values
+		self.attention_mask = attention_mask
+		self.positions = self.positions + 1
+
+		with self._profile_range("neo::sample"):
+			next_tokens = self._sample(outputs.logits[:, -1, :], self.active)
+		self.next_tokens = next_tokens.unsqueeze(-1)
+		# Token'ların akışa (arayüz/worker kanalı) aktarılması ve durdurma kontrolleri
+		with self._profile_range("neo::record"):
+			keep = self._record(self.active, next_tokens, self.past_key_values, self.attention_mask)
+		if len(keep) != len(self.active):
+			self._retire(keep)
+
+	def _record(self, requests, next_tokens, past_key_values, attention_mask):
+		"""Örneklenen token'ları isteklere ekler; devam eden satırların indekslerini döndürür."""
+		keep = []
+		for i, (request, token) in enumerate(zip(requests, next_tokens.tolist())):
+			if request.cancelled:
+				reason = "cancelled"
+			else:
+				request._append(token)
+				reason = self._finish_reason(request, token)
+				if reason is None:
+					keep.append(i)
+					continue
+			self._store_prefix(request, past_key_values, attention_mask, i)
+			request._finish(reason)
+		return keep
+
+	def _finish_reason(self, request, token):
+		if token == self.eos_token_id:
+			return "stop"
+		if request.stop:
+			tail = self.tokenizer.decode(request.output_ids[-request.stop_window:], skip_special_tokens=True)
+			if any(sequence in tail for sequence in request.stop):
+				return "stop"
+		if len(request.output_ids) >= request.max_new_tokens:
+			return "length"
+		if request.expired:
+			return "timeout"
+		return None
+
+	def _store_prefix(self, request, past_key_values, attention_mask, row):
+		"""Biten satırın dolgusuz KV'sini sohbetin önek önbelleğine kopyalar."""
+		if self.prefix_cache is None or request.cache_key is None:
+			return
+		length = int(attention_mask[row].sum())
+		token_ids = (request.input_ids + request.output_ids)[:length]
+		# Kopyala; aksi halde görünüm (view) tüm batch tensörünü bellekte tutar
+		row_past = tuple(
+			(key[row:row + 1, :, -length:].clone(), value[row:row + 1, :, -length:].clone())
+			for key, value in past_key_values
+		)
+		self.prefix_cache.store(request.cache_key, token_ids, row_past)
+
+	def _retire(self, keep):
+		"""Biten satırları batch'ten çıkarır."""
+		if not keep:
+			self._reset_batch()
+			return
+
+		index = torch.tensor(keep, dtype=torch.long)
+		self.active = [self.active[i] for i in keep]
+		self.past_key_values, self.attention_mask = self._select(self.past_key_values, self.attention_mask, index)
+		self.positions = self.positions.index_select(0, index)
+		self.next_tokens = self.next_tokens.index_select(0, index)
+
+	@staticmethod
+	def _select(past_key_values, attention_mask, index):
+		"""Verilen satırları seçer ve hepsinde dolgu olan soldaki sütunları atar."""
+		attention_mask = attention_mask.index_select(0, index)
+		offset = int((attention_mask.sum(0) == 0).long().cumprod(0).sum())
+		past_key_values = tuple(
+			(key.index_select(0, index)[:, :, offset:], value.index_select(0, index)[:, :, offset:])
+			for key, value in past_key_values
+		)
+		return past_key_values, attention_mask[:, offset:]
+
+	def _merge(self, requests, past_key_values, attention_mask, positions, next_tokens):
+		"""Yeni prefill edilmiş satırları mevcut batch'e sol dolgu ile ekler."""
+		if not self.active:
+			self.active = list(requests)
+			self.past_key_values = past_key_values
+			self.attention_mask = attention_mask
+			self.positions = positions
+			self.next_tokens = next_tokens.unsqueeze(-1)
+			return
+
+		current_len = self.attention_mask.shape[-1]
+		new_len = attention_mask.shape[-1]
+		target_len = max(current_len, new_len)
+
+		def _left_pad(tensor, length, dim):
+			if length == 0:
+				return tensor
+			pad = [0, 0] * (tensor.dim() - dim - 1) + [length, 0]
+			return torch.nn.functional.pad(tensor, pad)
+
+		self.past_key_values = tuple(
+			(
+				torch.cat([_left_pad(old_k, target_len - current_len, 2), _left_pad(new_k, target_len - new_len, 2)]),
+				torch.cat([_left_pad(old_v, target_len - current_len, 2), _left_pad(new_v, target_len - new_len, 2)])
+			)
+			for (old_k, old_v), (new_k, new_v) in zip(self.past_key_values, past_key_values)
+		)
+		self.attention_mask = torch.cat([
+			_left_pad(self.attention_mask, target_len - current_len, 1),
+			_left_pad(attention_mask, target_len - new_len, 1)
+		])
+		self.active.extend(requests)
+		self.positions = torch.cat([self.positions, positions])
+		self.next_tokens = torch.cat([self.next_tokens, next_tokens.unsqueeze(-1)])
+
+	# ----------------------------
+	# SPEKÜLATİF ÇÖZÜMLEME (TASLAK MODEL)
+	# ----------------------------
+	@staticmethod
+	def _warp(logits, request):
+		"""Bir isteğin temperature/top_k ayarlarıyla olasılık dağılımları; [N, V]."""
+		scores = logits.float() / max(request.temperature, 1e-5)
+		if 0 < request.top_k < scores.shape[-1]:
+			threshold = torch.topk(scores, request.top_k, dim=-1).values[..., -1:]
+			scores = scores.masked_fill(scores < threshold, float("-inf"))
+		return torch.softmax(scores, dim=-1)
+
+	@torch.no_grad()
+	def _speculative_step(self):
+		"""
+		Taslak model k token önerir, büyük model hepsini tek ileri geçişte doğrular.
+		Örneklemede kabul/ret (speculative sampling) kuralı kullanıldığından çıktı
+		dağılımı büyük modelin temperature/top_k dağılımıyla aynıdır; greedy modda
+		çıktı normal çözümlemeyle birebir aynıdır.
+		"""
+		request = self.active[0]
+		past_length = self.attention_mask.shape[-1]
+		k = min(
+			self.num_draft_tokens,
+			request.max_new_tokens - len(request.output_ids),
+			self.max_positions - past_length - 1
+		)
+		greedy = not (request.do_sample and request.temperature > 0)
+		# Seed'li örneklemede çıktı, çözümleme yolundan bağımsız olarak tekrarlanabilir kalmalı
+		if k < 1 or request.cancelled or (request.generator is not None and not greedy):
+			self._decode_step()
+			return
+
+		started = time.time()
+		metrics.batch_size.observe(1)
+		sequence = request.input_ids + request.output_ids
+
+		# Taslak KV'si bu isteğe ait değilse baştan kur; aksi halde eksik token'ları besle
+		if self.draft_request is not request:
+			self.draft_request = request
+			self.draft_past = None
+			self.draft_length = 0
+		feed = sequence[self.draft_length:]
+		draft_tokens, draft_probs = [], []
+		for _ in range(k):
+			outputs = self.draft_model(
+				input_ids=torch.tensor([feed], dtype=torch.long),
+				past_key_values=self.draft_past,
+				use_cache=True
+			)
+			self.draft_past = outputs.past_key_values
+			logits = outputs.logits[:, -1, :]
+			if greedy:
+				token = int(logits.argmax(dim=-1))
+			else:
+				probs = self._warp(logits, request)[0]
+				token = int(torch.multinomial(probs, num_samples=1))
+				draft_probs.append(probs)
+			draft_tokens.append(token)
+			feed = [token]
+
+		# Büyük model: beslenmemiş son token + taslak token'lar tek geçişte
+		verify_ids = torch.tensor([[int(self.next_tokens[0, 0])] + draft_tokens], dtype=torch.long)
+		outputs = self.model(
+			input_ids=verify_ids,
+			past_key_values=self.past_key_values,
+			attention_mask=self.attention_mask.new_ones((1, past_length + k + 1)),
+			position_ids=(self.positions + torch.arange(k + 1)).unsqueeze(0),
+			use_cache=True
+		)
+		logits = outputs.logits[0]
+
+		accepted = []
+		if greedy:
+			targets = logits.argmax(dim=-1).tolist()
+			for i, token in enumerate(draft_tokens):
+				if targets[i] != token:
+					break
+				accepted.append(token)
+			new_token = targets[len(accepted)]
+		else:
+			target_probs = self._warp(logits, request)
+			new_token = None
+			for i, token in enumerate(draft_tokens):
+				# min(1, p/q) olasılıkla kabul et
+				if float(torch.rand(())) * float(draft_probs[i][token]) <= float(target_probs[i, token]):
+					accepted.append(token)
+					continue
+				residual = (target_probs[i] - draft_probs[i]).clamp(min=0)
+				residual = residual if float(residual.sum()) > 0 else target_probs[i]
+				new_token = int(torch.multinomial(residual / residual.sum(), num_samples=1))
+				break
+			if new_token is None:
+				new_token = int(torch.multinomial(target_probs[len(accepted)], num_samples=1))
+
+		self.draft_proposed += k
+		self.draft_accepted += len(accepted)
+		request.draft_proposed += k
+		request.draft_accepted += len(accepted)
+
+		# Token'ları sırayla ekle; durma koşulu olursa orada kes
+		appended, reason = 0, None
+		for token in accepted + [new_token]:
+			if request.cancelled:
+				reason = "cancelled"
+				break
+			request._append(token)
+			appended += 1
+			reason = self._finish_reason(request, token)
+			if reason is not None:
+				break
+
+		# Büyük modelin KV'si yalnızca beslenen ve kabul edilen token'ları kapsasın
+		keep = past_length + appended
+		self.past_key_values = tuple((key[:, :, :keep], value[:, :, :keep]) for key, value in outputs.past_key_values)
+		self.attention_mask = self.attention_mask.new_ones((1, keep))
+		self.positions = self.positions + appended
+		if appended:
+			self.next_tokens = torch.tensor([[request.output_ids[-1]]], dtype=torch.long)
+
+		# Taslak KV'si, taslak token'larından kabul edilenlerle sınırlı kalsın
+		self.draft_length = len(sequence) + min(len(accepted), appended, k - 1)
+		self.draft_past = tuple(
+			(key[:, :, :self.draft_length], value[:, :, :self.draft_length]) for key, value in self.draft_past
+		)
+
+		self.speculative_tokens += appended
+		self.speculative_seconds += time.time() - started
+
+		if reason is not None:
+			self._store_prefix(request, self.past_key_values, self.attention_mask, 0)
+			request._finish(reason)
+			self._reset_batch()
+
+	def _sample(self, logits, requests):
+		"""Her satır için kendi temperature/top_k değeriyle bir sonraki token'ı seçer."""
+		logits = logits.float()
+		greedy = logits.argmax(dim=-1)
+		do_sample = torch.tensor([r.do_sample and r.temperature > 0 for r in requests])
+		if not do_sample.any():
+			return greedy
+
+		temperatures = torch.tensor([max(r.temperature, 1e-5) for r in requests])
+		scores = logits / temperatures.unsqueeze(-1)
+
+		vocab_size = scores.shape[-1]
+		top_k = torch.tensor([r.top_k if 0 < r.top_k < vocab_size else vocab_size for r in requests])
+		max_k = int(top_k.max())
+		if max_k < vocab_size:
+			top_values = torch.topk(scores, max_k, dim=-1).values
+			threshold = top_values.gather(-1, (top_k - 1).unsqueeze(-1))
+			scores = scores.masked_fill(scores < threshold, float("-inf"))
+
+		probs = torch.softmax(scores, dim=-1)
+		sampled = torch.multinomial(probs, num_samples=1).squeeze(-1)
+		for row, request in enumerate(requests):
+			if request.generator is not None and do_sample[row]:
+				sampled[row] = torch.multinomial(probs[row], num_samples=1, generator=request.generator)[0]
+		return torch.where(do_sample, sampled, greedy)
+
+# ----------------------------
+# ÇOK SÜREÇLİ ÇIKARIM HAVUZU
+# ----------------------------
+def plan_worker_placements(placement, workers):
+	"""
+	Her worker sürecine bir CPU kümesi atar. NUMA düğümü sayısı yetiyorsa her
+	worker kendi düğümünün fiziksel çekirdeklerini alır; aksi halde çıkarım
+	çekirdekleri worker'lar arasında eşit bölünür.
+	"""
+	layout = placement['numa_layout']
+	if len(layout) >= workers > 1:
+		nodes = sorted(layout, key=lambda node: len(layout[node]), reverse=True)[:workers]
+		return [[cpu for cpu in layout[node] if cpu not in placement['service']] or layout[node] for node in nodes]
+
+	cpus = placement['inference']
+	size = max(1, len(cpus) // workers)
+	return [cpus[i * size:(i + 1) * size] or cpus for i in range(workers)]
+
+class _TokenRelay:
+	"""Worker sürecinde üretilen token'ları ve bitiş bilgisini ana sürece ileten streamer."""
+	def __init__(self, request_id, send, on_end):
+		self.request_id = request_id
+		self.send = send
+		self.on_end = on_end
+		self.request = None
+
+	def put(self, token_id):
+		self.send(('token', self.request_id, token_id))
+
+	def end(self):
+		request = self.request
+		error = repr(request.error) if request.error is not None else None
+		draft = (request.draft_proposed, request.draft_accepted)
+		queue_wait = request.admitted_at - request.submitted_at if request.admitted_at is not None else None
+		self.send(('finish', self.request_id, request.finish_reason, error, draft, (queue_wait, request.prefill_seconds)))
+		self.on_end(self.request_id)
+
+def inference_worker_main(conn, model_dir, precision, cpus, scheduler_params, prefix_cache_params, speculative_params,
+		profiler_params):
+	"""
+	Havuzdaki bir çıkarım sürecinin giriş noktası. Ağırlıklar aynı safetensors
+	dosyasından MAP_PRIVATE ile eşlendiği için fiziksel sayfalar sayfa önbelleği
+	üzerinden tüm worker'lar arasında paylaşılır.
+	"""
+	pin_current_thread(cpus)
+	torch.set_num_threads(len(cpus))
+
+	# Worker'lar hazır token id'leri alır; tokenizer yalnızca durdurma dizileri için decode eder
+	tokenizer = load_tokenizer(model_dir, cache_entries=0)
+	config = AutoConfig.from_pretrained(model_dir)
+	model, _ = load_model_mmap(model_dir, config, PRECISION_DTYPES[precision])
+	if precision == 'int8':
+		model, _ = quantize_model_int8(model, model_dir)
+	draft_model = None
+	if speculative_params['draft_model_path']:
+		draft_model = load_draft_model(speculative_params['draft_model_path'], precision, config)
+
+	send_lock = threading.Lock()
+
+	def send(message):
+		with send_lock:
+			conn.send(message)
+
+	requests = {}
+	scheduler = InferenceScheduler(
+		model,
+		tokenizer,
+		prefix_cache=PrefixCache(**prefix_cache_params),
+		draft_model=draft_model,
+		num_draft_tokens=speculative_params['num_draft_tokens'],
+		# Hangi isteklerin profilleneceğine ana süreç karar verir; worker yalnızca kaydı yazar
+		profiler=GenerationProfiler(**profiler_params),
+		**scheduler_params
+	).start()
+	send(('ready', os.getpid()))
+
+	while True:
+		try:
+			message = conn.recv()
+		except (EOFError, OSError):
+			break
+
+		kind = message[0]
+		if kind == 'submit':
+			_, request_id, params = message
+			relay = _TokenRelay(request_id, send, lambda request_id: requests.pop(request_id, None))
+			request = GenerationRequest(streamer=relay, **params)
+			relay.request = request
+			requests[request_id] = request
+			scheduler.submit_request(request, block=True)
+		elif kind == 'cancel':
+			request = requests.get(message[1])
+			if request is not None:
+				request.cancel()
+		elif kind == 'evict':
+			scheduler.evict_cache(message[1])
+		elif kind == 'stop':
+			break
+	scheduler.stop()
+
+class RemoteGenerationRequest(GenerationRequest):
+	"""Bir worker sürecinde çalışan isteğin ana süreçteki karşılığı."""
+	def __init__(self, pool, worker_index, request_id, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.pool = pool
+		self.worker_index = worker_index
+		self.request_id = request_id
+
+	def cancel(self):
+		super().cancel()
+		self.pool._send(self.worker_index, ('cancel', self.request_id))
+
+class InferenceWorkerPool:
+	"""
+	InferenceScheduler ile aynı arayüzü sunan çok süreçli çıkarım havuzu. Her worker
+	kendi sürekli batch zamanlayıcısını çalıştırır; ana süreç istekleri yerel bir
+	Pipe üzerinden dağıtır ve ölen worker'ları yeniden başlatır.
+	"""
+	def __init__(self, model_dir, precision, tokenizer, config, worker_cpus, scheduler_params, prefix_cache_params,
+			speculative_params, profiler=None, profiler_params=None):
+		self.model_dir = model_dir
+		self.precision = precision
+		self.tokenizer = tokenizer
+		self.max_positions = getattr(config, 'max_position_embeddings', 2048)
+		self.worker_cpus = worker_cpus
+		self.scheduler_params = scheduler_params
+		self.prefix_cache_params = prefix_cache_params
+		self.speculative_params = speculative_params
+		self.profiler = profiler
+		self.profiler_params = profiler_params or {}
+		self.capacity = scheduler_params['max_batch_size'] + scheduler_params['max_queue_size']
+		self.prefix_cache = None
+		self.context = multiprocessing.get_context('spawn')
+		self.workers = [None] * len(worker_cpus)
+		self.outstanding = [{} for _ in worker_cpus]  # worker -> {request_id: istek}
+		self.cache_affinity = {}					  # cache_key -> worker (önek önbelleği worker'da)
+		self.restarts = 0
+		self._ids = itertools.count()
+		self._lock = threading.Lock()
+		self._running = False
+
+	def start(self, timeout=None):
+		"""Tüm worker'ları başlatır ve modellerini yüklemelerini bekler."""
+		self._running = True
+		for index in range(len(self.workers)):
+			self._spawn(index)
+		for worker in self.workers:
+			if not worker['ready'].wait(timeout):
+				raise TimeoutError("Çıkarım süreçleri zamanında hazır olmadı!")
+		threading.Thread(target=self._monitor, daemon=True).start()
+		return self
+
+	def stop(self):
+		self._running = False
+		for index in range(len(self.workers)):
+			self._send(index, ('stop',))
+
+	def _spawn(self, index):
+		parent_conn, child_conn = self.context.Pipe()
+		process = self.context.Process(
+			target=inference_worker_main,
+			args=(
+				child_conn,
+				self.model_dir,
+				self.precision,
+				self.worker_cpus[index],
+				self.scheduler_params,
+				self.prefix_cache_params,
+				self.speculative_params,
+				self.profiler_params
+			),
+			daemon=True
+		)
+		process.start()
+		child_conn.close()
+		worker = {
+			'process': process,
+			'conn': parent_conn,
+			'send_lock': threading.Lock(),
+			'ready': threading.Event()
+		}
+		self.workers[index] = worker
+		threading.Thread(target=self._receive, args=(index, worker), daemon=True).start()
+
+	def _send(self, index, message):
+		worker = self.workers[index]
+		try:
+			with worker['send_lock']:
+				worker['conn'].send(message)
+		except (OSError, ValueError):
+			pass  # Worker ölmüşse izleyici thread istekleri sonlandırıp yeniden başlatır
+
+	def _receive(self, index, worker):
+		"""Bir worker'dan gelen token ve bitiş mesajlarını ilgili isteklere aktarır."""
+		outstanding = self.outstanding[index]
+		while True:
+			try:
+				message = worker['conn'].recv()
+			except (EOFError, OSError):
+				break
+
+			kind = message[0]
+			if kind == 'ready':
+				print(f"Çıkarım süreci #{index} hazır (pid {message[1]})")
+				worker['ready'].set()
+			elif kind == 'token':
+				request = outstanding.get(message[1])
+				if request is None:
+					continue
+				try:
+					request._append(message[2])
+				except Exception as e:
+					# Bozuk bir streamer yalnızca kendi isteğini düşürsün, kanalı değil
+					traceback.print_exc()
+					request.cancel()
+					with self._lock:
+						outstanding.pop(message[1], None)
+					request._finish("error", e)
+			elif kind == 'finish':
+				with self._lock:
+					request = outstanding.pop(message[1], None)
+				if request is not None:
+					request.draft_proposed, request.draft_accepted = message[4]
+					# Kuyruk bekleme ve prefill süreleri worker'da ölçülür
+					queue_wait, request.prefill_seconds = message[5]
+					if queue_wait is not None:
+						request.admitted_at = request.submitted_at + queue_wait
+					error = RuntimeError(message[3]) if message[3] else None
+					request._finish(message[2], error)
+
+	def _monitor(self):
+		"""Ölen worker'ların bekleyen isteklerini hatayla bitirir ve süreci yeniden başlatır."""
+		while self._running:
+			time.sleep(1.0)
+			for index, worker in enumerate(self.workers):
+				if worker['process'].is_alive():
+					continue
+				print(f"Çıkarım süreci #{index} sonlandı (çıkış kodu {worker['process'].exitcode}), yeniden başlatılıyor...")
+				with self._lock:
+					failed = list(self.outstanding[index].values())
+					self.outstanding[index].clear()
+				for request in failed:
+					request._finish("error", RuntimeError("Çıkarım süreci beklenmedik şekilde sonlandı!"))
+				worker['conn'].close()
+				self.restarts += 1
+				self._spawn(index)
+
+	def _pick_worker(self, cache_key):
+		"""Önek önbelleği için aynı sohbeti aynı worker'a, diğerlerini en boş olana yönlendirir."""
+		ready = [i for i, worker in enumerate(self.workers) if worker['ready'].is_set()]
+		index = self.cache_affinity.get(cache_key)
+		if index not in ready or len(self.outstanding[index]) >= self.capacity:
+			if not ready:
+				raise queue.Full
+			index = min(ready, key=lambda i: len(self.outstanding[i]))
+			if len(self.outstanding[index]) >= self.capacity:
+				raise queue.Full
+		if cache_key is not None:
+			self.cache_affinity[cache_key] = index
+		return index
+
+	def submit(self, prompt, max_new_tokens, temperature, top_k, do_sample=True, streamer=None, cache_key=None,
+			seed=None, timeout=None, stop=None, input_ids=None):
+		"""
+		Prompt'u tokenize edip bir worker'a gönderir. Tüm worker'lar doluysa queue.Full fırlatır.
+		"""
+		input_ids, max_new_tokens = encode_prompt(self.tokenizer, prompt, max_new_tokens, self.max_positions, input_ids)
+		deadline = request_deadline(timeout)
+		with self._lock:
+			index = self._pick_worker(cache_key)
+			request_id = next(self._ids)
+			request = RemoteGenerationRequest(
+				self, index, request_id,
+				input_ids, max_new_tokens, temperature, top_k, do_sample, streamer, cache_key, seed, deadline, stop
+			)
+			self.outstanding[index][request_id] = request
+
+		self._send(index, ('submit', request_id, {
+			'input_ids': input_ids,
+			'max_new_tokens': max_new_tokens,
+			'temperature': temperature,
+			'top_k': top_k,
+			'do_sample': do_sample,
+			'cache_key': cache_key,
+			'seed': seed,
+			'deadline': deadline,
+			'stop': stop,
+			'profile': self.profiler is not None and self.profiler.claim()
+		}))
+		return request
+
+	def evict_cache(self, cache_key):
+		index = self.cache_affinity.pop(cache_key, None)
+		if index is not None:
+			self._send(index, ('evict', cache_key))
+
+	@property
+	def queue_depth(self):
+		return sum(len(outstanding) for outstanding in self.outstanding)
+
+	def stats(self):
+		return {
+			'workers': len(self.workers),
+			'alive': sum(worker['process'].is_alive() for worker in self.workers),
+			'restarts': self.restarts,
+			'outstanding': self.queue_depth
+		}
+
+# ----------------------------
+# MODEL KAYDI (BİRDEN ÇOK CHECKPOINT)
+# ----------------------------
+def _is_checkpoint(path):
+	return all(os.path.isfile(os.path.join(path, name)) for name in ("config.json", "model.safetensors"))
+
+def find_checkpoints(models_dir):
+	"""
+	models_dir altında config.json ve model.safetensors içeren klasörler: {ad: yol}.
+	models_dir'in kendisi bir checkpoint ise tek model olarak döner.
+	"""
+	if _is_checkpoint(models_dir):
+		return {os.path.basename(os.path.normpath(models_dir)): models_dir}
+	return {
+		os.path.basename(path): path
+		for path in sorted(glob.glob(os.path.join(models_dir, "*")))
+		if os.path.isdir(path) and _is_checkpoint(path)
+	}
+
+def checkpoint_size_mb(model_dir):
+	"""Yükleme öncesi bellek tahmini: checkpoint dosyasının boyutu (bf16/int8'de gerçek boyut daha küçüktür)."""
+	return os.path.getsize(os.path.join(model_dir, "model.safetensors")) / (1024 * 1024)
+
+class LoadedModel:
+	"""
+	Bellekteki bir checkpoint: tokenizer'ı, bağlam kurucusu ve zamanlayıcısı (veya
+	worker havuzu). İstekler submit ile gönderilir; bitmemiş isteği olan model
+	meşgul sayılır ve bellekten atılmaz.
+	"""
+	def __init__(self, name, path, tokenizer, context_builder, scheduler, precision, memory_mb, load_stats):
+		self.name = name
+		self.path = path
+		self.tokenizer = tokenizer
+		self.context_builder = context_builder
+		self.scheduler = scheduler
+		self.precision = precision
+		self.memory_mb = memory_mb
+		self.load_stats = load_stats
+		self.max_positions = scheduler.max_positions
+		self.registry = None
+		self.evicted = False
+		self.requests = []
+		self._lock = threading.Lock()
+
+	def submit(self, prompt, **kwargs):
+		"""scheduler.submit gibi; model bu arada bellekten atıldıysa yeniden yüklenip gönderilir."""
+		with self._lock:
+			if not self.evicted:
+				request = self.scheduler.submit(prompt, **kwargs)
+				self.requests.append(request)
+				return request
+		return self.registry.get(self.name).submit(prompt, **kwargs)
+
+	@property
+	def busy(self):
+		with self._lock:
+			self.requests = [request for request in self.requests if not request.done]
+			return bool(self.requests)
+
+	def unload(self):
+		"""Meşgul değilse zamanlayıcıyı durdurup ağırlıkları bırakır; bırakıldıysa True."""
+		with self._lock:
+			self.requests = [request for request in self.requests if not request.done]
+			if self.requests or self.scheduler.queue_depth:
+				return False
+			self.evicted = True
+		self.scheduler.stop()
+		if isinstance(getattr(self.scheduler, 'prefix_cache', None), PrefixCachePartition):
+			self.scheduler.prefix_cache.clear()
+		self.scheduler = None
+		return True
+
+class ModelRegistry:
+	"""
+	Model klasöründeki checkpoint'leri ilk kullanımda yükler. Yeni model toplam bellek
+	bütçesine sığmayacaksa en uzun süredir kullanılmayan boştaki modeller atılır
+	(LRU); isteği süren model atılmaz. Yüklemeler sırayla arka plan thread'inde
+	yapılır; resolve() yükleme sürerken yüklü başka bir modelle yanıt verdirebilir.
+	"""
+	def __init__(self, models_dir, loader, memory_budget_mb=None, default_model=None, reserved_mb=0):
+		self.models_dir = models_dir
+		self.loader = loader  # loader(ad, yol) -> LoadedModel
+		# reserved_mb: bütçeden modeller dışında ayrılan bellek (paylaşılan önek önbelleği)
+		self.memory_budget_mb = (memory_budget_mb or psutil.virtual_memory().total * 0.8 / (1024 * 1024)) - reserved_mb
+		self.checkpoints = find_checkpoints(models_dir) if os.path.isdir(models_dir) else {}
+		self.default_model = default_model or next(iter(self.names()), None)
+		self.loaded = OrderedDict()  # ad -> LoadedModel, en eski kullanılan başta
+		self.loading = {}            # ad -> yükleme bitince set edilen Event
+		self.errors = {}             # ad -> son yükleme hatası
+		self.load_history = {}       # ad -> [{'kind': "cold"/"warm", 'seconds': ...}]
+		self.evictions = 0
+		self._lock = threading.Lock()
+		self._load_lock = threading.Lock()  # Aynı anda tek yükleme: tepe bellek tek model kadar artar
+
+	def names(self):
+		"""Checkpoint adları, küçükten büyüğe."""
+		return sorted(self.checkpoints, key=lambda name: checkpoint_size_mb(self.checkpoints[name]))
+
+	def load_async(self, name):
+		"""Model yüklü değilse arka planda yüklemeye başlar; yükleme bitince set edilen Event döndürür."""
+		if name not in self.checkpoints:
+			raise KeyError(f"Bilinmeyen model: {name}")
+		with self._lock:
+			event = self.loading.get(name)
+			if event is None:
+				event = threading.Event()
+				if name in self.loaded:
+					event.set()
+				else:
+					self.loading[name] = event
+					self.errors.pop(name, None)
+					threading.Thread(target=self._load, args=(name, event), daemon=True).start()
+			return event
+
+	def get(self, name=None, timeout=None):
+		"""Modeli döndürür; yüklü değilse yüklenmesini bekler."""
+		name = name or self.default_model
+		while True:
+			with self._lock:
+				model = self.loaded.get(name)
+				if model is not None:
+					self.loaded.move_to_end(name)
+					return model
+			if not self.load_async(name).wait(timeout):
+				raise TimeoutError(f"Model {name} zamanında yüklenmedi")
+			with self._lock:
+				if name in self.errors:
+					raise RuntimeError(f"Model {name} yüklenemedi: {self.errors[name]}")
+
+	def resolve(self, name=None):
+		"""
+		(model, yedek mi) döndürür. İstenen model yüklü değilse arka planda yüklenmeye
+		başlar ve bu sırada varsayılan (yoksa en küçük) yüklü model kullanılır. Hiçbir
+		model yüklü değilse istenen modelin yüklenmesi beklenir.
+		"""
+		name = name or self.default_model
+		with self._lock:
+			requested = name in self.loaded
+			fallback = None
+			if not requested and self.loaded:
+				fallback = self.default_model if self.default_model in self.loaded else min(
+					self.loaded, key=lambda loaded: self.loaded[loaded].memory_mb
+				)
+		if requested:
+			return self.get(name), False
+		self.load_async(name)
+		if fallback is not None:
+			return self.get(fallback), True
+		return self.get(name), False
+
+	def loaded_models(self):
+		with self._lock:
+			return list(self.loaded.values())
+
+	def evict_cache(self, cache_key):
+		for model in self.loaded_models():
+			scheduler = model.scheduler
+			if scheduler is not None:
+				scheduler.evict_cache(cache_key)
+
+	def _load(self, name, event):
+		path = self.checkpoints[name]
+		try:
+			with self._load_lock:
+				self._make_room(checkpoint_size_mb(path))
+				started = time.time()
+				model = self.loader(name, path)
+				seconds = time.time() - started
+				# Sayfa önbelleği ilk yüklemede soğuk, atılan bir modelin yeniden yüklenmesinde sıcaktır
+				kind = "warm" if name in self.load_history else "cold"
+				self.load_history.setdefault(name, []).append({'kind': kind, 'seconds': seconds})
+				model.registry = self
+				model.load_stats['kind'] = kind
+				with self._lock:
+					self.loaded[name] = model
+				print(f"Model {name} yüklendi ({'soğuk' if kind == 'cold' else 'sıcak'}): {seconds:.1f} sn, {model.memory_mb:.0f} MB")
+				# Gerçek boyut tahmini aştıysa bütçe yeniden sağlanır
+				self._make_room(0, keep=name)
+		except Exception as e:
+			print(f"Exception occurred while loading model {name}:")
+			traceback.print_exc()
+			with self._lock:
+				self.errors[name] = e
+		finally:
+			with self._lock:
+				self.loading.pop(name, None)
+			event.set()
+
+	def _make_room(self, needed_mb, keep=None):
+		"""Bütçe aşılıyorsa boştaki modelleri en eski kullanılandan başlayarak atar."""
+		with self._lock:
+			used = sum(model.memory_mb for model in self.loaded.values())
+			candidates = [model for name, model in self.loaded.items() if name != keep]
+		evicted = False
+		for model in candidates:
+			if used + needed_mb <= self.memory_budget_mb:
+				break
+			if model.unload():
+				with self._lock:
+					self.loaded.pop(model.name, None)
+					self.evictions += 1
+				used -= model.memory_mb
+				evicted = True
+				print(f"Model {model.name} bellekten atıldı ({model.memory_mb:.0f} MB)")
+		if evicted:
+			gc.collect()
+		if used + needed_mb > self.memory_budget_mb:
+			print(f"Uyarı: model belleği bütçeyi aşıyor ({used + needed_mb:.0f} / {self.memory_budget_mb:.0f} MB); "
+				  "kullanımdaki modeller atılamadı")
+
+	def stats(self):
+		with self._lock:
+			return {
+				'models': {
+					name: {
+						'loaded': name in self.loaded,
+						'loading': name in self.loading,
+						'busy': name in self.loaded and self.loaded[name].busy,
+						'memory_mb': self.loaded[name].memory_mb if name in self.loaded else None,
+						'loads': list(self.load_history.get(name, []))
+					}
+					for name in self.checkpoints
+				},
+				'used_mb': sum(model.memory_mb for model in self.loaded.values()),
+				'budget_mb': self.memory_budget_mb,
+				'evictions': self.evictions
+			}
+
+# ----------------------------
+# DOSYA İÇERİĞİNİ OKUMA FONKSİYONLARI
+# ----------------------------
+def read_txt(file_path):
+	with open(file_path, 'r', encoding='utf-8', errors='replace') as file:
+		return file.read()
+
+def _extract_pdf_pages(file_path, start, end):
+	"""[start, end) aralığındaki PDF sayfalarının metni (süreç havuzunda çalışır)."""
+	reader = PdfReader(file_path)
+	return [reader.pages[index].extract_text() or "" for index in range(start, end)]
+
+def read_pdf(file_path, executor=None, progress=None, pages_per_task=8, min_parallel_pages=32):
+	"""
+	PDF metnini sayfa sırasıyla döndürür. executor verilirse ve belge yeterince uzunsa
+	sayfa grupları süreç havuzunda paralel çıkarılır; progress(tamamlanan, toplam)
+	sayfa ilerlemesini bildirir.
+	"""
+	page_count = len(PdfReader(file_path).pages)
+	ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+	if executor is None or page_count < min_parallel_pages:
+		results = []
+		for start, end in ranges:
+			results.append(_extract_pdf_pages(file_path, start, end))
+			if progress:
+				progress(end, page_count)
+	else:
+		futures = {executor.submit(_extract_pdf_pages, file_path, start, end): index for index, (start, end) in enumerate(ranges)}
+		results = [None] * len(ranges)
+		done_pages = 0
+		for future in concurrent.futures.as_completed(futures):
+			index = futures[future]
+			results[index] = future.result()
+			done_pages += ranges[index][1] - ranges[index][0]
+			if progress:
+				progress(done_pages, page_count)
+	return "\n".join(page for pages in results for page in pages)
+
+def read_docx(file_path):
+	doc = Document(file_path)
+	parts = [para.text for para in doc.paragraphs]
+	for table in doc.tables:
+		for row in table.rows:
+			parts.append("\t".join(cell.text for cell in row.cells))
+	return "\n".join(parts)
+
+def read_html(file_path):
+	with open(file_path, 'r', encoding='utf-8', errors='replace') as file:
+		converter = html2text.HTML2Text()
+		converter.ignore_links = True
+		converter.ignore_images = True
+		converter.body_width = 0
+		return converter.handle(file.read())
+
+def read_markdown(file_path):
+	with open(file_path, 'r', encoding='utf-8', errors='replace') as file:
+		return file.read()
+
+# Uzantı -> okuyucu; read_pdf süreç havuzu ve ilerleme argümanlarını da alır
+DOCUMENT_READERS = {
+	'.txt': read_txt, '.py': read_txt, '.js': read_txt, '.css': read_txt, '.sh': read_txt, '.bat': read_txt,
+	'.md': read_markdown, '.markdown': read_markdown,
+	'.html': read_html, '.htm': read_html,
+	'.docx': read_docx,
+	'.pdf': read_pdf
+}
+
+class DocumentIngestor:
+	"""
+	Yüklenen belgeleri diske akıtır, metnini olay döngüsü dışında çıkarır ve içerik
+	özetine (sha256) göre önbellekler; aynı dosya tekrar yüklendiğinde çıkarım yapılmaz.
+	"""
+	def __init__(self, upload_dir="uploads", cache_dir="document_cache", workers=2, chunk_size=1024 * 1024):
+		self.upload_dir = upload_dir
+		self.cache_dir = cache_dir
+		self.workers = max(1, workers)
+		self.chunk_size = chunk_size
+		self.executor = None
+		self.lock = threading.Lock()
+		os.makedirs(upload_dir, exist_ok=True)
+		os.makedirs(cache_dir, exist_ok=True)
+
+	@staticmethod
+	def is_supported(file_name):
+		return os.path.splitext(file_name)[1].lower() in DOCUMENT_READERS
+
+	@staticmethod
+	def detach_upload(fileobj):
+		"""
+		NiceGUI'nin geçici dosyası istek bitince kapanır. Diskteki dosya kopyalanmadan,
+		tanıtıcısı çoğaltılarak (dup) olay döngüsünü bekletmeden ayrı bir dosya nesnesi
+		olarak döndürülür; kopyalama ve özet (save_upload) arka planda yapılır.
+		"""
+		try:
+			fileno = fileobj.fileno()  # SpooledTemporaryFile bellekteyse diske taşınır
+			fileobj.flush()
+			fd = os.dup(fileno)
+		except (AttributeError, OSError, io.UnsupportedOperation):
+			fileobj.seek(0)
+			return io.BytesIO(fileobj.read())
+		detached = os.fdopen(fd, 'rb')
+		detached.seek(0)
+		return detached
+
+	def save_upload(self, fileobj, file_name):
+		"""
+		Tamamen alınmış yüklemeyi parça parça upload_dir'e kopyalar; (yol, sha256) döndürür.
+		Dosya boyutunda sürdüğünden olay döngüsünde değil, arka plan thread'inde çağrılır.
+		"""
+		digest = hashlib.sha256()
+		extension = os.path.splitext(file_name)[1].lower()
+		fd, path = tempfile.mkstemp(suffix=extension, dir=self.upload_dir)
+		with os.fdopen(fd, 'wb') as out:
+			while True:
+				chunk = fileobj.read(self.chunk_size)
+				if not chunk:
+					break
+				digest.update(chunk)
+				out.write(chunk)
+		return path, digest.hexdigest()
+
+	def _pool(self):
+		# Süreç havuzu ilk büyük PDF'te açılır; spawn ile torch thread'leri kopyalanmaz
+		with self.lock:
+			if self.executor is None:
+				self.executor = concurrent.futures.ProcessPoolExecutor(
+					max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+				)
+			return self.executor
+
+	def warm_up(self):
+		"""
+		Havuz süreçlerini önceden başlatır. Her spawn süreci bu modülü (torch dahil)
+		yeniden içe aktardığından ilk yüklemede bu gecikme yaşanmasın.
+		"""
+		pool = self._pool()
+		for future in [pool.submit(os.getpid) for _ in range(self.workers)]:
+			future.result()
+
+	def cached_text(self, digest):
+		path = os.path.join(self.cache_dir, digest + '.txt')
+		if not os.path.exists(path):
+			return None
+		with open(path, 'r', encoding='utf-8') as file:
+			return file.read()
+
+	def extract(self, path, digest, file_name, progress=None):
+		"""
+		Kaydedilmiş yüklemenin metnini döndürür (önbellekte varsa doğrudan). Yükleme
+		dosyası işlem sonunda silinir; progress(tamamlanan, toplam) ilerlemeyi bildirir.
+		"""
+		try:
+			text = self.cached_text(digest)
+			if text is not None:
+				if progress:
+					progress(1, 1)
+				return text
+
+			reader = DOCUMENT_READERS[os.path.splitext(file_name)[1].lower()]
+			if reader is read_pdf:
+				text = read_pdf(path, executor=self._pool(), progress=progress)
+			else:
+				text = reader(path)
+				if progress:
+					progress(1, 1)
+
+			# Aynı belge eşzamanlı çıkarılabilir: her yazım kendi geçici dosyasına yapılır
+			fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+			try:
+				with os.fdopen(fd, 'w', encoding='utf-8') as file:
+					file.write(text)
+				os.replace(tmp_path, os.path.join(self.cache_dir, digest + '.txt'))
+			except BaseException:
+				if os.path.exists(tmp_path):
+					os.unlink(tmp_path)
+				raise
+			return text
+		finally:
+			if os.path.exists(path):
+				os.unlink(path)
+
+	def shutdown(self):
+		if self.executor is not None:
+			self.executor.shutdown(cancel_futures=True)
+
+# ----------------------------
+# BELGE ARAMA İNDEKSİ (BM25)
+# ----------------------------
+def chunk_text(text, chunk_words=180, overlap_words=30):
+	"""Metni kelime sınırlarında, birbirine biraz binen parçalara böler."""
+	words = text.split()
+	step = max(1, chunk_words - overlap_words)
+	chunks = []
+	for start in range(0, len(words), step):
+		chunks.append(" ".join(words[start:start + chunk_words]))
+		if start + chunk_words >= len(words):
+			break
+	return chunks
+
+class RetrievalIndex:
+	"""
+	Yüklenen belgelerin parçalarını SQLite FTS5 ters indeksinde (diskte) tutar ve
+	prompt'a en alakalı parçaları BM25 ile seçer. embedding_model verilirse BM25
+	adayları küçük bir yerel embedding modeliyle yeniden sıralanır.
+	"""
+	def __init__(self, path="retrieval_index.db", chunk_words=180, overlap_words=30, top_k=4,
+			max_context_tokens=768, embedding_model=None):
+		self.chunk_words = chunk_words
+		self.overlap_words = overlap_words
+		self.top_k = top_k
+		self.max_context_tokens = max_context_tokens
+		self.embedding_model_path = embedding_model
+		self.embedder = None
+		self._embedder_lock = threading.Lock()
+		self.lock = threading.Lock()
+		self.conn = sqlite3.connect(path, check_same_thread=False)
+		self.conn.execute("PRAGMA journal_mode=WAL")
+		self.conn.execute('''CREATE TABLE IF NOT EXISTS documents
+					 (digest TEXT PRIMARY KEY, name TEXT, chunks INTEGER, indexed_at REAL)''')
+		self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5("
+						  "text, digest UNINDEXED, position UNINDEXED, tokens UNINDEXED, "
+						  "tokenize='unicode61 remove_diacritics 2')")
+		self.conn.execute("CREATE TABLE IF NOT EXISTS chunk_vectors (chunk_id INTEGER PRIMARY KEY, vector BLOB)")
+		# Terim başına belge sıklığı (çok yaygın terimleri sorgudan çıkarmak için)
+		self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS chunks_vocab USING fts5vocab(chunks, 'row')")
+		self.conn.commit()
+
+	def _load_embedder(self):
+		# İsteğe bağlı: yalnızca embedding_model ayarlandıysa ilk kullanımda yüklenir.
+		# Yükleme ve sorgu thread'leri aynı anda gelebilir; model bir kez yüklenir
+		if self.embedder is None and self.embedding_model_path:
+			with self._embedder_lock:
+				if self.embedder is None:
+					tokenizer = AutoTokenizer.from_pretrained(self.embedding_model_path)
+					if tokenizer.pad_token is None:
+						tokenizer.pad_token = tokenizer.eos_token
+					model = AutoModel.from_pretrained(self.embedding_model_path).eval()
+					self.embedder = (tokenizer, model)
+		return self.embedder
+
+	def _embed(self, texts):
+		tokenizer, model = self._load_embedder()
+		with torch.inference_mode():
+			batch = tokenizer(texts, padding=True, truncation=True, max_length=256, return_tensors='pt')
+			hidden = model(**batch).last_hidden_state
+			mask = batch['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+			vectors = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+			return torch.nn.functional.normalize(vectors, dim=-1)
+
+	def is_indexed(self, digest):
+		with self.lock:
+			return self.conn.execute("SELECT 1 FROM documents WHERE digest=?", (digest,)).fetchone() is not None
+
+	def index_document(self, digest, name, text, tokenizer=None):
+		"""
+		Belgeyi parçalayıp indeksler; aynı içerik (digest) ikinci kez indekslenmez.
+		Aynı belge eşzamanlı yüklenirse belge satırını ilk ekleyen indeksler, diğeri çıkar.
+		"""
+		if self.is_indexed(digest):
+			return
+		chunks = chunk_text(text, self.chunk_words, self.overlap_words)
+		if tokenizer is not None and chunks:
+			token_counts = [len(ids) for ids in tokenizer(chunks)['input_ids']]
+		else:
+			token_counts = [int(len(chunk.split()) * 1.5) + 1 for chunk in chunks]  # Kaba tahmin
+		vectors = None
+		if self.embedding_model_path and chunks:
+			vectors = torch.cat([self._embed(chunks[start:start + 32]) for start in range(0, len(chunks), 32)])
+
+		# Belge satırı ve parçalar tek transaction'da: hata olursa hiçbiri yazılmaz
+		with self.lock, self.conn:
+			cursor = self.conn.cursor()
+			cursor.execute("INSERT OR IGNORE INTO documents (digest, name, chunks, indexed_at) VALUES (?, ?, ?, ?)",
+						   (digest, name, len(chunks), time.time()))
+			if cursor.rowcount == 0:
+				return
+			for position, (chunk, tokens) in enumerate(zip(chunks, token_counts)):
+				cursor.execute("INSERT INTO chunks (text, digest, position, tokens) VALUES (?, ?, ?, ?)",
+							   (chunk, digest, position, tokens))
+				if vectors is not None:
+					cursor.execute("INSERT INTO chunk_vectors (chunk_id, vector) VALUES (?, ?)",
+								   (cursor.lastrowid, vectors[position].numpy().tobytes()))
+
+	def _match_query(self, query, max_terms=32, common_ratio=0.5, min_terms=2):
+		"""
+		Sorgu kelimelerinden FTS5 ifadesi kurar. Parçaların yarısından fazlasında geçen
+		terimler BM25 skoruna neredeyse katkı yapmaz ama tüm parçaların skorlanmasına yol
+		açar; en nadir min_terms terim dışında bunlar çıkarılır.
+		"""
+		# İndeksteki gibi küçük harf ve aksansız (unicode61 remove_diacritics) terimler
+		folded = "".join(
+			char for char in unicodedata.normalize("NFKD", query.lower()) if not unicodedata.combining(char)
+		)
+		terms = []
+		for term in re.findall(r"\w+", folded):
+			if len(term) > 1 and term not in terms:
+				terms.append(term)
+		terms = terms[:max_terms]
+		if not terms:
+			return ""
+
+		with self.lock:
+			total = self.conn.execute("SELECT COALESCE(SUM(chunks), 0) FROM documents").fetchone()[0]
+			frequency = dict(self.conn.execute(
+				f"SELECT term, doc FROM chunks_vocab WHERE term IN ({','.join('?' * len(terms))})", terms
+			).fetchall())
+		# FTS5 ifadesinde her kelime tırnak içinde, OR ile aranır
+		terms = [term for term in terms if term in frequency]
+		terms.sort(key=lambda term: frequency[term])
+		kept = [term for term in terms if frequency[term] <= total * common_ratio] or terms[:min_terms]
+		return " OR ".join(f'"{term}"' for term in kept)
+
+	def search(self, query, digests, top_k=None):
+		"""Verilen belgelerde en alakalı parçaları (alaka sırasıyla) döndürür."""
+		top_k = top_k or self.top_k
+		match = self._match_query(query)
+		if not match or not digests:
+			return []
+		candidates = top_k * 4 if self.embedding_model_path else top_k
+		placeholders = ",".join("?" * len(digests))
+		with self.lock:
+			rows = self.conn.execute(
+				f"SELECT rowid, digest, position, tokens, text FROM chunks WHERE chunks MATCH ? "
+				f"AND digest IN ({placeholders}) ORDER BY bm25(chunks) LIMIT ?",
+				[match, *digests, candidates]
+			).fetchall()
+			vectors = {}
+			if self.embedding_model_path and rows:
+				vectors = dict(self.conn.execute(
+					f"SELECT chunk_id, vector FROM chunk_vectors WHERE chunk_id IN ({','.join('?' * len(rows))})",
+					[row[0] for row in rows]
+				).fetchall())
+		results = [
+			{'chunk_id': row[0], 'digest': row[1], 'position': row[2], 'tokens': row[3], 'text': row[4]}
+			for row in rows
+		]
+
+		if vectors:
+			# BM25 ve embedding benzerliği sıralamaları reciprocal rank fusion ile birleştirilir
+			query_vector = self._embed([query])[0]
+			similarity = {
+				chunk_id: float(torch.dot(query_vector, torch.frombuffer(bytearray(vector), dtype=torch.float32)))
+				for chunk_id, vector in vectors.items()
+			}
+			by_vector = sorted(results, key=lambda result: -similarity.get(result['chunk_id'], -1.0))
+			fused = {result['chunk_id']: 1.0 / (60 + rank) for rank, result in enumerate(results)}
+			for rank, result in enumerate(by_vector):
+				fused[result['chunk_id']] += 1.0 / (60 + rank)
+			results.sort(key=lambda result: -fused[result['chunk_id']])
+		return results[:top_k]
+
+	def build_context(self, query, digests, token_budget=None):
+		"""
+		Token bütçesine sığan en alakalı parçaları belgedeki sıralarıyla birleştirir.
+		Bütçe dolduğunda daha az alakalı parçalar atlanır.
+		"""
+		budget = self.max_context_tokens if token_budget is None else min(token_budget, self.max_context_tokens)
+		selected, used = [], 0
+		for result in self.search(query, digests):
+			if used + result['tokens'] > budget:
+				continue
+			selected.append(result)
+			used += result['tokens']
+		selected.sort(key=lambda result: (digests.index(result['digest']), result['position']))
+		return "\n\n".join(result['text'] for result in selected), used
+
+	def stats(self):
+		with self.lock:
+			documents, chunks = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(chunks), 0) FROM documents").fetchone()
+		return {'documents': documents, 'chunks': chunks}
+
+# ----------------------------
+# SOHBET BAĞLAMI
+# ----------------------------
+def format_turn(prompt, response):
+	"""Geçmişteki bir turun modele verilen metni."""
+	return f"{prompt}\n{response}\n\n"
+
+def strip_echo(prompt, response):
+	"""Eski kayıtlarda yanıtın başında tekrarlanan prompt'u ayıklar."""
+	if response.startswith(prompt):
+		return response[len(prompt):].lstrip()
+	return response
+
+class ConversationContext:
+	"""
+	Sohbetin önceki turlarını token bütçesine sığdırarak modele verilecek geçmişi
+	kurar. Yeni turlar önceliklidir; sığmayan en eski turlar yalnızca prompt'larından
+	oluşan kısa bir özetle temsil edilir. Tur token sayıları DB'de saklanır.
+	"""
+	def __init__(self, tokenizer, db, max_turns=256, summary_tokens=64):
+		self.tokenizer = tokenizer
+		self.db = db
+		self.max_turns = max_turns
+		self.summary_tokens = summary_tokens
+
+	def count_tokens(self, text):
+		return len(self.tokenizer(text)['input_ids'])
+
+	def turn_tokens(self, prompt, response):
+		return self.count_tokens(format_turn(prompt, response))
+
+	def build(self, chat_id, budget):
+		"""(geçmiş metni, kullanılan token sayısı) döndürür."""
+		if not chat_id or budget <= 0:
+			return "", 0
+		turns = self.db.get_recent_turns(chat_id, self.max_turns)
+		for turn in turns:
+			turn['response'] = strip_echo(turn['prompt'], turn['response'])
+
+		# Sayısı bilinmeyen (eski) turlar tek tokenizer çağrısında sayılıp DB'ye yazılır
+		missing = [turn for turn in turns if turn['turn_tokens'] is None]
+		if missing:
+			encoded = self.tokenizer([format_turn(turn['prompt'], turn['response']) for turn in missing])['input_ids']
+			for turn, ids in zip(missing, encoded):
+				turn['turn_tokens'] = len(ids)
+			self.db.set_turn_tokens([(turn['id'], turn['turn_tokens']) for turn in missing])
+
+		# Tüm turlar sığmıyorsa özet için bütçeden pay ayrılır
+		limit = budget
+		if sum(turn['turn_tokens'] for turn in turns) > budget:
+			limit = budget - min(self.summary_tokens, budget // 4)
+		selected, used = [], 0
+		for turn in turns:
+			if used + turn['turn_tokens'] > limit:
+				break
+			selected.append(turn)
+			used += turn['turn_tokens']
+
+		summary = ""
+		dropped = turns[len(selected):]
+		if dropped and budget - used > 8:
+			summary = self._summarize(dropped, min(self.summary_tokens, budget - used))
+			used += self.count_tokens(summary) if summary else 0
+		return summary + "".join(format_turn(turn['prompt'], turn['response']) for turn in reversed(selected)), used
+
+	def _summarize(self, dropped, budget):
+		"""Sığmayan eski turların özeti: prompt'larının ilk kelimeleri, bütçe kadar."""
+		items = []
+		for turn in dropped:
+			item = " ".join(turn['prompt'].split()[:12])
+			candidate = "Önceki konular: " + "; ".join(reversed(items + [item])) + "\n\n"
+			if self.count_tokens(candidate) > budget:
+				break
+			items.append(item)
+		return "Önceki konular: " + "; ".join(reversed(items)) + "\n\n" if items else ""
+
+# ----------------------------
+# SANAL KAYDIRMALI LİSTE
+# ----------------------------
+class VirtualList(ui.element):
+	"""
+	Quasar QVirtualScroll üzerinde satır listesi: tarayıcıda yalnızca görünür satırlar
+	oluşturulur. Satırlar props'ta düz sözlükler olarak tutulur ve 'template' ile
+	çizilir (satır verisine props.item ile erişilir). Ekleme, silme ve alan güncellemeleri
+	tarayıcıdaki diziye küçük bir JavaScript ile uygulanır; böylece websocket trafiği
+	listenin uzunluğundan bağımsızdır. Listenin tamamını yalnızca set_items gönderir.
+	"""
+	def __init__(self, template, key='id', item_size=48):
+		super().__init__('q-virtual-scroll')
+		self.key = key
+		self._props['items'] = []
+		self._props['virtual-scroll-item-size'] = item_size
+		self.add_slot('default', template)
+
+	@property
+	def items(self):
+		return self._props['items']
+
+	def set_items(self, items):
+		"""Listeyi baştan kurar (tek tam gönderim: ilk yükleme, sohbet değişimi)."""
+		self._props['items'] = list(items)
+		self.update()
+
+	def append(self, items):
+		self.items.extend(items)
+		self._apply(f"items.push(...{json.dumps(items)});")
+
+	def prepend(self, items):
+		self.items[:0] = items
+		self._apply(f"items.unshift(...{json.dumps(items)});")
+
+	def remove_item(self, key):
+		index = self._index(key)
+		if index is None:
+			return False
+		del self.items[index]
+		self._apply(f"const i = items.findIndex(item => item[{json.dumps(self.key)}] === {json.dumps(key)}); "
+					"if (i >= 0) items.splice(i, 1);")
+		return True
+
+	def update_item(self, key, **fields):
+		index = self._index(key)
+		if index is None:
+			return False
+		self.items[index].update(fields)
+		self._apply(f"const item = items.find(item => item[{json.dumps(self.key)}] === {json.dumps(key)}); "
+					f"if (item) Object.assign(item, {json.dumps(fields)});")
+		return True
+
+	def get_item(self, key):
+		index = self._index(key)
+		return None if index is None else self.items[index]
+
+	def scroll_to_end(self):
+		self.client.run_javascript(
+			f"Vue.nextTick(() => {{ const e = getElement({self.id}); "
+			f"if (e && e.scrollTo) e.scrollTo({len(self.items)} - 1, 'end-force'); }})"
+		)
+
+	def _index(self, key):
+		for index, item in enumerate(self.items):
+			if item[self.key] == key:
+				return index
+		return None
+
+	def _apply(self, code):
+		# Gönderilmeyi bekleyen tam güncelleme zaten son hali taşır; değişiklik iki kez uygulanmasın
+		if self.id in self.client.outbox.updates:
+			return
+		self.client.run_javascript(
+			f"(() => {{ const e = window.app.elements[{self.id}]; if (!e) return; const items = e.props.items; {code} }})()"
+		)
+
+
+# Sohbet geçmişinde bir tur (prompt ve yanıt satırları)
+HISTORY_TEMPLATE = '''
+<div class="w-full">
+	<div class="row no-wrap w-full p-2 bg-gray-100 border-b">
+		<div class="font-bold w-1/6">Prompt:</div>
+		<div class="w-5/6" style="white-space: pre-wrap">{{ props.item.prompt }}</div>
+	</div>
+	<div class="row no-wrap w-full p-2 bg-gray-50 border-b">
+		<div class="font-bold w-1/6">Yanıt:</div>
+		<div class="w-5/6" style="white-space: pre-wrap">{{ props.item.response }}</div>
+	</div>
+</div>
+'''
+
+# Kenar çubuğunda bir sohbet (aç ve sil düğmeleri olayları VirtualList'e iletir)
+CHAT_LIST_TEMPLATE = '''
+<div class="row no-wrap w-full items-center p-2 box-border gap-2">
+	<q-btn color="primary" class="col p-2 box-border"
+		:label="'Chat ' + props.item.id + ' - ' + props.item.timestamp + ' (' + props.item.prompt_count + ')'"
+		@click="$parent.$emit('open_chat', props.item.id)" />
+	<q-btn color="primary" class="p-2 box-border" label="❌"
+		@click="$parent.$emit('delete_chat', props.item.id)" />
+</div>
+'''
+
+# Arama sonucu: kesit search_prompts'ta HTML olarak kaçışlanmıştır, yalnızca <mark> etiketleri içerir
+SEARCH_TEMPLATE = '''
+<div class="w-full p-2 box-border border-b cursor-pointer hover:bg-gray-200"
+	@click="$parent.$emit('open_chat', props.item.chat_id)">
+	<div class="text-xs text-gray-500">{{ 'Chat ' + props.item.chat_id + ' - ' + props.item.timestamp }}</div>
+	<div class="text-sm" v-html="props.item.snippet"></div>
+</div>
+'''
+
+
+# ----------------------------
+# ANA GUI SINIFI
+# ----------------------------
+class TasteModelApp:
+	def __init__(self, placement=None, sweep_threads=False, workers=0, draft_model_path=None, models_dir=None):
+		try:
+			self.model_loaded
+		except AttributeError:
+			self.model_loaded = False
+		self.threads_swept = False
+		# İstemci id'si -> ChatSession; modeller ve DB tüm oturumlarca paylaşılır
+		self.sessions = {}
+		self.sessions_lock = threading.Lock()
+
+		# Checkpoint klasörlerini içeren klasör (veya tek bir checkpoint klasörü)
+		self.models_dir = models_dir or "/path/to/your/model/files"
+		self.db = ChatHistoryDB()  # So the db can access the app instance
+		self.db.on_error = self._report_db_error
+		self.settings = OptimizationSettings(placement)
+		self.settings.cpu_params['sweep_threads'] = sweep_threads
+		self.settings.worker_params['workers'] = workers
+		self.settings.speculative_params['draft_model_path'] = draft_model_path
+		self.ingestor = DocumentIngestor(**self.settings.ingest_params)
+		self.retriever = RetrievalIndex(**self.settings.retrieval_params)
+		self.response_cache = None
+		if self.settings.response_cache_params['enabled']:
+			cache_params = dict(self.settings.response_cache_params)
+			del cache_params['enabled']
+			self.response_cache = ResponseCache(**cache_params)
+		# Yöneticinin arayüzden kurduğu profil kayıtları; kurulu değilken zamanlayıcılar etkilenmez
+		self.profiler = GenerationProfiler(**self.settings.profiler_params)
+
+		# CPU sıcaklığını loglamak için thread başlat
+		self.temp_thread = threading.Thread(target=self.log_cpu_temperature, daemon=True)
+		self.temp_thread.start()
+
+		# Boşta kalan oturumları kapatan thread
+		self.session_thread = threading.Thread(target=self._evict_idle_sessions, daemon=True)
+		self.session_thread.start()
+
+		# Kuyruk, önbellek, DB, bellek ve sıcaklık göstergeleri her metrik okumasında toplanır
+		metrics.register(self._collect_metrics)
+
+		# Modeller ilk kullanımda yüklenir; varsayılan (en küçük) model açılışta arka planda hazırlanır
+		# Yüklü tüm modeller tek önek önbelleği bütçesini paylaşır; model bütçesinden ayrılır
+		self.prefix_cache = PrefixCache(**self.settings.prefix_cache_params)
+		self.registry = ModelRegistry(
+			self.models_dir, self._load_checkpoint, reserved_mb=self.prefix_cache.max_bytes / (1024 * 1024),
+			**self.settings.model_registry_params
+		)
+		threading.Thread(target=self._load_model, daemon=True).start()
+
+	def _load_model(self):
+		try:
+			print(f"Model yükleniyor... (bulunan modeller: {', '.join(self.registry.names()) or 'yok'})")
+			self.registry.get()
+			self.model_loaded = True  # Set the flag to indicate model is loaded
+			print("Model yüklendi!")
+
+			# Belge çıkarım süreçleri model yüklendikten sonra arka planda hazırlanır
+			threading.Thread(target=self.ingestor.warm_up, daemon=True).start()
+
+		except Exception as e:
+			print("Exception occurred in _load_model:")
+			traceback.print_exc()  # Print the full stack trace to the console
+			with self.main_container:
+				ui.notify(f"Model yükleme hatası: {str(e)}")
+
+	def _load_checkpoint(self, name, model_dir):
+		"""Registry yükleyicisi: checkpoint'i tokenizer ve zamanlayıcısıyla birlikte hazırlar."""
+		started = time.time()
+		# Yükleme ve hassasiyet ölçümü de çıkarım çekirdeklerinde çalışsın
+		self.settings.pin_inference_thread()
+		tokenizer = load_tokenizer(model_dir, **self.settings.tokenizer_params)
+		context_builder = ConversationContext(tokenizer, self.db, **self.settings.context_params)
+
+		# Model konfigürasyonunu yükle
+		config = AutoConfig.from_pretrained(model_dir)
+
+		precision = self.settings.model_params['precision']
+		if precision == 'auto':
+			precision = self._select_precision(model_dir, config)
+
+		model, draft_model = None, None
+		workers = self.settings.worker_params['workers']
+		speculative_params = dict(self.settings.speculative_params)
+		draft_path = speculative_params['draft_model_path']
+		if draft_path:
+			draft_path = os.path.join(os.path.dirname(model_dir), draft_path)
+			# Taslak modelin kendisi istendiğinde taslak kullanılmaz
+			speculative_params['draft_model_path'] = None if os.path.abspath(draft_path) == os.path.abspath(model_dir) else draft_path
+		if workers > 0:
+			# Ağırlıklar worker süreçlerinde; bu süreçte yalnızca tokenizer tutulur
+			model_path = prepare_shared_checkpoint(model_dir, config, PRECISION_DTYPES[precision])
+			memory_mb = checkpoint_size_mb(model_dir)
+		else:
+			model, model_path = self._load_weights(model_dir, config, precision)
+			if speculative_params['draft_model_path']:
+				draft_model = load_draft_model(speculative_params['draft_model_path'], precision, config)
+			memory_mb = model_memory_mb(model) + (model_memory_mb(draft_model) if draft_model is not None else 0)
+
+		load_stats = {
+			'source': model_path,
+			'precision': precision,
+			'seconds': time.time() - started,
+			'peak_rss_mb': peak_rss_mb()
+		}
+		print(f"Model yükleme süresi: {load_stats['seconds']:.1f} sn, tepe RSS: {load_stats['peak_rss_mb']:.0f} MB, hassasiyet: {precision}")
+
+		# Thread taraması yalnızca ilk yüklenen modelde yapılır
+		if self.settings.cpu_params['sweep_threads'] and model is not None and not self.threads_swept:
+			self.threads_swept = True
+			results = sweep_thread_counts(model, self.settings.placement['inference'])
+			best = max(results, key=results.get)
+			self.settings.update_cores(self.settings.placement['inference'][:best])
+			print(f"En hızlı yapılandırma: {best} thread ({results[best]:.2f} token/sn)")
+
+		if workers > 0:
+			scheduler = InferenceWorkerPool(
+				model_dir,
+				precision,
+				tokenizer,
+				config,
+				plan_worker_placements(self.settings.placement, workers),
+				self.settings.scheduler_params,
+				self.settings.prefix_cache_params,
+				speculative_params,
+				profiler=self.profiler,
+				profiler_params=self.settings.profiler_params
+			).start()
+		else:
+			# Model artık yalnızca zamanlayıcı thread'i tarafından çalıştırılır
+			scheduler = InferenceScheduler(
+				model,
+				tokenizer,
+				prefix_cache=self.prefix_cache.partition(name),
+				thread_init=self.settings.pin_inference_thread,
+				draft_model=draft_model,
+				num_draft_tokens=speculative_params['num_draft_tokens'],
+				profiler=self.profiler,
+				**self.settings.scheduler_params
+			).start()
+		return LoadedModel(name, model_dir, tokenizer, context_builder, scheduler, precision, memory_mb, load_stats)
+
+	def _load_weights(self, model_dir, config, precision):
+		"""Modeli verilen hassasiyet modunda yükler; (model, kaynak dosya yolu) döndürür."""
+		torch_dtype = PRECISION_DTYPES[precision]
+
+		if self.settings.model_params['load_mode'] == 'mmap':
+			# Ağırlıkları tek geçişte, kopyalamadan dosyadan eşle
+			model, model_path = load_model_mmap(model_dir, config, torch_dtype)
+			if (self.settings.model_params['save_converted_checkpoint']
+					and model_path != current_converted_checkpoint(model_dir, torch_dtype)):
+				print(f"Dönüştürülmüş checkpoint kaydedildi: {save_converted_checkpoint(model, model_dir, torch_dtype)}")
+		else:
+			# Modeli safetensors formatında yükle
+			model_path = os.path.join(model_dir, "model.safetensors")
+			state_dict = load_file(model_path)
+
+			# Modeli oluştur ve state_dict'i yükle
+			model = GPTNeoForCausalLM.from_pretrained(
+				model_dir,
+				config=config,
+				state_dict=state_dict,
+				device_map="cpu",
+				low_cpu_mem_usage=self.settings.model_params['low_memory_mode'],
+				torch_dtype=torch_dtype
+			).to("cpu")
+			model.eval()
+
+		if precision == 'int8':
+			model, model_path = quantize_model_int8(model, model_dir)
+		return model, model_path
+
+	def _select_precision(self, model_dir, config):
+		"""
+		Bellek tavanına sığacağı tahmin edilen her hassasiyet modunu yükleyip tokens/sn
+		ölçer ve tavana sığan en hızlısını seçer; tavanı aşacak modlar hiç yüklenmez.
+		Sonuç model klasörüne kaydedilir ve checkpoint değişince yenilenir; ölçümü
+		elle yenilemek için precision_selfcheck.json dosyasını silmek yeterlidir.
+		"""
+		result_path = os.path.join(model_dir, "precision_selfcheck.json")
+		signature = checkpoint_signature(model_dir)
+		if os.path.exists(result_path):
+			with open(result_path, 'r', encoding='utf-8') as file:
+				previous = json.load(file)
+			if previous.get('source') == signature and previous['selected'] in available_precisions():
+				return previous['selected']
+
+		ceiling_mb = self.settings.model_params['memory_ceiling_mb']
+		if ceiling_mb is None:
+			ceiling_mb = psutil.virtual_memory().total * 0.8 / (1024 * 1024)
+
+		estimates = {precision: estimate_memory_mb(model_dir, config, precision) for precision in available_precisions()}
+		# Hiçbiri sığmıyorsa yalnızca en küçüğü denenir
+		precisions = [p for p in estimates if estimates[p] <= ceiling_mb] or [min(estimates, key=estimates.get)]
+		for precision in estimates:
+			if precision not in precisions:
+				print(f"Hassasiyet {precision} atlandı: tahmini {estimates[precision]:.0f} MB > tavan {ceiling_mb:.0f} MB")
+
+		results = {}
+		for precision in precisions:
+			model, _ = self._load_weights(model_dir, config, precision)
+			results[precision] = {
+				'tokens_per_sec': measure_tokens_per_sec(model),
+				'memory_mb': model_memory_mb(model)
+			}
+			print(f"Hassasiyet {precision}: {results[precision]['tokens_per_sec']:.2f} token/sn, {results[precision]['memory_mb']:.0f} MB")
+			del model
+			gc.collect()
+
+		candidates = [p for p in results if results[p]['memory_mb'] <= ceiling_mb] or list(results)
+		selected = max(candidates, key=lambda p: results[p]['tokens_per_sec'])
+		with open(result_path, 'w', encoding='utf-8') as file:
+			json.dump({'selected': selected, 'source': signature, 'memory_ceiling_mb': ceiling_mb, 'results': results},
+					  file, indent=2)
+		print(f"Seçilen hassasiyet: {selected}")
+		return selected
+
+	def open_session(self, client, user_ip, is_admin=False):
+		"""Yeni bağlanan istemci için bir oturum oluşturur ve kaydeder."""
+		session = ChatSession(self, client, user_ip, is_admin)
+		with self.sessions_lock:
+			self.sessions[session.session_id] = session
+		return session
+
+	def close_session(self, session_id):
+		with self.sessions_lock:
+			session = self.sessions.pop(session_id, None)
+		if session is not None:
+			session.close()
+
+	def _evict_idle_sessions(self):
+		"""Yedek temizleyici: on_disconnect ile kapanmamış, boşta ve üretimi sürmeyen oturumları kapatır."""
+		while True:
+			time.sleep(self.settings.session_params['eviction_interval'])
+			now = time.time()
+			with self.sessions_lock:
+				idle = [
+					session_id for session_id, session in self.sessions.items()
+					if not session.busy and now - session.last_active > self.settings.session_params['idle_timeout']
+				]
+			for session_id in idle:
+				self.close_session(session_id)
+			if idle:
+				print(f"{len(idle)} boşta oturum kapatıldı, açık oturum: {len(self.sessions)}")
+
+	def _report_db_error(self, error, operation):
+		"""Başarısız veritabanı işlemlerini isteği yapan istemciye bildirir."""
+		try:
+			ui.notify(f"Veritabanı hatası: {error}", type='negative')
+		except RuntimeError:
+			pass  # İstemci bağlamı yok; hata konsola yazıldı
+
+	def _collect_metrics(self):
+		"""Prometheus göstergeleri: (ad, tür, açıklama, [(etiketler, değer), ...]) listesi."""
+		families = []
+		process = psutil.Process()
+		children_rss = 0
+		for child in process.children(recursive=True):
+			try:
+				children_rss += child.memory_info().rss
+			except psutil.Error:
+				pass
+		families.append(("neo_resident_memory_bytes", "gauge", "Resident set size of this process and its workers",
+						 [({'process': "main"}, process.memory_info().rss), ({'process': "children"}, children_rss)]))
+
+		# Zamanlayıcı ve tokenizer göstergeleri yüklü her model için ayrı etiketlenir
+		models = [(model, model.scheduler) for model in self.registry.loaded_models()]
+		models = [(model, scheduler) for model, scheduler in models if scheduler is not None]
+		scheduler_stats = [({'model': model.name}, scheduler.stats()) for model, scheduler in models]
+		if models:
+			families.append(("neo_scheduler_queue_depth", "gauge", "Requests waiting for or running in the scheduler",
+							 [({'model': model.name}, scheduler.queue_depth) for model, scheduler in models]))
+		prefix = [(labels, stats) for labels, stats in scheduler_stats if 'hits' in stats]
+		if prefix:
+			families.append(("neo_prefix_cache_lookups_total", "counter", "Prefix KV cache lookups by result",
+							 [(dict(labels, result="hit"), stats['hits']) for labels, stats in prefix]
+							 + [(dict(labels, result="miss"), stats['misses']) for labels, stats in prefix]))
+			families.append(("neo_prefix_cache_bytes", "gauge", "Prefix KV cache size",
+							 [(labels, stats['bytes']) for labels, stats in prefix]))
+		pools = [(labels, stats) for labels, stats in scheduler_stats if 'workers' in stats]
+		if pools:
+			families.append(("neo_workers_alive", "gauge", "Live inference worker processes",
+							 [(labels, stats['alive']) for labels, stats in pools]))
+			families.append(("neo_worker_restarts_total", "counter", "Inference worker restarts",
+							 [(labels, stats['restarts']) for labels, stats in pools]))
+		token_caches = [
+			(model.name, model.tokenizer.stats()) for model, _ in models if isinstance(model.tokenizer, CachedTokenizer)
+		]
+		if token_caches:
+			families.append(("neo_token_cache_lookups_total", "counter", "Tokenizer segment cache lookups by result",
+							 [({'model': name, 'result': "hit"}, stats['hits']) for name, stats in token_caches]
+							 + [({'model': name, 'result': "miss"}, stats['misses']) for name, stats in token_caches]))
+
+		stats = self.registry.stats()
+		families.append(("neo_model_loaded", "gauge", "Checkpoints currently in memory (1) or not (0)",
+						 [({'model': name}, int(model['loaded'])) for name, model in stats['models'].items()]))
+		families.append(("neo_model_memory_bytes", "gauge", "Estimated memory of loaded checkpoints",
+						 [({'model': name}, model['memory_mb'] * 2 ** 20)
+						  for name, model in stats['models'].items() if model['loaded']]))
+		families.append(("neo_model_memory_budget_bytes", "gauge", "Memory budget for loaded checkpoints",
+						 [({}, stats['budget_mb'] * 2 ** 20)]))
+		# Soğuk: süreçteki ilk yükleme, sıcak: bellekten atıldıktan sonra yeniden yükleme
+		load_seconds = {}
+		for name, model in stats['models'].items():
+			for load in model['loads']:
+				load_seconds[(name, load['kind'])] = load['seconds']
+		families.append(("neo_model_load_seconds", "gauge", "Duration of the last cold and warm load per checkpoint",
+						 [({'model': name, 'kind': kind}, seconds) for (name, kind), seconds in sorted(load_seconds.items())]))
+		families.append(("neo_model_evictions_total", "counter", "Checkpoints evicted to stay within the memory budget",
+						 [({}, stats['evictions'])]))
+
+		if self.response_cache is not None:
+			stats = self.response_cache.stats()
+			families.append(("neo_response_cache_lookups_total", "counter", "Response cache lookups by result",
+							 [({'result': "hit"}, stats['hits']), ({'result': "miss"}, stats['misses'])]))
+			families.append(("neo_response_cache_bytes", "gauge", "Response cache size", [({}, stats['bytes'])]))
+
+		stats = self.db.stats()
+		families.append(("neo_db_queue_depth", "gauge", "Chat DB tasks waiting for the writer or a reader",
+						 [({'queue': "write"}, stats['pending_writes']), ({'queue': "read"}, stats['pending_reads'])]))
+		families.append(("neo_db_errors_total", "counter", "Failed chat DB tasks", [({}, stats['errors'])]))
+		stats = ui_dispatcher.stats()
+		families.append(("neo_ui_dispatch_queue_depth", "gauge", "Results waiting for the UI event loop",
+						 [({}, stats['queue_depth'])]))
+		families.append(("neo_sessions", "gauge", "Open UI sessions", [({}, len(self.sessions))]))
+
+		temperatures = read_cpu_temperatures()
+		if temperatures:
+			families.append(("neo_cpu_temperature_celsius", "gauge", "CPU sensor temperatures",
+							 [({'sensor': label}, value) for label, value in sorted(temperatures.items())]))
+		throttles = read_throttle_counts()
+		if throttles:
+			families.append(("neo_cpu_thermal_throttle_total", "counter", "Thermal throttling events per CPU",
+							 [({'cpu': cpu}, count) for cpu, count in sorted(throttles.items())]))
+		frequencies = psutil.cpu_freq(percpu=True) or []
+		if frequencies:
+			families.append(("neo_cpu_frequency_mhz", "gauge", "Current CPU frequency (drops under throttling)",
+							 [({'cpu': cpu}, frequency.current) for cpu, frequency in enumerate(frequencies)]))
+		return families
+
+	def metrics_summary(self):
+		"""Arayüzdeki canlı metrik paneli için kısa satırlar."""
+		def _fmt(value, scale=1.0, digits=2):
+			return "-" if value is None else f"{value * scale:.{digits}f}"
+
+		db_stats = self.db.stats()
+		temperatures = read_cpu_temperatures()
+		schedulers = [model.scheduler for model in self.registry.loaded_models()]
+		schedulers = [scheduler for scheduler in schedulers if scheduler is not None]
+		lines = [
+			f"Token/sn (p50): {_fmt(metrics.decode_rate.quantile(0.5), digits=1)}",
+			f"İlk token p50/p95: {_fmt(metrics.time_to_first_token.quantile(0.5))} / "
+			f"{_fmt(metrics.time_to_first_token.quantile(0.95))} sn",
+			f"Kuyrukta bekleme p95: {_fmt(metrics.queue_wait.quantile(0.95))} sn",
+			f"Prefill p95: {_fmt(metrics.prefill.quantile(0.95))} sn",
+			f"Batch boyutu p50: {_fmt(metrics.batch_size.quantile(0.5), digits=1)}",
+			f"Bekleyen istek: {sum(scheduler.queue_depth for scheduler in schedulers)}",
+			f"DB yazma kuyruğu: {db_stats['pending_writes']}, commit p95: {_fmt(metrics.db_commit.quantile(0.95), 1000, 1)} ms",
+			f"RSS: {psutil.Process().memory_info().rss / 2 ** 20:.0f} MB"
+		]
+		if temperatures:
+			lines.append(f"CPU sıcaklığı (maks): {max(temperatures.values()):.0f}°C")
+		registry_stats = self.registry.stats()
+		lines.append(f"Model belleği: {registry_stats['used_mb']:.0f} / {registry_stats['budget_mb']:.0f} MB")
+		for name, model in registry_stats['models'].items():
+			state = "yükleniyor" if model['loading'] else "yüklü" if model['loaded'] else "boşta"
+			loads = {load['kind']: load['seconds'] for load in model['loads']}
+			times = ", ".join(f"{'soğuk' if kind == 'cold' else 'sıcak'} {seconds:.1f} sn" for kind, seconds in loads.items())
+			lines.append(f"{name}: {state}" + (f" ({times})" if times else ""))
+		return lines
+
+	def log_cpu_temperature(self):
+		while True:
+			temp = self.get_cpu_temperature()
+			print(f"CPU Sıcaklığı: {temp}")
+			time.sleep(300)  # 5 dakikada bir
+
+	@staticmethod
+	def get_cpu_temperature():
+		try:
+			temps = psutil.sensors_temperatures()
+			if not temps:
+				return "Sıcaklık bilgisi alınamadı"
+			for name, entries in temps.items():
+				for entry in entries:
+					if "core" in entry.label.lower():
+						return f"{entry.current}°C"
+			return "Sıcaklık bilgisi alınamadı"
+		except Exception as e:
+			return f"Hata: {str(e)}"
+
+# ----------------------------
+# KULLANICI OTURUMU
+# ----------------------------
+class ChatSession:
+	"""
+	Tek bir tarayıcı sekmesinin durumu: seçili sohbet, referans belge, arayüz
+	elemanları ve süren üretimler. Model, zamanlayıcı ve veritabanı TasteModelApp
+	üzerinden tüm oturumlarca paylaşılır.
+	"""
+	def __init__(self, app, client, user_ip, is_admin=False):
+		self.app = app
+		self.db = app.db
+		self.client = client  # DB sonuçlarının teslim edileceği NiceGUI istemcisi
+		self.session_id = client.id
+		self.user_ip = user_ip
+		self.is_admin = is_admin  # Yönetici şifresiyle girildiyse profilleme paneli gösterilir
+		self.created_at = time.time()
+		self.last_active = self.created_at
+		self.response_generated = False
+		self.prompt_entered = False
+		self.current_chat_id = None
+		self.documents = []  # Bu oturumda yüklenen belgelerin içerik özetleri (sha256)
+		self.history_next_before_id = None
+		self.chat_list_next = None
+		self.history_list = None
+		self.history_more_button = None
+		self.chat_list = None
+		self.chat_list_more_button = None
+		self.metrics_panel = None
+		self.profiler_panel = None
+		self.profile_files_shown = None
+		self.last_prompt_container = None
+		self.active_requests = []
+		self.active_generations = 0
+		self.lock = threading.Lock()
+
+	def touch(self):
+		"""Kullanıcı etkileşimini kaydeder; boşta kalma süresi buradan ölçülür."""
+		self.last_active = time.time()
+
+	@property
+	def busy(self):
+		return self.active_generations > 0
+
+	def _reserve_generation(self):
+		with self.lock:
+			if self.active_generations >= self.app.settings.session_params['max_active_generations']:
+				return False
+			self.active_generations += 1
+			return True
+
+	def _release_generation(self):
+		with self.lock:
+			self.active_generations = max(0, self.active_generations - 1)
+
+	def stop_generation(self):
+		"""Süren üretimleri iptal eder; zamanlayıcı satırı bir sonraki token'da bırakır."""
+		requests = list(self.active_requests)
+		for request in requests:
+			request.cancel()
+		return len(requests)
+
+	def close(self):
+		"""Oturumu kapatır: süren üretimleri iptal eder, durumunu ve NiceGUI istemcisini bırakır."""
+		self.stop_generation()
+		self.documents = []
+		client = self.client
+
+		def _release(_):
+			if client.id not in Client.instances:
+				return
+			if client.has_socket_connection:
+				# Açık sekme yeni bir oturumla yeniden yüklenir, eski istemci ardından silinir
+				client.run_javascript("location.reload()")
+				asyncio.get_running_loop().call_later(5.0, lambda: client.id in Client.instances and client.delete())
+			else:
+				client.delete()
+
+		ui_dispatcher.post(_release)
+
+	def build_ui(self):
+		"""Bu oturumun ana arayüzünü oluşturur."""
+		with ui.row().classes("w-full h-screen p-0 m-0 nowrap box-border"):
+			# Sidebar for chat list (left side)
+			with ui.column().classes("w-2/12 bg-gray-100 h-full overflow-y-auto p-0 m-0 box-border"):
+				ui.button("Yeni Chat", on_click=self.start_new_chat).classes("w-full p-2 box-border")
+				# Canlı metrikler (yalnızca panel açıkken güncellenir)
+				with ui.expansion("Metrikler").classes("w-full p-2 box-border") as self.metrics_panel:
+					self.metrics_label = ui.label().classes("text-xs whitespace-pre-line")
+				ui.timer(2.0, self._update_metrics_panel)
+				if self.is_admin:
+					# Sonraki N üretimi profille; kayıtlar indirilebilir dosyalar olarak listelenir
+					with ui.expansion("Profilleme").classes("w-full p-2 box-border") as self.profiler_panel:
+						with ui.row().classes("w-full items-center no-wrap"):
+							self.profile_count = ui.number("Üretim", value=1, min=1, max=100, step=1, format="%d").classes("w-1/2")
+							ui.button("Başlat", on_click=self._arm_profiler)
+						self.profiler_status = ui.label().classes("text-xs")
+						self.profile_files = ui.column().classes("w-full gap-0")
+					ui.timer(2.0, self._update_profiler_panel)
+				# Prompt ve yanıtlarda tam metin arama; yazmayı bitirince sorgulanır
+				self.search_input = ui.input(placeholder="Sohbetlerde ara", on_change=self._search).classes("w-full p-2 box-border")
+				self.search_input.props("debounce=300 clearable")
+				self.search_list = VirtualList(SEARCH_TEMPLATE, item_size=64).classes("w-full p-2 box-border")
+				self.search_list.style("max-height: 40vh")
+				self.search_list.on('open_chat', lambda e: self._switch_chat(e.args))
+				self.search_list.visible = False
+				# Sohbet listesi: yalnızca görünür satırlar çizilir, değişiklikler satır bazında gönderilir
+				self.chat_list = VirtualList(CHAT_LIST_TEMPLATE, item_size=56).classes("w-full p-2 box-border")
+				self.chat_list.style("max-height: 75vh")
+				self.chat_list.on('open_chat', lambda e: self._switch_chat(e.args))
+				self.chat_list.on('delete_chat', lambda e: self.delete_chat(e.args))
+				self.chat_list_more_button = ui.button("Daha eski sohbetler", on_click=self._load_older_chats).classes("w-full p-2 box-border")
+				self.chat_list_more_button.visible = False
+
+			# Main interface (right side)
+			with ui.column().classes("w-9/12 h-13/15 overflow-y-auto p-0 m-0 box-border"):
+				# Model Parametreleri
+				with ui.row().classes("w-full p-2 box-border"):
+					ui.label("Max Token:").classes("w-1/8 box-border")
+					self.max_tokens = ui.input(value="300").classes("w-3/8 box-border")
+					ui.label("Temperature:").classes("w-1/8 box-border")
+					self.temperature = ui.input(value="0.75").classes("w-1/8 box-border")
+					ui.label("Seed:").classes("w-1/8 box-border")
+					self.seed = ui.input(value="", placeholder="rastgele").classes("w-1/8 box-border")
+				with ui.row().classes("w-full p-2 box-border"):
+					ui.label("Durdurma:").classes("w-1/8 box-border")
+					self.stop_sequences = ui.input(value="", placeholder="virgülle ayrılmış, ör. ###,Soru:").classes("w-3/8 box-border")
+					# Seçilen model yüklü değilse ilk istekte arka planda yüklenir
+					ui.label("Model:").classes("w-1/8 box-border")
+					self.model_select = ui.select(
+						self.app.registry.names(), value=self.app.registry.default_model
+					).classes("w-2/8 box-border")
+
+				# Sohbet Geçmişi
+				self.history_more_button = ui.button("Daha eski mesajlar", on_click=self._load_older_prompts).classes("w-full p-2 box-border")
+				self.history_more_button.visible = False
+				self.history_list = VirtualList(HISTORY_TEMPLATE, item_size=120).classes("w-full p-2 box-border")
+				self.history_list.style("max-height: 50vh")
 
-# ----------------------------
-# DOSYA İÇERİĞİNİ OKUMA FONKSİYONLARI
-# ----------------------------
-def read_txt(file_path):
-	with open(file_path, 'r', encoding='utf-8') as file:
-		return file.read()
+				# Yanıt Gösterme Alanı (for typewriter effect)
+				self.last_prompt_container = ui.column().classes("w-full p-2 box-border")
+				with self.last_prompt_container:
+					with ui.row().classes("w-full p-2 bg-gray-100 border-b"):
+						self.prompt_label = ui.label().classes("font-bold w-1/6")
+						self.prompt_display = ui.label().classes("w-5/6")
+					with ui.row().classes("w-full p-2 bg-gray-100 border-b"):
+						self.response_label = ui.label().classes("font-bold w-1/6")
+						self.response_display = ui.label().classes("w-5/6")  # response_display özelliğini başlatın
 
-def read_pdf(file_path):
-	reader = PdfReader(file_path)
-	text = ""
-	for page in reader.pages:
-		text += page.extract_text()
-	return text
+				# Prompt Giriş Alanı
+				self.prompt_entry = ui.textarea(label="Prompt").classes("w-full p-2 box-border")
 
-def read_docx(file_path):
-	doc = Document(file_path)
-	text = ""
-	for para in doc.paragraphs:
-		text += para.text + "\n"
-	return text
+				# Dosya Yükleme
+				ui.upload(on_upload=self.load_file).classes("w-full p-0 box-border")
+				self.upload_progress = ui.linear_progress(value=0, show_value=False).classes("w-full p-0 box-border")
+				self.upload_progress.visible = False
 
-def read_html(file_path):
-	with open(file_path, 'r', encoding='utf-8') as file:
-		soup = BeautifulSoup(file, 'html.parser')
-		return soup.get_text()
+				# Butonlar
+				with ui.row().classes("w-full p-0 nowrap box-border"):
+					with ui.row().classes("w-full p-0 nowrap box-border"):
+						# Gönder Butonu
+						ui.button(
+							"Gönder",
+							on_click=self.generate_response
+						).classes("flex-grow p-2 box-border").bind_enabled_from(
+							self.app, "model_loaded"  # Model yüklenene kadar buton pasif
+						)
+						# Durdur Butonu (üretim bir sonraki token'da kesilir, kısmi yanıt kaydedilir)
+						ui.button("⏹", on_click=self._on_stop_clicked).classes("p-2 box-border")
+						# Geçmişi Sil Butonu
+						ui.button(
+							"❌",
+							on_click=lambda: self.delete_chat(self.current_chat_id)
+						).classes("p-2 box-border")
 
-def read_markdown(file_path):
-	with open(file_path, 'r', encoding='utf-8') as file:
-		return file.read()
+		# Load the chat list into the sidebar
+		self._load_chat_list()
 
-# ----------------------------
-# ANA GUI SINIFI
-# ----------------------------
-class TasteModelApp:
-	def __init__(self):
-		try:
-			self.model_loaded
-		except AttributeError:
-			self.model_loaded = False
-		try:
-			self.response_generated
-		except AttributeError:
-			self.response_generated = False
-		try:
-			self.prompt_entered
-		except AttributeError:
-			self.prompt_entered = False
-		self.tokenizer = None
-		self.model = None
-		self.reference_text = ""
-		self.current_chat_id = None
-		self.user_ip = None  # Kullanıcı IP'sini saklamak için
-		self.queue = queue.Queue()
+	def _update_metrics_panel(self):
+		if self.metrics_panel.value:
+			self.metrics_label.text = "\n".join(self.app.metrics_summary())
 
-		# Modeli yüklemek için gerekiyor
-		self.local_model_path = "/path/to/your/model/files"
-		self.db = ChatHistoryDB()  # So the db can access the app instance
-		self.settings = OptimizationSettings()
+	def _arm_profiler(self):
+		if not self.is_admin:
+			return
+		self.touch()
+		generations = int(self.profile_count.value or 1)
+		self.app.profiler.arm(generations)
+		ui.notify(f"Sonraki {generations} üretim profillenecek")
+		self._update_profiler_panel()
 
-		# CPU sıcaklığını loglamak için thread başlat
-		self.temp_thread = threading.Thread(target=self.log_cpu_temperature, daemon=True)
-		self.temp_thread.start()
+	def _update_profiler_panel(self):
+		if not self.profiler_panel.value:
+			return
+		profiler = self.app.profiler
+		self.profiler_status.text = (
+			f"Bekleyen: {profiler.remaining} üretim" if profiler.remaining else "Kurulu değil"
+		) + f" · {profiler.output_dir}/"
+		files = profiler.list_files()
+		shown = [(file['name'], file['size']) for file in files]
+		if shown == self.profile_files_shown:
+			return  # Liste değişmediyse yeniden çizme
+		self.profile_files_shown = shown
+		self.profile_files.clear()
+		with self.profile_files:
+			for file in files:
+				ui.button(
+					f"{file['name']} ({file['size'] / 1024:.0f} KB)",
+					on_click=lambda path=file['path']: ui.download(path)
+				).props("flat dense no-caps align=left").classes("w-full text-xs")
 
-		# Model yükleme işlemini başlat
-		threading.Thread(target=self._load_model, daemon=True).start()
+	def _on_stop_clicked(self):
+		self.touch()
+		if not self.stop_generation():
+			ui.notify("Durdurulacak bir yanıt yok")
 
-	def _load_model(self):
-		try:
-			print("Model yükleniyor...")
-			self.tokenizer = GPT2Tokenizer.from_pretrained(self.local_model_path)
+	async def generate_response(self):
+		"""
+		Gönder düğmesi: olay döngüsünde, bu oturumun istemci bağlamında çalışır. Bloklayan
+		işler (model seçimi, DB'den geçmiş, tokenizasyon, kuyruğa ekleme) executor'da
+		yapılır; arayüz elemanlarına ve zamanlayıcıya yalnızca döngüden dokunulur.
+		"""
+		self.touch()
 
-			# Model konfigürasyonunu yükle
-			config = AutoConfig.from_pretrained(self.local_model_path)
+		# Oturum başına eşzamanlı üretim sınırı
+		if not self._reserve_generation():
+			with self.last_prompt_container:
+				ui.notify("Önceki yanıt tamamlanmadan yeni prompt gönderilemez!", type='warning')
+			return
 
-			# Modeli safetensors formatında yükle
-			model_path = os.path.join(self.local_model_path, "model.safetensors")
-			state_dict = load_file(model_path)
+		submitted = False
+		try:
+			submitted = await self._generate_response()
+		finally:
+			if not submitted:
+				self._release_generation()
 
-			# Modeli oluştur ve state_dict'i yükle
-			self.model = GPTNeoForCausalLM.from_pretrained(
-				self.local_model_path,
-				config=config,
-				state_dict=state_dict,
-				device_map="cpu",
-				low_cpu_mem_usage=self.settings.model_params['low_memory_mode'],
-				torch_dtype=self.settings.model_params['torch_dtype']
-			).to("cpu")
+	def _prepare_prompt(self, model, prompt, chat_id, params):
+		"""
+		(Executor'da) bağlamı kurar ve yanıt önbelleğine bakar.
+		(model prompt'u, önbellek anahtarı, önbellekteki yanıt veya None) döndürür.
+		"""
+		# Bağlam penceresi: prompt ve yeni token'lara yer ayrıldıktan sonra kalan bütçe önce
+		# belgelerden seçilen parçalara, sonra sohbetin önceki turlarına verilir
+		budget = (model.max_positions - params['max_new_tokens']
+				  - model.context_builder.count_tokens(prompt))
+		document_context = ""
+		if self.documents:
+			document_context, used = self.app.retriever.build_context(prompt, self.documents, budget)
+			budget -= used
+		history, _ = model.context_builder.build(chat_id, budget)
+		model_prompt = history + (document_context + "\n\n" if document_context else "") + prompt
 
-			self.model_loaded = True  # Set the flag to indicate model is loaded
-			print("Model yüklendi!")
+		# Deterministik isteklerde önce yanıt önbelleğine bak (anahtar geçmiş ve belge bağlamını da kapsar)
+		response_key = None
+		if self.app.response_cache is not None and ResponseCache.is_deterministic(params):
+			response_key = ResponseCache.make_key(model_prompt, ",".join(self.documents), dict(
+				params, model=model.path, precision=model.precision
+			))
+			cached = self.app.response_cache.get(response_key)
+			if cached is not None:
+				return model_prompt, response_key, cached[1]
+		return model_prompt, response_key, None
 
-		except Exception as e:
-			print("Exception occurred in _load_model:")
-			traceback.print_exc()  # Print the full stack trace to the console
-			with self.main_container:
-				ui.notify(f"Model yükleme hatası: {str(e)}")
+	def _store_response(self, model, chat_id, prompt, response, response_key=None):
+		"""(Executor'da) turu kaydeder; verilmişse yanıtı önbelleğe de yazar."""
+		self.db.save_prompt(
+			chat_id, prompt, response, turn_tokens=model.context_builder.turn_tokens(prompt, response),
+			callback=self._on_prompt_saved, client=self.client
+		)
+		if response_key is not None:
+			self.app.response_cache.put(response_key, response, response)
 
-	def generate_response(self):
-		# Thread güvenliği
-		if self.prompt_entered:
-			with self.db.last_prompt_container:
-				ui.notify("Zaten bir yanıt hazırlanıyor!", type='warning')
-			return
+	def _read_params(self):
+		"""
+		Arayüzdeki üretim parametrelerini doğrular; geçersiz alan için kullanıcıya
+		gösterilecek mesajla ValueError fırlatır.
+		"""
+		limits = self.app.settings.generation_params
+		try:
+			max_new_tokens = int(self.max_tokens.value.strip())
+		except ValueError:
+			raise ValueError("Max Token bir tam sayı olmalı")
+		if max_new_tokens < 1:
+			raise ValueError("Max Token en az 1 olmalı")
+		try:
+			temperature = float(self.temperature.value.strip())
+		except ValueError:
+			raise ValueError("Temperature bir sayı olmalı")
+		if not math.isfinite(temperature) or temperature < 0:
+			raise ValueError("Temperature 0 veya pozitif bir sayı olmalı")
+		seed = self.seed.value.strip()
+		if seed and not re.fullmatch(r"[0-9]+", seed):
+			raise ValueError("Seed boş veya negatif olmayan bir tam sayı olmalı")
+		if seed and int(seed) >= 2 ** 63:
+			raise ValueError("Seed çok büyük")
+		# Temperature 0: greedy; seed boş değilse örnekleme tekrarlanabilir olur
+		return {
+			'max_new_tokens': min(max_new_tokens, limits['max_tokens']),
+			'temperature': temperature,
+			'top_k': self.app.settings.model_params['top_k'],
+			'do_sample': temperature > 0,
+			'seed': int(seed) if seed else None,
+			'stop': [sequence for sequence in self.stop_sequences.value.split(",") if sequence.strip()]
+		}
 
+	async def _generate_response(self):
+		"""İsteği kuyruğa ekler; akış başlatıldıysa True döner (yer _finish_response'ta bırakılır)."""
+		loop = asyncio.get_running_loop()
 		self.response_generated = False
+		limits = self.app.settings.generation_params
 
 		# 1. Model ve chat kontrolü
-		if not self.model_loaded:
-			with self.db.last_prompt_container:
+		if not self.app.model_loaded:
+			with self.last_prompt_container:
 				ui.notify("Model henüz yüklenmedi. Lütfen bekleyin...", type='negative')
 			self.prompt_entered = False
-			return
+			return False
+		# Model parametreleri: geçersiz alan varsa hiçbir iş yapılmadan bildirilir
+		try:
+			params = self._read_params()
+		except ValueError as e:
+			with self.last_prompt_container:
+				ui.notify(str(e), type='negative')
+			self.prompt_entered = False
+			return False
+		# Seçilen model yükleniyorsa bu sırada yüklü (küçük) bir model yanıtlar
+		try:
+			model, fallback = await loop.run_in_executor(None, self.app.registry.resolve, self.model_select.value)
+		except (KeyError, RuntimeError, TimeoutError) as e:
+			with self.last_prompt_container:
+				ui.notify(f"Model kullanılamıyor: {e}", type='negative')
+			self.prompt_entered = False
+			return False
+		if fallback:
+			with self.last_prompt_container:
+				ui.notify(f"{self.model_select.value} yükleniyor; bu yanıtı {model.name} veriyor", type='info')
 
 		prompt = self.prompt_entry.value.strip()
 
 		# 2. Prompt al ve boş kontrolü
 		if not prompt:
-			with self.db.last_prompt_container:
+			with self.last_prompt_container:
 				ui.notify("Prompt boş olamaz!", type='negative')
 			self.prompt_entered = False
-			return
+			return False
 		else:
-			with self.db.last_prompt_container:
-				prompt_accepted = ui.notify("Prompt işleniyor...", type='positive')
+			with self.last_prompt_container:
+				ui.notify("Prompt işleniyor...", type='positive')
 			self.prompt_entered = True
 
-		# Yeni sohbet kontrolü (DÜZELTME: Artık chat_id dönüyor)
+		# Yeni sohbet kontrolü
 		if not self.current_chat_id:
-			self.current_chat_id = self.start_new_chat()
+			self.current_chat_id = await self.start_new_chat()
 			if not self.current_chat_id:
 				self.prompt_entered = False
-				return
+				return False
 
-		# 3. Model parametreleri
-		params = {
-			'pad_token_id': self.tokenizer.eos_token_id,
-			'max_new_tokens': min(int(self.max_tokens.value), 1024),
-			'temperature': max(0.1, float(self.temperature.value)),
-			'top_k': 25,
-			'do_sample': True
-		}
+		chat_id = self.current_chat_id
+		model_prompt, response_key, cached = await loop.run_in_executor(
+			None, self._prepare_prompt, model, prompt, chat_id, params
+		)
+		if cached is not None:
+			loop.run_in_executor(None, self._store_response, model, chat_id, prompt, cached)
+			self.response_generated = True
+			self.prompt_entered = False
+			self.prompt_entry.value = ""
+			self.prompt_entry.update()
+			with self.last_prompt_container:
+				ui.notify("Prompt önbellekten yanıtlandı", type='positive')
+			return False
 
-		# 4. Metin üretme (Thread içinde)
-		def _generate():
-			try:
-				# Tokenizer ayarları
-				self.tokenizer.pad_token = self.tokenizer.eos_token
-				inputs = self.tokenizer(prompt, return_tensors="pt", truncation=True).to("cpu")
-				inputs['attention_mask'] = inputs['input_ids'].ne(self.tokenizer.pad_token_id).float()
-
-				if not self.response_generated and self.prompt_entered:
-					# Prompt ve yanıtı göster
-					self.prompt_label.text = "Prompt"
-					self.prompt_display.text = prompt
-					self.prompt_entry.value = ""
-					self.prompt_entry.update()
-					self.response_display.text = "Yanıt hazırlanıyor, lütfen bekleyin..."  # Yükleme mesajı
-
-					# Model çalıştırma
-					with torch.no_grad():
-						outputs = self.model.generate(
-							inputs["input_ids"],
-							attention_mask=inputs['attention_mask'],
-							**params
-						)
+		# 4. İsteği zamanlayıcı kuyruğuna ekle (kuyruk doluysa reddet)
+		streamer = TokenStreamer(model.tokenizer)
+		try:
+			request = await loop.run_in_executor(None, lambda: model.submit(
+				model_prompt, streamer=streamer, cache_key=chat_id, timeout=limits['max_seconds'], **params
+			))
+		except queue.Full:
+			with self.last_prompt_container:
+				ui.notify("Sunucu meşgul, lütfen biraz sonra tekrar deneyin!", type='warning')
+			self.prompt_entered = False
+			return False
+		self.active_requests.append(request)
 
-					response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-
-					# Hata kontrolü
-					if not response.strip():
-						with self.db.last_prompt_container:
-							ui.notify("Yanıt boş olamaz!")
-						self.prompt_entered = False
-						return
-
-					# UI güncellemesini ana thread'e gönder
-					def _update_ui():
-						self.response_label.text = "Yanıt"
-						self.response_display.text = ""
-						full_response = response  # Response'u closure'a al
-
-						def _typewriter_step(index=0):
-							while index < len(full_response):
-								self.response_display.text = full_response[:index]
-								time.sleep(0.34)
-								index += 1
-
-						self.db.save_prompt(self.current_chat_id, prompt, response, callback=self._schedule_history_refresh)
-						self.response_generated = True
-						self.prompt_entered = False
-
-						with self.db.last_prompt_container:
-							ui.notify("Prompt yanıtlandı", type='positive')
-							_typewriter_step(0)  # Efekti başlat
-							self.response_label.text = ""
-							self.response_display.text = ""
-							self.prompt_label.text = ""
-							self.prompt_display.text = ""
-
-					# Ana thread'de çalıştır
-					with self.db.last_prompt_container:
-						ui.timer(0.1, _update_ui, once=True)
+		# Prompt ve yanıtı göster
+		self.prompt_label.text = "Prompt"
+		self.prompt_display.text = prompt
+		self.prompt_entry.value = ""
+		self.prompt_entry.update()
+		self.response_label.text = "Yanıt"
+		self.response_display.text = "Yanıt hazırlanıyor, lütfen bekleyin..."  # Yükleme mesajı
 
-			except Exception as e:
-				with self.db.last_prompt_container:
-					ui.notify(f"Hata: {str(e)}")
-				self.prompt_entered = False
-				self.response_generated = False
+		# 5. Üretilen parçaları toplu halde UI'a aktar (saniyede en fazla N güncelleme)
+		def _finish_response():
+			self.active_requests.remove(request)
+			self._release_generation()
+			if request.error is not None:
+				with self.last_prompt_container:
+					ui.notify(f"Hata: {str(request.error)}")
+			else:
+				# Yalnızca üretilen metin saklanır (prompt yankısı, bağlam ve durdurma dizisi olmadan);
+				# iptal edilen veya süresi dolan yanıtların üretilmiş kısmı da kaydedilir
+				response = request.output_text(model.tokenizer)
+				interrupted = request.finish_reason in ("cancelled", "timeout")
+				if not response.strip():
+					with self.last_prompt_container:
+						ui.notify("Yanıt durduruldu" if interrupted else "Yanıt boş olamaz!")
+				else:
+					# Kayıt ve önbellek yazımı (tokenizasyon, SQLite) olay döngüsü dışında
+					loop.run_in_executor(
+						None, self._store_response, model, chat_id, prompt, response,
+						None if interrupted else response_key
+					)
+					self.response_generated = True
+					if interrupted:
+						reason = "süre sınırı aşıldı" if request.finish_reason == "timeout" else "yanıt durduruldu"
+						with self.last_prompt_container:
+							ui.notify(f"Üretim kesildi: {reason}, kısmi yanıt kaydedildi ({len(request.output_ids)} token)",
+									  type='warning')
+					else:
+						message = f"Prompt yanıtlandı ({len(request.output_ids)} token, {request.tokens_per_sec:.1f} token/sn"
+						if request.draft_proposed:
+							message += f", taslak kabul oranı %{100 * request.draft_accepted / request.draft_proposed:.0f}"
+						with self.last_prompt_container:
+							ui.notify(message + ")", type='positive')
 
-		with self.db.last_prompt_container:
-			threading.Thread(target=_generate, daemon=True).start()
-		self._load_chat_list()
+			self.prompt_entered = False
+			self.response_label.text = ""
+			self.response_display.text = ""
+			self.prompt_label.text = ""
+			self.prompt_display.text = ""
+
+		def _flush_stream():
+			finished = request.done
+			if streamer.drain():
+				self.response_display.text = streamer.text
+			if finished:
+				stream_timer.cancel()
+				_finish_response()
+
+		# Zamanlayıcı olay döngüsünde ve bu oturumun istemcisinde oluşturulur
+		interval = 1.0 / self.app.settings.stream_params['max_updates_per_sec']
+		with self.last_prompt_container:
+			stream_timer = ui.timer(interval, _flush_stream)
+		return True
 
-	def start_new_chat(self):
-		"""Thread-safe chat oluşturma (callback yerine doğrudan queue sonucunu bekler)."""
+	def _create_chat(self):
+		"""(Executor'da) sohbeti oluşturur ve chat_id'yi bekler; kenar çubuğu callback ile güncellenir."""
 		response_queue = queue.Queue()  # Sonucu taşımak için geçici queue
 
 		def _db_task(c, user_ip):
@@ -385,228 +4545,768 @@ class TasteModelApp:
 				c.execute("INSERT INTO chats (timestamp, user_ip) VALUES (?, ?)", (timestamp, user_ip))
 				chat_id = c.lastrowid
 				response_queue.put(chat_id)  # Sonucu queue'ya koy
-				return chat_id
+				return {"id": chat_id, "timestamp": timestamp, "prompt_count": 0}
 			except Exception as e:
 				response_queue.put(None)
 				raise e
 
 		# DB işlemini queue'ya ekle (self.db.queue kullanın)
-		self.db.queue.put((_db_task, (self.user_ip,), {'callback': self._schedule_history_refresh}))  # Callback OLMADAN olur mu
+		self.db.queue.put((_db_task, (self.user_ip,), {'callback': self._on_chat_created, 'client': self.client}))
 
 		# Sonucu bekleyelim (timeout: 10 saniye)
 		try:
 			chat_id = response_queue.get(timeout=10.0)
-			if chat_id is None:
-				raise RuntimeError("Chat oluşturulamadı!")
-
-			self.current_chat_id = chat_id
-			with self.db.last_prompt_container:
-				ui.notify(f"Yeni sohbet #{chat_id} başlatıldı")
-			return chat_id
 		except queue.Empty:
 			raise RuntimeError("Chat oluşturma işlemi zaman aşımına uğradı!")
+		if chat_id is None:
+			raise RuntimeError("Chat oluşturulamadı!")
+		return chat_id
+
+	async def start_new_chat(self):
+		"""Yeni sohbet açar ve gösterir; chat_id (başarısızsa None) döndürür."""
+		self.touch()
+		try:
+			chat_id = await asyncio.get_running_loop().run_in_executor(None, self._create_chat)
+		except RuntimeError as e:
+			with self.last_prompt_container:
+				ui.notify(str(e), type='negative')
+			return None
+		self._show_chat(chat_id)
+		with self.last_prompt_container:
+			ui.notify(f"Yeni sohbet #{chat_id} başlatıldı")
+		return chat_id
+
+	@staticmethod
+	def _parse_chat_id(value):
+		"""İstemci olayından gelen sohbet id'si; geçersizse None."""
+		try:
+			return int(value)
+		except (TypeError, ValueError):
+			return None
 
-	def delete_chat(self, chat_id, callback=None):
-		"""Belirtilen chat'i siler."""
+	def delete_chat(self, chat_id):
+		"""
+		Belirtilen chat'i siler. id istemciden geldiği için sahiplik silme görevinde
+		kontrol edilir; başka kullanıcının sohbeti silinmez.
+		"""
+		self.touch()
+		chat_id = self._parse_chat_id(chat_id)
 		if chat_id:
-			with self.history_container:
-				self.db.delete_chat(chat_id, callback=self._schedule_history_refresh)
-			if self.current_chat_id == chat_id:
-				self.current_chat_id = None
+			self.db.delete_chat(chat_id, callback=self._on_chat_deleted, client=self.client, user_ip=self.user_ip)
 
-	def _schedule_history_refresh(self, _=None):
-		self._load_chat_list()
-		self._refresh_history()
-
-	def _update_history(self, chat_list):
-		"""Refresh the chat history in the UI."""
-		# Clear the history container
-		self.history_container.clear()
-
-		# Find the selected chat
-		selected_chat = None
-		for chat in chat_list:
-			if chat["chat"][0] == self.current_chat_id:
-				selected_chat = chat
-				break
+	# Veritabanı değişiklikleri arayüze satır bazında yansıtılır; listeler yeniden kurulmaz
+	def _on_prompt_saved(self, row):
+		if row["chat_id"] == self.current_chat_id:
+			self.history_list.append([row])
+			self.history_list.scroll_to_end()
+		chat = self.chat_list.get_item(row["chat_id"])
+		if chat is not None:
+			self.chat_list.update_item(row["chat_id"], prompt_count=chat["prompt_count"] + 1)
 
-		if not selected_chat:
+	def _on_chat_created(self, chat):
+		if self.chat_list.get_item(chat["id"]) is None:
+			self.chat_list.prepend([chat])
+
+	def _on_chat_deleted(self, chat_id):
+		if chat_id is None:
+			with self.last_prompt_container:
+				ui.notify("Sohbet bulunamadı!", type='negative')
 			return
+		self.chat_list.remove_item(chat_id)
+		self.app.registry.evict_cache(chat_id)
+		if self.current_chat_id == chat_id:
+			self._show_chat(None)
+
+	def _show_chat(self, chat_id):
+		"""Geçmiş alanını verilen sohbete ayarlar; sohbetin sayfaları ayrıca yüklenir."""
+		self.current_chat_id = chat_id
+		self.history_next_before_id = None
+		self.history_more_button.visible = False
+		self.history_list.set_items([])
 
-		# Add rows for each prompt and response in the selected chat
-		with self.history_container:
-			for prompt in selected_chat["prompts"]:
-				# Display the prompt
-				with ui.row().classes("w-full p-2 bg-gray-100 border-b"):
-					ui.label("Prompt:").classes("font-bold w-1/6")
-					ui.label(prompt[3]).classes("w-5/6")  # Prompt text
+	def _update_history(self, page):
+		"""Seçili sohbetin bir prompt sayfasını geçmiş alanına işler."""
+		if page["chat_id"] != self.current_chat_id:
+			return  # Bu arada başka sohbete geçildi
 
-				# Display the response
-				with ui.row().classes("w-full p-2 bg-gray-50 border-b"):
-					ui.label("Yanıt:").classes("font-bold w-1/6")
-					ui.label(prompt[4]).classes("w-5/6")  # Response text
+		if page["before_id"] is None:
+			self.history_list.set_items(page["prompts"])
+			self.history_list.scroll_to_end()
+		else:
+			self.history_list.prepend(page["prompts"])
+		self.history_next_before_id = page["next_before_id"]
+		self.history_more_button.visible = self.history_next_before_id is not None
 
-	def _update_chat_list(self, chat_list):
+	def _update_chat_list(self, page):
 		"""Update the chat list UI in the main thread"""
-		# Clear the existing chat list
-		self.db.chat_list_container.clear()
-
-		# Add each chat to the sidebar
-		for chat in chat_list:
-			chat_id = chat["chat"][0]
-			timestamp = chat["chat"][1]
-			with self.db.chat_list_container:
-				with ui.row().classes("w-full items-center p-2 box-border"):
-					# Chat load button
-					ui.button(
-						f"Chat {chat_id} - {timestamp}",
-						on_click=lambda chat_id=chat_id: self._switch_chat(chat_id)
-					).classes("flex-grow p-2 box-border")
-
-					# Delete button
-					ui.button(
-						"❌",  # Delete icon
-						on_click=lambda chat_id=chat_id: self.delete_chat(chat_id)
-					).classes("p-2 box-border")
+		# İlk sayfa listeyi baştan kurar, sonraki sayfalar sona eklenir
+		if page["before"] is None:
+			self.chat_list.set_items(page["chats"])
+		else:
+			self.chat_list.append(page["chats"])
+		self.chat_list_next = page["next"]
+		self.chat_list_more_button.visible = self.chat_list_next is not None
+
+	def _load_older_prompts(self):
+		if self.current_chat_id and self.history_next_before_id is not None:
+			self.db.get_prompts(
+				self.current_chat_id, before_id=self.history_next_before_id,
+				limit=self.app.settings.history_params['prompt_page_size'], callback=self._update_history,
+				client=self.client
+			)
+
+	def _load_older_chats(self):
+		if self.chat_list_next is not None:
+			self.db.get_chat_summaries(
+				self.user_ip, before=self.chat_list_next,
+				limit=self.app.settings.history_params['chat_page_size'], callback=self._update_chat_list,
+				client=self.client
+			)
 
 	def _refresh_history(self):
-		def update_history(chat_list):
-			self.history_container.clear()
-			selected_chat = next((c for c in chat_list if c["chat"][0] == self.current_chat_id), None)
-			if selected_chat:
-				with self.history_container:
-					for prompt in selected_chat["prompts"]:
-						with ui.row().classes("w-full p-2 bg-gray-100 border-b"):
-							ui.label("Prompt:").classes("font-bold w-1/6")
-							ui.label(prompt[3]).classes("w-5/6")
-						with ui.row().classes("w-full p-2 bg-gray-50 border-b"):
-							ui.label("Yanıt:").classes("font-bold w-1/6")
-							ui.label(prompt[4]).classes("w-5/6")
-
-		self.db.get_chats(self.user_ip, callback=update_history)
+		if not self.current_chat_id:
+			self._show_chat(None)
+			return
+		self.db.get_prompts(
+			self.current_chat_id, limit=self.app.settings.history_params['prompt_page_size'],
+			callback=self._update_history, client=self.client
+		)
 
 	def _load_chat_list(self):
 		"""Load the list of chats into the sidebar."""
-		def update_chat_list(chat_list):
-			# Clear the existing chat list
-			self.db.chat_list_container.clear()
-
-			# Add each chat to the sidebar
-			for chat in chat_list:
-				chat_id = chat["chat"][0]
-				timestamp = chat["chat"][1]
-				with self.db.chat_list_container:
-					with ui.row().classes("w-full items-center p-2 box-border"):
-						# Chat load button
-						ui.button(
-							f"Chat {chat_id} - {timestamp}",
-							on_click=lambda chat_id=chat_id: self._switch_chat(chat_id)
-						).classes("flex-grow p-2 box-border")
+		self.db.get_chat_summaries(
+			self.user_ip, limit=self.app.settings.history_params['chat_page_size'],
+			callback=self._update_chat_list, client=self.client
+		)
 
-						# Delete button
-						ui.button(
-							"❌",  # Delete icon
-							on_click=lambda chat_id=chat_id: self.delete_chat(chat_id)
-						).classes("p-2 box-border")
+	def _search(self, e):
+		query = (e.value or "").strip()
+		if not query:
+			self.search_list.set_items([])
+			self.search_list.visible = False
+			return
+		self.touch()
+		self.db.search_prompts(
+			self.user_ip, query, limit=self.app.settings.history_params['search_results'],
+			callback=self._show_search_results, client=self.client
+		)
 
-		# Fetch the chat history and update the sidebar
-		with self.db.chat_list_container:
-			self.db.get_chats(self.user_ip, callback=self._update_chat_list)
+	def _show_search_results(self, found):
+		if found["query"] != (self.search_input.value or "").strip():
+			return  # Bu arada sorgu değişti
+		self.search_list.set_items(found["results"])
+		self.search_list.visible = True
 
-	def _switch_chat(self, chat_id):
+	async def _switch_chat(self, chat_id):
 		"""Switch to the selected chat and load its history."""
-		self.current_chat_id = chat_id
+		self.touch()
+		# id istemci olayından gelir: yalnızca bu kullanıcının sohbetleri açılır (yeni prompt'lar da buraya eklenir)
+		chat_id = self._parse_chat_id(chat_id)
+		owner = None
+		if chat_id:
+			owner = await asyncio.get_running_loop().run_in_executor(None, self.db.get_chat_owner, chat_id)
+		if owner is None or owner != self.user_ip:
+			with self.last_prompt_container:
+				ui.notify("Sohbet bulunamadı!", type='negative')
+			return
+		self._show_chat(chat_id)
 		self._refresh_history()  # Refresh the history to show the selected chat
 
-	def log_cpu_temperature(self):
-		while True:
-			temp = self.get_cpu_temperature()
-			print(f"CPU Sıcaklığı: {temp}")
-			time.sleep(300)  # 5 dakikada bir
-
 	def load_file(self, e):
+		"""
+		Yüklemenin dosya tanıtıcısını ayırır (NiceGUI geçici dosyası istek bitince kapanır);
+		kalıcı klasöre kopyalama, özet ve metin çıkarımı arka plan thread'inde yapılır.
+		NiceGUI 1.4 on_upload'ı dosya tamamen alındıktan sonra çağırır; yükleme sırasında
+		diske akıtma yapılmaz.
+		"""
+		self.touch()
+		file_name = e.name
+		if not file_name:
+			with self.last_prompt_container:
+				ui.notify("Dosya seçilmedi!")
+			return
+		if not DocumentIngestor.is_supported(file_name):
+			with self.last_prompt_container:
+				ui.notify("Desteklenmeyen dosya biçimi!")
+			return
+
 		try:
-			# NiceGUI'nin yeni sürümlerinde dosya bilgileri farklı şekilde geliyor
-			if not hasattr(e, 'files') or not e.files:
-				with self.db.last_prompt_container:
-					ui.notify("Dosya seçilmedi!")
+			upload = DocumentIngestor.detach_upload(e.content)
+		except Exception as ex:
+			traceback.print_exc()
+			with self.last_prompt_container:
+				ui.notify(f"Dosya işleme hatası: {str(ex)}")
+			return
+
+		self.upload_progress.value = 0
+		self.upload_progress.visible = True
+		threading.Thread(target=self._ingest_file, args=(upload, file_name), daemon=True).start()
+
+	def _ingest_file(self, upload, file_name):
+		"""Arka planda yüklemeyi kopyalar ve metni çıkarır; ilerleme ve sonuç olay döngüsüne iletilir."""
+		last_report = [0.0]
+
+		def _progress(done, total):
+			# Sayfa başına değil, saniyede en fazla ~10 güncelleme gönder
+			now = time.time()
+			if done < total and now - last_report[0] < 0.1:
+				return
+			last_report[0] = now
+			ui_dispatcher.post(lambda value: setattr(self.upload_progress, 'value', value), done / max(total, 1), self.client)
+
+		def _finish(result):
+			text, error = result
+			self.upload_progress.visible = False
+			if error is not None:
+				ui.notify(f"Dosya işleme hatası: {str(error)}", type='negative')
 				return
+			if digest not in self.documents:
+				self.documents.append(digest)
+			ui.notify(f"Dosya yüklendi: {file_name} ({len(text)} karakter)", type='positive')
+
+		digest = None
+		try:
+			with upload:
+				path, digest = self.app.ingestor.save_upload(upload, file_name)
+			text = self.app.ingestor.extract(path, digest, file_name, progress=_progress)
+			# Token sayıları seçili modelin (yüklü değilse herhangi bir yüklü modelin) tokenizer'ıyla tutulur
+			loaded = {model.name: model for model in self.app.registry.loaded_models()}
+			model = loaded.get(self.model_select.value) or next(iter(loaded.values()), None)
+			self.app.retriever.index_document(digest, file_name, text, model.tokenizer if model is not None else None)
+			ui_dispatcher.post(_finish, (text, None), self.client)
+		except Exception as ex:
+			traceback.print_exc()
+			ui_dispatcher.post(_finish, (None, ex), self.client)
+
+# ----------------------------
+# HTTP API (OPENAI UYUMLU)
+# ----------------------------
+def bearer_token(request):
+	header = request.headers.get("authorization", "")
+	return header[7:] if header.lower().startswith("bearer ") else ""
+
+def bearer_token_valid(request, tokens):
+	"""Authorization başlığındaki Bearer token izin verilen token'lardan biri mi."""
+	token = bearer_token(request)
+	return any(hmac.compare_digest(token, allowed) for allowed in tokens if allowed)
+
+class InferenceAPI:
+	"""
+	Tarayıcı arayüzü olmadan kullanılan JSON uç noktaları (/v1/completions,
+	/v1/chat/completions, /v1/models). İstekler arayüzle aynı zamanlayıcıya,
+	yanıt önbelleğine ve sohbet veritabanına gider; Bearer token ile korunur.
+	"""
+	def __init__(self, app_instance, tokens, max_batch_prompts=32, disconnect_check_interval=0.5):
+		self.app = app_instance
+		self.tokens = [token for token in tokens if token]
+		self.max_batch_prompts = max_batch_prompts
+		self.disconnect_check_interval = disconnect_check_interval
+		self._ids = itertools.count(1)
+
+	def register(self, fastapi_app):
+		fastapi_app.add_api_route("/v1/models", self.models, methods=["GET"])
+		fastapi_app.add_api_route("/v1/completions", self.completions, methods=["POST"])
+		fastapi_app.add_api_route("/v1/chat/completions", self.chat_completions, methods=["POST"])
+
+	@staticmethod
+	def _error(status, message, kind="invalid_request_error"):
+		return JSONResponse({'error': {'message': message, 'type': kind}}, status_code=status)
+
+	def _authorize(self, request):
+		"""Hata yanıtı döndürür; istek yetkiliyse None."""
+		if not bearer_token_valid(request, self.tokens):
+			return self._error(401, "Geçersiz veya eksik API token'ı", "authentication_error")
+		if not self.app.model_loaded:
+			return self._error(503, "Model henüz yüklenmedi", "server_error")
+		return None
+
+	async def _model(self, body):
+		"""
+		İstekteki 'model' (yoksa varsayılan model); yüklü değilse olay döngüsünü
+		bloklamadan yüklenmesi beklenir. (model, hata yanıtı) döndürür.
+		"""
+		name = body.get('model') or self.app.registry.default_model
+		if not isinstance(name, str) or name not in self.app.registry.checkpoints:
+			return None, self._error(404, f"Bilinmeyen model: {name}", "model_not_found")
+		try:
+			model = await asyncio.get_running_loop().run_in_executor(None, self.app.registry.get, name)
+		except (RuntimeError, TimeoutError) as e:
+			return None, self._error(503, str(e), "server_error")
+		return model, None
+
+	def _params(self, body):
+		"""
+		OpenAI parametrelerini zamanlayıcı parametrelerine çevirir (arayüzle aynı kurallar).
+		max_tokens ve 'timeout' (saniye) sunucu sınırlarını aşamaz; 'stop' en fazla 4 dizi.
+		"""
+		limits = self.app.settings.generation_params
+		temperature = max(0.0, float(body.get('temperature', self.app.settings.model_params['temperature'])))
+		seed = body.get('seed')
+		stop = body.get('stop') or []
+		stop = [stop] if isinstance(stop, str) else stop
+		if not isinstance(stop, list) or len(stop) > 4 or not all(isinstance(sequence, str) for sequence in stop):
+			raise ValueError("'stop' bir metin veya en fazla 4 metinlik liste olmalı")
+		timeout = float(body.get('timeout') or limits['max_seconds'])
+		return {
+			'max_new_tokens': max(1, min(int(body.get('max_tokens') or 16), limits['max_tokens'])),
+			'temperature': temperature,
+			'top_k': int(body.get('top_k', self.app.settings.model_params['top_k'])),
+			'do_sample': temperature > 0,
+			'seed': int(seed) if seed is not None else None,
+			'stop': stop,
+			'timeout': min(timeout, limits['max_seconds'])
+		}
+
+	def _cache_key(self, model, prompt, params):
+		if self.app.response_cache is None or not ResponseCache.is_deterministic(params):
+			return None
+		key_params = dict(params, model=model.path, precision=model.precision)
+		del key_params['timeout']
+		return ResponseCache.make_key(prompt, "", key_params)
 
-			# İlk dosyayı al
-			uploaded_file = e.files[0]
-
-			# Dosya adı ve uzantısı
-			file_name = uploaded_file.name
-			file_extension = os.path.splitext(file_name)[1].lower()
-
-			# Dosya içeriğini işle
-			if file_extension in [".txt", ".py", ".js", ".css", ".sh", ".bat", ".md"]:
-				self.reference_text = uploaded_file.read().decode('utf-8')
-			elif file_extension == ".pdf":
-				# PDF gibi binary dosyalar için geçici dosya oluştur
-				with tempfile.NamedTemporaryFile(delete=False) as tmp:
-					tmp.write(uploaded_file.read())
-					tmp_path = tmp.name
-				self.reference_text = read_pdf(tmp_path)
-				os.unlink(tmp_path)
-			elif file_extension == ".docx":
-				with tempfile.NamedTemporaryFile(delete=False) as tmp:
-					tmp.write(uploaded_file.read())
-					tmp_path = tmp.name
-				self.reference_text = read_docx(tmp_path)
-				os.unlink(tmp_path)
-			elif file_extension == ".html":
-				self.reference_text = uploaded_file.read().decode('utf-8')
+	def _submit(self, model, prompts, params, signal, cache_key=None, stream=False):
+		"""
+		Prompt'ları tek seferde modelin kuyruğuna ekler; önbellekte olanlar için model çalışmaz.
+		Her prompt için {'model', 'request', 'streamer', 'cached', 'response_key'} döndürür.
+		Yeni metin ve bitişler signal'i (LoopSignal) kurar. Kuyruk dolarsa o ana kadar
+		gönderilenler iptal edilip queue.Full yeniden fırlatılır.
+		"""
+		jobs = []
+		# Tüm prompt'lar tek tokenizer çağrısında kodlanır
+		encoded = model.tokenizer(list(prompts))['input_ids']
+		try:
+			for prompt, input_ids in zip(prompts, encoded):
+				job = {'model': model, 'request': None, 'streamer': None, 'cached': None,
+					   'response_key': self._cache_key(model, prompt, params)}
+				if job['response_key'] is not None:
+					cached = self.app.response_cache.get(job['response_key'])
+					if cached is not None:
+						job['cached'] = cached[1]
+						job['prompt_tokens'] = len(input_ids)
+						job['completion_tokens'] = model.context_builder.count_tokens(cached[1])
+						jobs.append(job)
+						continue
+				if stream:
+					job['streamer'] = TokenStreamer(model.tokenizer)
+					job['streamer'].on_update = signal.set
+				job['request'] = model.submit(
+					prompt, streamer=job['streamer'], cache_key=cache_key, input_ids=input_ids, **params
+				)
+				job['request'].add_done_callback(signal.set)
+				jobs.append(job)
+		except queue.Full:
+			self._cancel(jobs)
+			raise
+		return jobs
+
+	@staticmethod
+	def _cancel(jobs):
+		for job in jobs:
+			if job['request'] is not None and not job['request'].done:
+				job['request'].cancel()
+
+	def _finish(self, job):
+		"""
+		Biten işin metnini döndürür ve deterministikse (ilk çağrıda) önbelleğe yazar.
+		Decode ve SQLite yazımı içerdiğinden executor'da çağrılır.
+		"""
+		if job['cached'] is not None:
+			return job['cached']
+		request = job['request']
+		if 'text' not in job:
+			job['text'] = request.output_text(job['model'].tokenizer)
+			if job['response_key'] is not None and request.finish_reason in ("stop", "length"):
+				self.app.response_cache.put(job['response_key'], job['text'], job['text'])
+		return job['text']
+
+	def _usage(self, jobs):
+		prompt_tokens = completion_tokens = 0
+		for job in jobs:
+			if job['cached'] is not None:
+				prompt_tokens += job['prompt_tokens']
+				completion_tokens += job['completion_tokens']
 			else:
-				with self.db.last_prompt_container:
-					ui.notify("Desteklenmeyen dosya biçimi!")
+				prompt_tokens += len(job['request'].input_ids)
+				completion_tokens += len(job['request'].output_ids)
+		return {
+			'prompt_tokens': prompt_tokens,
+			'completion_tokens': completion_tokens,
+			'total_tokens': prompt_tokens + completion_tokens
+		}
+
+	@staticmethod
+	def _timing(jobs, started):
+		"""İstek süresi, ilk token gecikmesi ve üretim hızı (önbellek isabetleri sıfır sayılır)."""
+		requests = [job['request'] for job in jobs if job['request'] is not None]
+		first_tokens = [request.first_token_at - request.submitted_at for request in requests if request.first_token_at]
+		generated = sum(len(request.output_ids) for request in requests)
+		finished = [request.finished_at for request in requests if request.finished_at]
+		generation_seconds = max(finished) - min(request.submitted_at for request in requests) if finished else 0.0
+		return {
+			'total_seconds': time.time() - started,
+			'time_to_first_token_seconds': min(first_tokens) if first_tokens else 0.0,
+			'generation_seconds': generation_seconds,
+			'tokens_per_sec': generated / generation_seconds if generation_seconds > 0 else 0.0,
+			'cached': len(jobs) - len(requests)
+		}
+
+	async def _wait(self, request, jobs, signal):
+		"""
+		Tüm işler bitene kadar olay döngüsünü bloklamadan bekler; bitişler signal ile
+		bildirilir, istemci bağlantısı yalnızca disconnect_check_interval'da bir kontrol
+		edilir. İstemci koparsa işler iptal edilir ve (bir token içinde) bitmeleri
+		beklenip False döndürülür.
+		"""
+		connected = True
+		while True:
+			signal.clear()
+			if all(job['request'] is None or job['request'].done for job in jobs):
+				return connected
+			if connected and await request.is_disconnected():
+				self._cancel(jobs)
+				connected = False
+			await signal.wait(self.disconnect_check_interval)
+
+	async def _wait_saved(self, jobs, signal, timeout=10.0):
+		"""DB'ye yazılan turların commit'ini bekler; aynı chat_id ile gelen sonraki istek geçmişi görür."""
+		deadline = time.time() + timeout
+		while time.time() < deadline:
+			signal.clear()
+			if not any('saved' in job and not job['saved'].is_set() for job in jobs):
 				return
+			await signal.wait(deadline - time.time())
 
-			with self.db.last_prompt_container:
-				ui.notify(f"Dosya yüklendi: {file_name}")
+	async def _read_body(self, request):
+		try:
+			body = await request.json()
+		except ValueError:
+			return None
+		return body if isinstance(body, dict) else None
 
-		except Exception as ex:
-			with self.db.last_prompt_container:
-				ui.notify(f"Dosya işleme hatası: {str(ex)}")
+	@staticmethod
+	def _finish_reason(job):
+		return "stop" if job['cached'] is not None else job['request'].finish_reason
 
 	@staticmethod
-	def get_cpu_temperature():
+	def _sse(payload):
+		return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+	async def _stream(self, jobs, chunk, final, started, signal, on_finish=None, on_abort=None):
+		"""
+		Sunucu olaylarıyla (SSE) parça parça akış: her prompt kendi index'iyle gelir,
+		son olayda usage/timing bulunur. Yeni metin gelene kadar signal beklenir.
+		Biten işin metni executor'da on_finish(iş) ile (varsayılan: _finish) alınır.
+		Bağlantı koparsa bitmeyen istekler iptal edilir ve on_abort(işler) ayrı bir
+		thread'de çağrılır.
+		"""
+		loop = asyncio.get_running_loop()
+		finish = on_finish or self._finish
 		try:
-			temps = psutil.sensors_temperatures()
-			if not temps:
-				return "Sıcaklık bilgisi alınamadı"
-			for name, entries in temps.items():
-				for entry in entries:
-					if "core" in entry.label.lower():
-						return f"{entry.current}°C"
-			return "Sıcaklık bilgisi alınamadı"
-		except Exception as e:
-			return f"Hata: {str(e)}"
+			for index, job in enumerate(jobs):
+				if job['cached'] is not None:
+					await loop.run_in_executor(None, finish, job)
+					yield self._sse(chunk(index, job['cached'], None))
+					yield self._sse(chunk(index, "", self._finish_reason(job)))
+			pending = {index for index, job in enumerate(jobs) if job['request'] is not None}
+			while pending:
+				signal.clear()
+				for index in sorted(pending):
+					job = jobs[index]
+					request = job['request']
+					finished = request.done
+					# Durdurma dizisi olabilecek son karakterler istek bitene kadar gönderilmez
+					job['streamer'].drain()
+					text = job['streamer'].text
+					if finished and request.error is None:
+						text = await loop.run_in_executor(None, finish, job)
+					elif request.stop:
+						text = text[:max(0, len(text) - request.stop_holdback)]
+					sent = job.get('sent', 0)
+					if len(text) > sent:
+						job['sent'] = len(text)
+						yield self._sse(chunk(index, text[sent:], None))
+					if finished:
+						pending.discard(index)
+						if job['request'].error is not None:
+							yield self._sse({'error': {'message': str(job['request'].error), 'type': "server_error"}})
+						yield self._sse(chunk(index, "", self._finish_reason(job)))
+				if pending:
+					await signal.wait(self.disconnect_check_interval)
+			await self._wait_saved(jobs, signal)
+			yield self._sse(final(self._usage(jobs), self._timing(jobs, started)))
+			yield "data: [DONE]\n\n"
+		finally:
+			interrupted = [job for job in jobs if job['request'] is not None and not job['request'].done]
+			self._cancel(jobs)
+			if interrupted and on_abort is not None:
+				threading.Thread(target=on_abort, args=(interrupted,), daemon=True).start()
+
+	async def models(self, request: Request):
+		error = self._authorize(request)
+		if error is not None:
+			return error
+		# 'loaded': model şu an bellekte mi (değilse ilk istekte yüklenir)
+		stats = self.app.registry.stats()['models']
+		return {'object': "list", 'data': [
+			{'id': name, 'object': "model", 'owned_by': "local", 'loaded': stats[name]['loaded']}
+			for name in self.app.registry.names()
+		]}
+
+	async def completions(self, request: Request):
+		"""Metin tamamlama; 'prompt' tek bir metin veya aynı anda batch'lenecek metin listesi olabilir."""
+		error = self._authorize(request)
+		if error is not None:
+			return error
+		body = await self._read_body(request)
+		if body is None:
+			return self._error(400, "İstek gövdesi bir JSON nesnesi olmalı")
+		prompts = body.get('prompt')
+		if isinstance(prompts, str):
+			prompts = [prompts]
+		if not prompts or not all(isinstance(prompt, str) and prompt for prompt in prompts):
+			return self._error(400, "'prompt' boş olmayan bir metin veya metin listesi olmalı")
+		if len(prompts) > self.max_batch_prompts:
+			return self._error(400, f"Tek istekte en fazla {self.max_batch_prompts} prompt gönderilebilir")
+
+		model, error = await self._model(body)
+		if error is not None:
+			return error
+		started = time.time()
+		loop = asyncio.get_running_loop()
+		signal = LoopSignal(loop)
+		try:
+			params = self._params(body)
+			# Tokenizasyon ve yanıt önbelleği (SQLite) olay döngüsünü bloklamasın
+			jobs = await loop.run_in_executor(
+				None, self._submit, model, prompts, params, signal, None, bool(body.get('stream'))
+			)
+		except (TypeError, ValueError) as e:
+			return self._error(400, f"Geçersiz parametre: {e}")
+		except queue.Full:
+			return self._error(429, "Sunucu meşgul, lütfen biraz sonra tekrar deneyin", "rate_limit_error")
+
+		completion_id = f"cmpl-{next(self._ids)}"
+		created = int(started)
+
+		def envelope(choices):
+			return {'id': completion_id, 'object': "text_completion", 'created': created,
+					'model': model.name, 'choices': choices}
+
+		if body.get('stream'):
+			def chunk(index, text, finish_reason):
+				return envelope([{'index': index, 'text': text, 'finish_reason': finish_reason}])
+
+			def final(usage, timing):
+				return dict(envelope([]), usage=usage, timing=timing)
+
+			return StreamingResponse(self._stream(jobs, chunk, final, started, signal), media_type="text/event-stream")
+
+		if not await self._wait(request, jobs, signal):
+			return self._error(499, "İstemci bağlantısı kapandı")
+		failed = [job['request'].error for job in jobs if job['request'] is not None and job['request'].error]
+		if failed:
+			return self._error(500, str(failed[0]), "server_error")
+		texts = await loop.run_in_executor(None, lambda: [self._finish(job) for job in jobs])
+		choices = [
+			{'index': index, 'text': text, 'finish_reason': self._finish_reason(job)}
+			for index, (job, text) in enumerate(zip(jobs, texts))
+		]
+		return dict(envelope(choices), usage=self._usage(jobs), timing=self._timing(jobs, started))
+
+	@staticmethod
+	def _chat_owner(request):
+		"""
+		API sohbetlerinin sahibi: isteği yapan token'ın özeti. Sohbetler yalnızca onları açan
+		token ile sürdürülebilir; tarayıcı kullanıcılarının sohbetleri (IP) hiç eşleşmez.
+		"""
+		return "api:" + hashlib.sha256(bearer_token(request).encode()).hexdigest()[:16]
+
+	def _chat_prompt(self, model, messages, chat_id, params):
+		"""
+		Mesaj listesinden model prompt'unu kurar. chat_id verilmişse geçmiş arayüzdeki
+		gibi DB'den (bağlam bütçesine sığdırılarak) alınır ve yalnızca son kullanıcı
+		mesajı kullanılır; verilmemişse önceki mesajlar prompt'a eklenir.
+		"""
+		prompt = messages[-1]['content']
+		system = "".join(message['content'] + "\n\n" for message in messages if message['role'] == "system")
+		if chat_id is not None:
+			budget = (model.max_positions - params['max_new_tokens']
+					  - model.context_builder.count_tokens(system + prompt))
+			history, _ = model.context_builder.build(chat_id, budget)
+			return prompt, system + history + prompt
+
+		history, user = [], None
+		for message in messages[:-1]:
+			if message['role'] == "user":
+				user = message['content']
+			elif message['role'] == "assistant":
+				history.append(format_turn(user or "", message['content']))
+				user = None
+		return prompt, system + "".join(history) + prompt
+
+	async def chat_completions(self, request: Request):
+		"""
+		Sohbet tamamlama. Her yanıt DB'ye kaydedilir; 'chat_id' verilmezse istemci
+		adına yeni bir sohbet açılır ve yanıtta döndürülür (sonraki isteklerde
+		yalnızca yeni mesaj gönderilebilir).
+		"""
+		error = self._authorize(request)
+		if error is not None:
+			return error
+		body = await self._read_body(request)
+		if body is None:
+			return self._error(400, "İstek gövdesi bir JSON nesnesi olmalı")
+		messages = body.get('messages')
+		if (not isinstance(messages, list) or not messages
+				or not all(isinstance(message, dict) and isinstance(message.get('content'), str) for message in messages)
+				or messages[-1].get('role') != "user"):
+			return self._error(400, "'messages' son elemanı kullanıcı mesajı olan bir liste olmalı")
+
+		model, error = await self._model(body)
+		if error is not None:
+			return error
+		started = time.time()
+		loop = asyncio.get_running_loop()
+		signal = LoopSignal(loop)
+		try:
+			params = self._params(body)
+			chat_id = body.get('chat_id')
+			chat_id = int(chat_id) if chat_id is not None else None
+			owner = self._chat_owner(request)
+			if chat_id is not None and await loop.run_in_executor(None, self.app.db.get_chat_owner, chat_id) != owner:
+				return self._error(404, f"Bilinmeyen sohbet: {chat_id}", "not_found_error")
+			# Geçmiş DB'den okunur ve tokenize edilir: olay döngüsü dışında
+			prompt, model_prompt = await loop.run_in_executor(None, self._chat_prompt, model, messages, chat_id, params)
+			if chat_id is None:
+				chat_id = await loop.run_in_executor(None, self.app.db.create_chat, owner)
+			jobs = await loop.run_in_executor(
+				None, self._submit, model, [model_prompt], params, signal, chat_id, bool(body.get('stream'))
+			)
+		except (TypeError, ValueError, KeyError) as e:
+			return self._error(400, f"Geçersiz parametre: {e}")
+		except queue.Full:
+			return self._error(429, "Sunucu meşgul, lütfen biraz sonra tekrar deneyin", "rate_limit_error")
+
+		completion_id = f"chatcmpl-{next(self._ids)}"
+		created = int(started)
+
+		def save(job):
+			# Executor'da (veya on_abort thread'inde) çalışır: decode, tokenizasyon ve DB kuyruğu
+			response = self._finish(job)
+			if 'saved' not in job and response.strip():
+				job['saved'] = threading.Event()
+				self.app.db.save_prompt(
+					chat_id, prompt, response, turn_tokens=model.context_builder.turn_tokens(prompt, response),
+					callback=lambda _: (job['saved'].set(), signal.set())
+				)
+			return response
+
+		def envelope(kind, choices):
+			return {'id': completion_id, 'object': kind, 'created': created, 'model': model.name,
+					'chat_id': chat_id, 'choices': choices}
+
+		if body.get('stream'):
+			def chunk(index, text, finish_reason):
+				return envelope("chat.completion.chunk", [
+					{'index': index, 'delta': {'role': "assistant", 'content': text}, 'finish_reason': finish_reason}
+				])
+
+			def final(usage, timing):
+				return dict(envelope("chat.completion.chunk", []), usage=usage, timing=timing)
+
+			def save_partial(interrupted):
+				# İptal bir token içinde işlenir; üretilen kısım kaybolmasın
+				for job in interrupted:
+					job['request'].wait()
+					if job['request'].error is None:
+						save(job)
+
+			return StreamingResponse(
+				self._stream(jobs, chunk, final, started, signal, on_finish=save, on_abort=save_partial),
+				media_type="text/event-stream"
+			)
+
+		connected = await self._wait(request, jobs, signal)
+		job = jobs[0]
+		if job['request'] is not None and job['request'].error is not None:
+			return self._error(500, str(job['request'].error), "server_error")
+		# Kısmi yanıt da kaydedilir; bağlantı kapandıysa yanıt gövdesi okunmaz
+		response = await loop.run_in_executor(None, save, job)
+		if not connected:
+			return self._error(499, "İstemci bağlantısı kapandı")
+		choices = [{
+			'index': 0,
+			'message': {'role': "assistant", 'content': response},
+			'finish_reason': self._finish_reason(job)
+		}]
+		await self._wait_saved(jobs, signal)
+		return dict(envelope("chat.completion", choices), usage=self._usage(jobs), timing=self._timing(jobs, started))
 
 # ----------------------------
 # UYGULAMAYI BAŞLAT
 # ----------------------------
 def main():
+	# Çıkarım worker'ları (spawn) bu modülü __mp_main__ olarak yeniden içe aktarır
+	if multiprocessing.current_process().name != 'MainProcess':
+		return
+
 	parser = argparse.ArgumentParser(description="GPT-Neo GUI Application")
 	parser.add_argument("--port", "-p", type=int, default=1919, help="Port number to run the application on")
 	parser.add_argument("--password", "-pw", type=str, default="letmein", help="Password to access the application")
+	parser.add_argument("--cores", type=parse_cpulist, default=None, help="CPUs reserved for inference, e.g. 2-7 (default: auto)")
+	parser.add_argument("--numa-node", type=int, default=None, help="NUMA node to run inference on (default: node with most cores)")
+	parser.add_argument("--sweep-threads", action="store_true", help="Measure tokens/sec for several thread counts at startup and use the fastest")
+	parser.add_argument("--draft-model", type=str, default=None, help="Small draft model directory for speculative decoding (relative paths are resolved next to the main model)")
+	parser.add_argument("--models-dir", type=str, default=None, help="Directory of checkpoint folders (e.g. gpt-neo-125M, gpt-neo-1.3B) or a single checkpoint folder; models load on first use")
+	parser.add_argument("--workers", type=int, default=0, help="Number of inference worker processes sharing the model weights (0: run in-process)")
+	parser.add_argument("--api-token", action="append", default=None, help="Bearer token accepted by the /v1 JSON API; repeat for several tokens (default: $NEO_API_TOKEN, API disabled if unset)")
+	parser.add_argument("--admin-password", type=str, default=None, help="Password that logs in as admin and enables on-demand profiling in the sidebar (default: $NEO_ADMIN_PASSWORD, disabled if unset)")
+	parser.add_argument("--backfill-search", action="store_true", help="Add chats saved before full-text search existed to the search index, then exit (resumable; safe while the server runs)")
 	args = parser.parse_args()
 
+	if args.backfill_search:
+		db = ChatHistoryDB()
+		added = db.backfill_search_index(
+			progress=lambda added, done, upto: print(f"Arama indeksi: {added} tur eklendi ({done}/{upto})")
+		)
+		db.close()
+		print(f"Arama indeksi tamamlandı: {added} tur eklendi")
+		return
+
 	PORT = args.port
 	PASSWORD = args.password  # Şifre parametresi
+	ADMIN_PASSWORD = args.admin_password or os.environ.get("NEO_ADMIN_PASSWORD", "")
+
+	# Ana thread (NiceGUI olay döngüsü) ve ondan açılan DB thread'leri servis çekirdeklerinde kalır;
+	# model thread'leri kendilerini çıkarım çekirdeklerine sabitler
+	placement = plan_cpu_placement(selected_cores=args.cores, numa_node=args.numa_node)
+	print(f"Çıkarım CPU'ları: {placement['inference']}, servis CPU'ları: {placement['service']}, NUMA: {placement['numa_layout']}")
+	pin_current_thread(placement['service'])
 
 	# TasteModelApp örneği oluştur
-	app_instance = TasteModelApp()
-	app_instance.db = ChatHistoryDB()
+	app_instance = TasteModelApp(placement, sweep_threads=args.sweep_threads, workers=args.workers,
+								 draft_model_path=args.draft_model, models_dir=args.models_dir)
+	# DB callback'leri bu olay döngüsüne teslim edilir
+	app.on_startup(ui_dispatcher.bind)
+
+	# Arayüzle aynı model ve DB'yi kullanan JSON API (token verilmezse kapalı)
+	api_tokens = args.api_token or [os.environ.get("NEO_API_TOKEN", "")]
+	if any(api_tokens):
+		InferenceAPI(app_instance, api_tokens, **app_instance.settings.api_params).register(app)
+		print("JSON API etkin: /v1/completions, /v1/chat/completions, /v1/models")
+	else:
+		print("JSON API kapalı (--api-token veya NEO_API_TOKEN ile etkinleştirilir)")
 
-	# Şifre doğrulama durumu
-	password_verified = False
+	# Prometheus metrikleri; API token'ı tanımlıysa aynı token istenir
+	@app.get("/metrics")
+	def metrics_endpoint(request: Request):
+		if any(api_tokens) and not bearer_token_valid(request, api_tokens):
+			return PlainTextResponse("Unauthorized\n", status_code=401)
+		return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 	# Kullanıcının IP adresini almak için bir sayfa oluştur
 	@ui.page("/")
-	def index(request: Request):
-		nonlocal password_verified
-
+	def index(request: Request, client: Client):
 		# Kullanıcının IP adresini al
 		client_host = request.client.host
 
@@ -614,14 +5314,11 @@ def main():
 		if 'ip' not in app.storage.user:
 			app.storage.user['ip'] = client_host
 
-		# TasteModelApp örneğine IP adresini kaydet
-		app_instance.user_ip = client_host
-
 		# Kullanıcıya bildirim göster
 		ui.notify(f"IP adresiniz kaydedildi: {client_host}")
 
-		# Şifre doğrulanmamışsa şifre giriş ekranı göster
-		if not password_verified:
+		# Şifre doğrulanmamışsa şifre giriş ekranı göster (doğrulama tarayıcı başına saklanır)
+		if not app.storage.user.get('password_verified', False):
 			with ui.column().classes("w-full max-w-4xl mx-auto"):
 				ui.label("Lütfen şifreyi girin:")
 				password_input = ui.input(password=True)
@@ -643,83 +5340,33 @@ def main():
 			ui.timer(1.0, check_model_loaded)  # Check every second
 			return
 
-		# Ana UI bileşenlerini döndür
-		return main_ui()
+		# Her sekme kendi oturumunu alır; model ve DB paylaşılır
+		session = app_instance.open_session(client, client_host, is_admin=app.storage.user.get('admin', False))
+		# Sekme kapanır veya bağlantı disconnect_grace içinde dönmezse süren üretimler iptal edilir ve
+		# oturum hemen bırakılır; boşta oturum temizleyicisi yalnızca yedek olarak kalır
+		client.on_disconnect(lambda: app_instance.close_session(session.session_id))
+		return session.build_ui()
 
 	# Şifre doğrulama fonksiyonu
 	def check_password(password):
-		nonlocal password_verified
-		if password == PASSWORD:
-			password_verified = True
+		# Yönetici şifresi normal girişe ek olarak profilleme panelini açar
+		is_admin = bool(ADMIN_PASSWORD) and hmac.compare_digest((password or "").encode(), ADMIN_PASSWORD.encode())
+		if password == PASSWORD or is_admin:
+			app.storage.user['password_verified'] = True
+			app.storage.user['admin'] = is_admin
 			ui.notify("Şifre doğru! Ana sayfaya yönlendiriliyorsunuz...")
 			ui.navigate.to("/")  # Ana sayfaya yönlendir
 		else:
 			ui.notify("Yanlış şifre! Lütfen tekrar deneyin.")
 
-	# Ana UI bileşenlerini oluştur
-	def main_ui():
-		with ui.row().classes("w-full h-screen p-0 m-0 nowrap box-border"):
-			# Sidebar for chat list (left side)
-			with ui.column().classes("w-2/12 bg-gray-100 h-full overflow-y-auto p-0 m-0 box-border"):
-				ui.button("Yeni Chat", on_click=app_instance.start_new_chat).classes("w-full p-2 box-border")
-				app_instance.db.chat_list_container = ui.column().classes("w-full p-2 box-border")  # Container for chat list
-
-			# Main interface (right side)
-			with ui.column().classes("w-9/12 h-13/15 overflow-y-auto p-0 m-0 box-border"):
-				# Model Parametreleri
-				with ui.row().classes("w-full p-2 box-border"):
-					ui.label("Max Token:").classes("w-1/8 box-border")
-					app_instance.max_tokens = ui.input(value="300").classes("w-3/8 box-border")
-					ui.label("Temperature:").classes("w-1/8 box-border")
-					app_instance.temperature = ui.input(value="0.75").classes("w-3/8 box-border")
-
-				# Sohbet Geçmişi
-				app_instance.history_container = ui.column().classes("w-full p-2 box-border")  # Initialize history container
-
-				# Yanıt Gösterme Alanı (for typewriter effect)
-				app_instance.db.last_prompt_container = ui.column().classes("w-full p-2 box-border")
-				with app_instance.db.last_prompt_container:
-					with ui.row().classes("w-full p-2 bg-gray-100 border-b"):
-						app_instance.prompt_label = ui.label().classes("font-bold w-1/6")
-						app_instance.prompt_display = ui.label().classes("w-5/6")
-					with ui.row().classes("w-full p-2 bg-gray-100 border-b"):
-						app_instance.response_label = ui.label().classes("font-bold w-1/6")
-						app_instance.response_display = ui.label().classes("w-5/6")  # response_display özelliğini başlatın
-
-				# Prompt Giriş Alanı
-				app_instance.prompt_entry = ui.textarea(label="Prompt").classes("w-full p-2 box-border")
-
-				# Dosya Yükleme
-				ui.upload(on_upload=app_instance.load_file).classes("w-full p-0 box-border")
-
-				# Butonlar
-				with ui.row().classes("w-full p-0 nowrap box-border"):
-					with ui.row().classes("w-full p-0 nowrap box-border"):
-						# Gönder Butonu
-						ui.button(
-							"Gönder",
-							on_click=lambda: (
-								threading.Thread(target=app_instance.generate_response, daemon=True).start()
-							)
-						).classes("flex-grow p-2 box-border").bind_enabled_from(
-							app_instance, "model_loaded"  # Model yüklenene kadar buton pasif
-						)
-						# Geçmişi Sil Butonu
-						ui.button(
-							"❌",
-							on_click=lambda: app_instance.delete_chat(app_instance.current_chat_id)
-						).classes("p-2 box-border")
-
-		# Load the chat list into the sidebar
-		app_instance.db.get_chats(app_instance.user_ip, callback=app_instance._update_chat_list)
-
 	# Uygulamayı belirtilen portta başlat ve stabil WebSocket ayarları ekle
 	ui.run(
 		port=PORT,
 		storage_secret=PASSWORD,
-		reconnect_timeout=9999,  # Daha uzun bir yeniden bağlanma süresi
+		# Kopan istemci bu süre içinde dönmezse on_disconnect çalışır ve oturumu kapatılır
+		reconnect_timeout=app_instance.settings.generation_params['disconnect_grace'],
 		reload=False,  # Uygulamanın yeniden başlatılmasını engeller
-		lifespan="on"  # Lifespan event handler'ı ekleyin
+		lifespan="on"  # Açılış olayları (UI dağıtıcısı olay döngüsüne bağlanır)
 	)
 
 if __name__ in {"__main__", "__mp_main__"}:
@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import build_tiny_model
+
+
+@pytest.fixture(scope="session")
+def tiny_model_dir(tmp_path_factory):
+	"""benchmark.py'deki rastgele küçük GPT-Neo ve bayt düzeyinde tokenizer (çevrimdışı)."""
+	return build_tiny_model(str(tmp_path_factory.mktemp("tiny-neo")))
+
+
+@pytest.fixture(scope="session")
+def tiny_model(tiny_model_dir):
+	from transformers import GPTNeoForCausalLM
+	return GPTNeoForCausalLM.from_pretrained(tiny_model_dir).eval()
+
+
+@pytest.fixture(scope="session")
+def tiny_tokenizer(tiny_model_dir):
+	from transformers import GPT2TokenizerFast
+	return GPT2TokenizerFast.from_pretrained(tiny_model_dir)
+
+
+@pytest.fixture(scope="session")
+def tiny_draft_model(tmp_path_factory):
+	"""Aynı sözlükte, farklı ağırlıklı tek katmanlı taslak model."""
+	from transformers import GPTNeoForCausalLM
+	model_dir = build_tiny_model(str(tmp_path_factory.mktemp("tiny-neo-draft")), layers=1, seed=1)
+	return GPTNeoForCausalLM.from_pretrained(model_dir).eval()
@@ -0,0 +1,111 @@
+import queue
+
+import pytest
+
+from neo_NiceGUI import ChatHistoryDB, UIDispatcher
+
+
+@pytest.fixture
+def db(tmp_path):
+	db = ChatHistoryDB(str(tmp_path / "chat_history.db"), dispatcher=UIDispatcher())
+	if not db.search_enabled:
+		db.close()
+		pytest.skip("SQLite FTS5 desteği yok")
+	yield db
+	db.close()
+
+
+def _write(db, func, *args):
+	"""Yazıcı kuyruğunda bir görev çalıştırır ve sonucunu bekler."""
+	results = queue.Queue()
+	db.queue.put((func, args, {'callback': results.put}))
+	return results.get(timeout=10)
+
+
+def _save(db, chat_id, prompt, response):
+	results = queue.Queue()
+	db.save_prompt(chat_id, prompt, response, callback=results.put)
+	return results.get(timeout=10)["id"]
+
+
+def _search(db, user_ip, query):
+	results = queue.Queue()
+	db.search_prompts(user_ip, query, callback=results.put)
+	return results.get(timeout=10)["results"]
+
+
+def _search_ids(db, user_ip, query):
+	return [result["id"] for result in _search(db, user_ip, query)]
+
+
+def _integrity_check(c):
+	# rank=1: indeks içerik görünümüyle (prompts + chats) de karşılaştırılır
+	c.execute("INSERT INTO prompts_fts (prompts_fts, rank) VALUES ('integrity-check', 1)")
+	return True
+
+
+def test_search_finds_saved_turns(db):
+	chat_id = db.create_chat("10.0.0.1")
+	prompt_id = _save(db, chat_id, "Bana bir şarkı söyle", "Tabii, işte kısa bir şarkı")
+	_save(db, chat_id, "Hava nasıl?", "Bugün güneşli")
+
+	assert _search_ids(db, "10.0.0.1", "söyle") == [prompt_id]
+	assert _search_ids(db, "10.0.0.1", "soyle") == [prompt_id]  # remove_diacritics
+	assert _search_ids(db, "10.0.0.1", "şar") == [prompt_id]  # son kelime önek olarak aranır
+	assert "<mark>" in _search(db, "10.0.0.1", "şarkı")[0]["snippet"]
+	assert _search_ids(db, "10.0.0.2", "şarkı") == []
+
+
+def test_search_follows_updates(db):
+	chat_id = db.create_chat("10.0.0.1")
+	prompt_id = _save(db, chat_id, "eski soru", "eski yanıt")
+
+	def _update(c, prompt_id):
+		c.execute("UPDATE prompts SET prompt=?, response=? WHERE id=?", ("yeni soru", "yeni yanıt", prompt_id))
+		return True
+
+	_write(db, _update, prompt_id)
+	assert _search_ids(db, "10.0.0.1", "eski") == []
+	assert _search_ids(db, "10.0.0.1", "yeni") == [prompt_id]
+
+	# Yalnızca turn_tokens değişen güncelleme indekse dokunmaz
+	db.set_turn_tokens([(prompt_id, 12)])
+	assert _search_ids(db, "10.0.0.1", "yeni") == [prompt_id]
+	assert _write(db, _integrity_check)
+
+
+def test_search_follows_deletes(db):
+	chat_id = db.create_chat("10.0.0.1")
+	other_chat_id = db.create_chat("10.0.0.1")
+	deleted_id = _save(db, chat_id, "silinecek tur", "yanıt")
+	kept_id = _save(db, chat_id, "kalacak tur", "yanıt")
+	other_id = _save(db, other_chat_id, "başka sohbetteki tur", "yanıt")
+
+	def _delete(c, prompt_id):
+		c.execute("DELETE FROM prompts WHERE id=?", (prompt_id,))
+		return True
+
+	_write(db, _delete, deleted_id)
+	assert _search_ids(db, "10.0.0.1", "silinecek") == []
+	assert sorted(_search_ids(db, "10.0.0.1", "tur")) == sorted([kept_id, other_id])
+
+	results = queue.Queue()
+	db.delete_chat(chat_id, callback=results.put)
+	results.get(timeout=10)
+	assert _search_ids(db, "10.0.0.1", "tur") == [other_id]
+	assert _write(db, _integrity_check)
+
+
+def test_delete_chat_checks_owner(db):
+	chat_id = db.create_chat("10.0.0.1")
+	prompt_id = _save(db, chat_id, "sahibi olan tur", "yanıt")
+
+	results = queue.Queue()
+	db.delete_chat(chat_id, callback=results.put, user_ip="10.0.0.2")
+	assert results.get(timeout=10) is None
+	assert db.get_chat_owner(chat_id) == "10.0.0.1"
+	assert _search_ids(db, "10.0.0.1", "sahibi") == [prompt_id]
+
+	db.delete_chat(chat_id, callback=results.put, user_ip="10.0.0.1")
+	assert results.get(timeout=10) == chat_id
+	assert db.get_chat_owner(chat_id) is None
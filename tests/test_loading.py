@@ -0,0 +1,84 @@
+import os
+import shutil
+import threading
+
+import pytest
+import torch
+from transformers import AutoConfig
+
+from neo_NiceGUI import (
+	current_converted_checkpoint, estimate_memory_mb, load_model_mmap, model_memory_mb, quantize_model_int8,
+	save_converted_checkpoint
+)
+
+
+@pytest.fixture
+def model_dir(tiny_model_dir, tmp_path):
+	"""Türetilmiş dosyalar yazılabilsin diye küçük modelin kopyası."""
+	return shutil.copytree(tiny_model_dir, str(tmp_path / "model"))
+
+
+def _touch_checkpoint(model_dir):
+	# Kaynak checkpoint'in değiştirilmesi (yeni dosya): boyut aynı, değişiklik zamanı farklı
+	path = os.path.join(model_dir, "model.safetensors")
+	stat = os.stat(path)
+	os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_mmap_load_matches_from_pretrained(tiny_model_dir, tiny_model):
+	model, _ = load_model_mmap(tiny_model_dir, AutoConfig.from_pretrained(tiny_model_dir), torch.float32)
+	assert not any(buffer.is_meta for buffer in model.buffers())
+	input_ids = torch.tensor([[3, 1, 4, 1, 5, 9, 2, 6]])
+	with torch.no_grad():
+		assert torch.equal(model(input_ids).logits, tiny_model(input_ids).logits)
+
+
+def test_meta_skeleton_does_not_leak_to_other_threads(tiny_model_dir):
+	# Başka thread'de aynı anda kurulan modüllerin parametreleri gerçek cihazda kalmalı
+	config = AutoConfig.from_pretrained(tiny_model_dir)
+	built = []
+
+	def _build():
+		for _ in range(50):
+			built.append(torch.nn.Linear(4, 4).weight.is_meta)
+
+	thread = threading.Thread(target=_build)
+	thread.start()
+	for _ in range(5):
+		load_model_mmap(tiny_model_dir, config, torch.float32)
+	thread.join()
+	assert not any(built)
+
+
+def test_converted_checkpoint_is_tied_to_source(model_dir):
+	config = AutoConfig.from_pretrained(model_dir)
+	model, _ = load_model_mmap(model_dir, config, torch.bfloat16)
+	path = save_converted_checkpoint(model, model_dir, torch.bfloat16)
+	assert current_converted_checkpoint(model_dir, torch.bfloat16) == path
+	assert load_model_mmap(model_dir, config, torch.bfloat16)[1] == path
+
+	_touch_checkpoint(model_dir)
+	assert current_converted_checkpoint(model_dir, torch.bfloat16) is None
+	assert load_model_mmap(model_dir, config, torch.bfloat16)[1] == os.path.join(model_dir, "model.safetensors")
+
+
+@pytest.mark.skipif(torch.backends.quantized.engine == 'none', reason="int8 nicemleme desteği yok")
+def test_int8_cache_is_rebuilt_when_source_changes(model_dir):
+	config = AutoConfig.from_pretrained(model_dir)
+	_, cache_path = quantize_model_int8(load_model_mmap(model_dir, config, torch.float32)[0], model_dir)
+	source = torch.load(cache_path)['source']
+
+	quantize_model_int8(load_model_mmap(model_dir, config, torch.float32)[0], model_dir)
+	assert torch.load(cache_path)['source'] == source
+
+	_touch_checkpoint(model_dir)
+	quantize_model_int8(load_model_mmap(model_dir, config, torch.float32)[0], model_dir)
+	assert torch.load(cache_path)['source'] != source
+
+
+def test_memory_estimate_is_close_to_loaded_size(model_dir):
+	config = AutoConfig.from_pretrained(model_dir)
+	for precision, dtype in (('fp32', torch.float32), ('bf16', torch.bfloat16)):
+		model, _ = load_model_mmap(model_dir, config, dtype)
+		assert estimate_memory_mb(model_dir, config, precision) == pytest.approx(model_memory_mb(model), rel=0.1)
+	assert estimate_memory_mb(model_dir, config, 'int8') < estimate_memory_mb(model_dir, config, 'fp32')
@@ -0,0 +1,148 @@
+import random
+
+from neo_NiceGUI import GenerationRequest, InferenceScheduler, PrefixCache
+
+
+def _prompts(lengths, seed=0):
+	rng = random.Random(seed)
+	return [[rng.randrange(256) for _ in range(length)] for length in lengths]
+
+
+def _greedy(input_ids, new_tokens=8, cache_key=None):
+	return GenerationRequest(input_ids, new_tokens, 0.0, 0, do_sample=False, cache_key=cache_key)
+
+
+def _scheduler(model, tokenizer, **params):
+	scheduler = InferenceScheduler(model, tokenizer, **params)
+	scheduler.eos_token_id = None  # Rastgele modelde EOS'ta durulmaz, uzunluk sabit kalır
+	return scheduler
+
+
+def _run(scheduler, requests):
+	for request in requests:
+		scheduler.submit_request(request, block=True)
+	return [request.result(timeout=120) for request in requests]
+
+
+def _generate_alone(model, tokenizer, input_ids, new_tokens=8, **params):
+	scheduler = _scheduler(model, tokenizer, **params).start()
+	try:
+		return _run(scheduler, [_greedy(input_ids, new_tokens)])[0]
+	finally:
+		scheduler.stop()
+
+
+def test_batched_greedy_matches_single(tiny_model, tiny_tokenizer):
+	prompts = _prompts([5, 17, 9, 30])
+	expected = [_generate_alone(tiny_model, tiny_tokenizer, prompt) for prompt in prompts]
+
+	# İstekler zamanlayıcı başlamadan kuyruğa alınır: hepsi aynı (sol dolgulu) prefill'e girer
+	scheduler = _scheduler(tiny_model, tiny_tokenizer, max_batch_size=len(prompts))
+	requests = [_greedy(prompt) for prompt in prompts]
+	for request in requests:
+		scheduler.submit_request(request)
+	scheduler.start()
+	try:
+		assert [request.result(timeout=120) for request in requests] == expected
+	finally:
+		scheduler.stop()
+
+
+def test_joining_running_batch_matches_single(tiny_model, tiny_tokenizer):
+	prompts = _prompts([12, 4, 21], seed=1)
+	new_tokens = [24, 6, 6]
+	expected = [
+		_generate_alone(tiny_model, tiny_tokenizer, prompt, tokens) for prompt, tokens in zip(prompts, new_tokens)
+	]
+
+	# Uzun istek çözümlenirken gelenler adım aralarında batch'e katılır ve biten satırlar çıkarılır
+	scheduler = _scheduler(tiny_model, tiny_tokenizer, max_batch_size=len(prompts)).start()
+	try:
+		first = _greedy(prompts[0], new_tokens[0])
+		scheduler.submit_request(first)
+		while not first.output_ids:
+			first.wait(0.01)
+		later = _run(scheduler, [_greedy(prompt, tokens) for prompt, tokens in zip(prompts[1:], new_tokens[1:])])
+		outputs = [first.result(timeout=120)] + later
+	finally:
+		scheduler.stop()
+	assert outputs == expected
+
+
+def test_prefix_cache_hit_matches_cold_run(tiny_model, tiny_tokenizer):
+	first_turn, second_turn = _prompts([14, 9], seed=2)
+	cache = PrefixCache(64 * 1024 * 1024)
+	scheduler = _scheduler(tiny_model, tiny_tokenizer, prefix_cache=cache).start()
+	try:
+		first_output = _run(scheduler, [_greedy(first_turn, cache_key=1)])[0]
+		# İkinci tur önceki turun prompt ve yanıtını yeniden gönderir
+		prompt = first_turn + first_output + second_turn
+		warm = _run(scheduler, [_greedy(prompt, cache_key=1)])[0]
+	finally:
+		scheduler.stop()
+
+	stats = cache.stats()
+	assert stats['hits'] == 1
+	assert stats['saved_tokens'] > len(first_turn)
+	assert warm == _generate_alone(tiny_model, tiny_tokenizer, prompt)
+
+
+def test_prefix_cache_uses_common_prefix_only(tiny_model, tiny_tokenizer):
+	shared, first_tail, second_tail = _prompts([10, 6, 8], seed=3)
+	cache = PrefixCache(64 * 1024 * 1024)
+	scheduler = _scheduler(tiny_model, tiny_tokenizer, prefix_cache=cache).start()
+	try:
+		_run(scheduler, [_greedy(shared + first_tail, cache_key="sohbet")])
+		# Önbellekteki dizi ile yalnızca ortak önek kadar örtüşen (düzenlenmiş) prompt
+		warm = _run(scheduler, [_greedy(shared + second_tail, cache_key="sohbet")])[0]
+	finally:
+		scheduler.stop()
+
+	assert cache.stats()['saved_tokens'] >= len(shared)
+	assert warm == _generate_alone(tiny_model, tiny_tokenizer, shared + second_tail)
+
+
+def _generate_speculative(model, tokenizer, draft_model, input_ids, new_tokens=16):
+	scheduler = _scheduler(model, tokenizer, draft_model=draft_model, num_draft_tokens=4).start()
+	try:
+		request = _greedy(input_ids, new_tokens)
+		_run(scheduler, [request])
+	finally:
+		scheduler.stop()
+	return request
+
+
+def test_speculative_accepts_matching_draft(tiny_model, tiny_tokenizer):
+	prompt = _prompts([11], seed=4)[0]
+	# Taslak büyük modelin kendisiyse her öneri kabul edilir
+	request = _generate_speculative(tiny_model, tiny_tokenizer, tiny_model, prompt)
+	assert request.draft_proposed > 0
+	assert request.draft_accepted == request.draft_proposed
+	assert request.output_ids == _generate_alone(tiny_model, tiny_tokenizer, prompt, 16)
+
+
+def test_speculative_rejections_keep_greedy_output(tiny_model, tiny_tokenizer, tiny_draft_model):
+	prompt = _prompts([11], seed=5)[0]
+	request = _generate_speculative(tiny_model, tiny_tokenizer, tiny_draft_model, prompt)
+	assert request.draft_proposed > 0
+	assert request.draft_accepted < request.draft_proposed
+	# Reddedilen taslak token'larına rağmen çıktı normal greedy çözümlemeyle aynıdır
+	assert request.output_ids == _generate_alone(tiny_model, tiny_tokenizer, prompt, 16)
+
+
+def test_speculative_stops_at_max_new_tokens(tiny_model, tiny_tokenizer):
+	prompt = _prompts([7], seed=6)[0]
+	# Kabul edilen token'lar uzunluk sınırını aşmaz (k kalan token sayısıyla sınırlı)
+	request = _generate_speculative(tiny_model, tiny_tokenizer, tiny_model, prompt, new_tokens=5)
+	assert len(request.output_ids) == 5
+	assert request.finish_reason == "length"
+	assert request.output_ids == _generate_alone(tiny_model, tiny_tokenizer, prompt, 5)
+
+
+def test_multibyte_stop_sequence_is_detected(tiny_model, tiny_tokenizer):
+	# Bayt düzeyinde tokenizer: her bayt bir token, emoji dört token
+	scheduler = _scheduler(tiny_model, tiny_tokenizer)
+	request = GenerationRequest([1, 2, 3], 16, 0.0, 0, do_sample=False, stop=["🤖"])
+	request.output_ids = list("yanıt 🤖".encode("utf-8"))
+	assert scheduler._finish_reason(request, request.output_ids[-1]) == "stop"
+	assert request.output_text(tiny_tokenizer) == "yanıt "
@@ -0,0 +1,114 @@
+import os
+import json
+
+import pytest
+from transformers import GPT2Tokenizer, GPT2TokenizerFast
+
+from neo_NiceGUI import TOKENIZER_PARITY_SAMPLES, CachedTokenizer, check_tokenizer_parity, split_cacheable
+
+# "\n\n" ayracının kenar durumları: metnin başında/sonunda, boşluktan sonra, art arda
+BOUNDARY_SAMPLES = [
+	"a\n\nb",
+	"\n\nbaşta ayraç",
+	"sonda ayraç\n\n",
+	"boşluktan sonra \n\nayraç",
+	"dört\n\n\n\nsatır sonu",
+	"beş\n\n\n\n\nsatır sonu",
+	"\n\n\n\n",
+	"tur 1\n\ntur 2\n\ntur 3",
+	"satır\r\n\r\nCRLF",
+	"sekme\t\n\nsonra",
+]
+
+
+# Boşluk ve satır sonu birleştirmeleri: ön-tokenizer'ın parça sınırları token'ları değiştirir
+MERGES = ["Ġ t", "Ġ a", "e r", "l e", "Ã ¼", "Ä ±", "Ġ Ġ", "ĠĠ Ġ", "Ċ Ċ", "ĊĊ Ċ", "Ġ Ċ", "ĉ Ċ"]
+
+
+@pytest.fixture(scope="module")
+def tokenizer_dir(tiny_model_dir, tmp_path_factory):
+	"""Küçük modelin bayt sözlüğüne birkaç birleştirme eklenmiş tokenizer."""
+	directory = str(tmp_path_factory.mktemp("tokenizer"))
+	with open(os.path.join(tiny_model_dir, "vocab.json"), "r", encoding="utf-8") as file:
+		vocab = json.load(file)
+	for merge in MERGES:
+		vocab.setdefault(merge.replace(" ", ""), len(vocab))
+	with open(os.path.join(directory, "vocab.json"), "w", encoding="utf-8") as file:
+		json.dump(vocab, file)
+	with open(os.path.join(directory, "merges.txt"), "w", encoding="utf-8") as file:
+		file.write("#version: 0.2\n" + "\n".join(MERGES) + "\n")
+	return directory
+
+
+@pytest.fixture(scope="module")
+def slow_tokenizer(tokenizer_dir):
+	return GPT2Tokenizer.from_pretrained(tokenizer_dir)
+
+
+@pytest.fixture(scope="module")
+def fast_tokenizer(tokenizer_dir):
+	return GPT2TokenizerFast.from_pretrained(tokenizer_dir)
+
+
+@pytest.mark.parametrize("sample", TOKENIZER_PARITY_SAMPLES + BOUNDARY_SAMPLES)
+def test_fast_matches_slow(slow_tokenizer, fast_tokenizer, sample):
+	assert fast_tokenizer(sample)['input_ids'] == slow_tokenizer(sample)['input_ids']
+
+
+def test_parity_check_passes(slow_tokenizer, fast_tokenizer):
+	samples = TOKENIZER_PARITY_SAMPLES + BOUNDARY_SAMPLES
+	assert check_tokenizer_parity(slow_tokenizer, CachedTokenizer(fast_tokenizer, min_chars=0), samples) == []
+
+
+@pytest.mark.parametrize("text, segments", [
+	("a\n\nb", ["a", "\n\nb"]),
+	("\n\nbaşta", ["\n\nbaşta"]),
+	("sonda\n\n", ["sonda", "\n\n"]),
+	("boşluk \n\nayraç", ["boşluk \n\nayraç"]),
+	("dört\n\n\n\nx", ["dört", "\n\n\n\nx"]),
+	("tur 1\n\ntur 2\n\ntur 3", ["tur 1", "\n\ntur 2", "\n\ntur 3"]),
+	("ayraçsız metin", ["ayraçsız metin"]),
+	("", [""]),
+])
+def test_split_cacheable_boundaries(text, segments):
+	assert split_cacheable(text) == segments
+
+
+@pytest.mark.parametrize("sample", TOKENIZER_PARITY_SAMPLES + BOUNDARY_SAMPLES)
+def test_segments_encode_like_whole_text(slow_tokenizer, sample):
+	segments = split_cacheable(sample)
+	assert "".join(segments) == sample
+	joined = [token for segment in segments for token in slow_tokenizer(segment)['input_ids']]
+	assert joined == slow_tokenizer(sample)['input_ids']
+
+
+def test_cached_encode_matches_uncached(fast_tokenizer):
+	cached = CachedTokenizer(fast_tokenizer, min_chars=0)
+	# Çok turlu sohbet: her prompt önceki turların tamamını yeniden içerir
+	texts, history = [], ""
+	for sample in TOKENIZER_PARITY_SAMPLES + BOUNDARY_SAMPLES:
+		texts.append(history + sample)
+		history += sample + "\n\n"
+
+	expected = fast_tokenizer(texts)['input_ids']
+	assert cached(texts)['input_ids'] == expected
+	# İkinci kodlama önbellekten gelir, sonuç değişmez
+	hits = cached.stats()['hits']
+	assert cached(texts)['input_ids'] == expected
+	assert cached.stats()['hits'] > hits
+	assert [cached(text)['input_ids'] for text in texts] == expected
+
+
+def test_cache_eviction_keeps_results(fast_tokenizer):
+	cached = CachedTokenizer(fast_tokenizer, max_entries=2, min_chars=0)
+	texts = ["tur %d\n\nyanıt %d" % (index, index) for index in range(8)]
+	assert cached(texts)['input_ids'] == fast_tokenizer(texts)['input_ids']
+	assert cached.stats()['entries'] <= 2
+	assert cached(texts)['input_ids'] == fast_tokenizer(texts)['input_ids']
+
+
+def test_unsplit_slow_tokenizer_matches(slow_tokenizer):
+	# Eşlik bozuksa load_tokenizer yavaş tokenizer'ı bölmeden sarar
+	cached = CachedTokenizer(slow_tokenizer, min_chars=0, split=False)
+	for sample in TOKENIZER_PARITY_SAMPLES + BOUNDARY_SAMPLES:
+		assert cached(sample)['input_ids'] == slow_tokenizer(sample)['input_ids']